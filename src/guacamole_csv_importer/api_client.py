@@ -4,23 +4,107 @@ This module provides a client for interacting with the Guacamole REST API.
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 import requests
-from requests.exceptions import RequestException
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, HTTPError, RequestException, Timeout
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import NewConnectionError
+
+from .metrics import ImportMetrics, endpoint_template
+from .throttling import RetryPolicy, TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Guacamole answers requests made with an expired token with 403, some proxies with 401
+AUTH_FAILURE_STATUSES = (401, 403)
+
+
+def tcp_keepalive_socket_options(idle: int) -> List[Tuple[int, int, int]]:
+    """Return socket options enabling TCP keep-alive probes.
+
+    Args:
+        idle: Seconds a connection is idle before the first probe is sent
+
+    Returns:
+        List of (level, option, value) tuples for ``socket.setsockopt``
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 4)))
+    return options
+
+
+def _is_connect_error(error: RequestException) -> bool:
+    """Return whether a request failed before it was sent to the server."""
+    if isinstance(error, ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _without_password(parameters: Dict[str, str]) -> Dict[str, str]:
+    return {key: value for key, value in parameters.items() if key != "password"}
+
+
+class TunedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter which sets extra socket options on new connections."""
+
+    def __init__(self, socket_options: Optional[List[Tuple[int, int, int]]] = None, **kwargs):
+        # init_poolmanager is called from HTTPAdapter.__init__
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options:
+            kwargs["socket_options"] = (
+                HTTPConnection.default_socket_options + self.socket_options
+            )
+        super().init_poolmanager(*args, **kwargs)
+
 
 class GuacamoleAPIClient:
     """Client for interacting with the Guacamole REST API."""
 
-    def __init__(self, base_url: str, username: str, password: str):
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        compression: bool = True,
+        tcp_keepalive: Optional[int] = 60,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limit: Optional[float] = None,
+        metrics: Optional[ImportMetrics] = None,
+    ):
         """Initialize the Guacamole API client.
 
         Args:
             base_url: Base URL of the Guacamole API (e.g., 'http://localhost:8080/guacamole/api')
             username: Guacamole admin username
             password: Guacamole admin password
+            pool_connections: Number of per-host connection pools to keep (default: 10)
+            pool_maxsize: Maximum number of kept-alive connections per host;
+                should be at least the number of concurrent workers (default: 10)
+            compression: Accept gzip/deflate compressed responses (default: True)
+            tcp_keepalive: Idle seconds before TCP keep-alive probes are sent on
+                pooled connections, or None to disable them (default: 60)
+            retry_policy: Retry policy for transient failures (default: RetryPolicy())
+            rate_limit: Maximum number of requests per second (default: None,
+                i.e. unlimited)
+            metrics: Collector of per-endpoint request metrics (default: None)
         """
         self.base_url = base_url.rstrip("/")
         self.username = username
@@ -29,6 +113,140 @@ class GuacamoleAPIClient:
         self.data_source = None
         self.session = requests.Session()
 
+        adapter = TunedHTTPAdapter(
+            socket_options=(
+                tcp_keepalive_socket_options(tcp_keepalive) if tcp_keepalive else None
+            ),
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = (
+            "gzip, deflate" if compression else "identity"
+        )
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.metrics = metrics
+        # connection identifier -> parameters, without passwords, read by
+        # hydrate_parameters or written by update_connection
+        self.parameter_cache: Dict[str, Dict[str, str]] = {}
+        self._auth_lock = threading.Lock()
+        # token which was still rejected right after logging in to get it
+        self._denied_token: Optional[str] = None
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request, re-authenticating once if its token has expired.
+
+        If the request is rejected again with the new token, the rejection is
+        not caused by the token, e.g. the user lacks a permission. Later
+        rejections of that token are then returned without logging in again.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Arguments of ``requests.Session.request``
+
+        Returns:
+            The response of the last attempt
+
+        Raises:
+            RequestException: If the last attempt failed to connect
+        """
+        response = self._send(method, url, **kwargs)
+
+        token = (kwargs.get("params") or {}).get("token")
+        if (
+            token
+            and response.status_code in AUTH_FAILURE_STATUSES
+            and token != self._denied_token
+        ):
+            if self._refresh_token(token):
+                kwargs["params"] = dict(kwargs["params"], token=self.token)
+                response = self._send(method, url, **kwargs)
+                if response.status_code in AUTH_FAILURE_STATUSES:
+                    self._denied_token = kwargs["params"]["token"]
+        return response
+
+    def _refresh_token(self, stale_token: str) -> bool:
+        """Re-authenticate after a request was rejected with ``stale_token``.
+
+        Only one thread re-authenticates; threads which were rejected with the
+        same token wait for it and then reuse the new token.
+
+        Args:
+            stale_token: Token of the rejected request
+
+        Returns:
+            True if a new token is available, False otherwise
+        """
+        with self._auth_lock:
+            if self.token != stale_token:
+                return self.token is not None
+            logger.info("Authentication token was rejected, re-authenticating")
+            return bool(self.authenticate())
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request, retrying transient failures with backoff.
+
+        Every attempt first takes a token from the rate limiter, if any, and
+        is reported to the metrics collector, if any. Requests which are not
+        idempotent are only sent again when they cannot have been processed,
+        see :class:`RetryPolicy`.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Arguments of ``requests.Session.request``
+
+        Returns:
+            The response of the last attempt
+
+        Raises:
+            RequestException: If the last attempt failed to connect
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            retry_after = None
+            status = None
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                status = response.status_code
+            except (RequestsConnectionError, Timeout) as e:
+                if attempt >= self.retry_policy.total or not (
+                    self.retry_policy.is_idempotent(method) or _is_connect_error(e)
+                ):
+                    raise
+                reason = str(e)
+            else:
+                if (
+                    not self.retry_policy.retries_status(method, response.status_code)
+                    or attempt >= self.retry_policy.total
+                ):
+                    return response
+                reason = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe_request(
+                        method,
+                        endpoint_template(url.replace(self.base_url, "")),
+                        status,
+                        time.perf_counter() - started,
+                    )
+
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            attempt += 1
+            logger.warning(
+                f"{method} {url.replace(self.base_url, '')} failed ({reason}), "
+                f"retry {attempt}/{self.retry_policy.total} in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
     def authenticate(self) -> bool:
         """Authenticate with the Guacamole API.
 
@@ -38,7 +256,8 @@ class GuacamoleAPIClient:
         auth_url = f"{self.base_url}/tokens"
 
         try:
-            response = self.session.post(
+            response = self._request(
+                "POST",
                 auth_url,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
                 data={"username": self.username, "password": self.password},
@@ -80,7 +299,7 @@ class GuacamoleAPIClient:
         url = f"{self.base_url}/session/data/{self.data_source}/connectionGroups"
 
         try:
-            response = self.session.get(url, params=self._get_auth_params())
+            response = self._request("GET", url, params=self._get_auth_params())
             response.raise_for_status()
             resp_json = response.json()
 
@@ -104,7 +323,7 @@ class GuacamoleAPIClient:
         url = f"{self.base_url}/session/data/{self.data_source}/connections"
 
         try:
-            response = self.session.get(url, params=self._get_auth_params())
+            response = self._request("GET", url, params=self._get_auth_params())
             response.raise_for_status()
             resp_json = response.json()
             conns = []
@@ -115,6 +334,151 @@ class GuacamoleAPIClient:
             logger.error(f"Failed to get connections: {e}")
             raise ValueError(f"API request failed: {e}")
 
+    def get_connection_tree(self, group_id: str = "ROOT") -> Dict[str, Any]:
+        """Get a connection group with all its descendant groups and connections.
+
+        Args:
+            group_id: ID of the connection group (default: "ROOT")
+
+        Returns:
+            Connection group dictionary, with its child groups nested in
+            ``childConnectionGroups`` and its connections in ``childConnections``
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = (
+            f"{self.base_url}/session/data/{self.data_source}"
+            f"/connectionGroups/{group_id}/tree"
+        )
+
+        try:
+            response = self._request("GET", url, params=self._get_auth_params())
+            response.raise_for_status()
+            return response.json()
+        except RequestException as e:
+            logger.error(f"Failed to get connection tree of group {group_id}: {e}")
+            raise ValueError(f"API request failed: {e}")
+
+    def get_connection(self, identifier: str) -> Dict[str, Any]:
+        """Get a connection, without its parameters.
+
+        Args:
+            identifier: ID of the connection
+
+        Returns:
+            Connection dictionary
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connections/{identifier}"
+
+        try:
+            response = self._request("GET", url, params=self._get_auth_params())
+            response.raise_for_status()
+            return response.json()
+        except RequestException as e:
+            logger.error(f"Failed to get connection {identifier}: {e}")
+            raise ValueError(f"API request failed: {e}")
+
+    def get_connection_parameters(self, identifier: str) -> Dict[str, str]:
+        """Get the parameters of a connection.
+
+        Args:
+            identifier: ID of the connection
+
+        Returns:
+            Dictionary of connection parameters
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = (
+            f"{self.base_url}/session/data/{self.data_source}"
+            f"/connections/{identifier}/parameters"
+        )
+
+        try:
+            response = self._request("GET", url, params=self._get_auth_params())
+            response.raise_for_status()
+            return response.json()
+        except RequestException as e:
+            logger.error(f"Failed to get parameters of connection {identifier}: {e}")
+            raise ValueError(f"API request failed: {e}")
+
+    def iter_connection_parameters(
+        self, identifiers: Iterable[str], max_workers: int = 8
+    ) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+        """Read the parameters of many connections concurrently.
+
+        Parameters are read by ``max_workers`` threads, with at most
+        ``2 * max_workers`` reads ahead of the consumer, and are neither read
+        from nor stored in the parameter cache. Results come in the order of
+        ``identifiers``, so they can be streamed in constant memory.
+
+        Args:
+            identifiers: IDs of the connections
+            max_workers: Number of concurrent reads (default: 8)
+
+        Yields:
+            Tuples of (identifier, parameters), with None as the parameters of
+            connections which could not be read
+        """
+        # (identifier, future of the read) in request order
+        window: Deque[Tuple[str, Future]] = deque()
+        max_in_flight = max_workers * 2
+
+        def next_result() -> Tuple[str, Optional[Dict[str, str]]]:
+            identifier, future = window.popleft()
+            try:
+                return identifier, future.result()
+            except ValueError:
+                return identifier, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for identifier in identifiers:
+                future = executor.submit(self.get_connection_parameters, identifier)
+                window.append((identifier, future))
+                if len(window) >= max_in_flight:
+                    yield next_result()
+            while window:
+                yield next_result()
+
+    def hydrate_parameters(
+        self, identifiers: Iterable[str], max_workers: int = 8
+    ) -> Dict[str, Dict[str, str]]:
+        """Read the parameters of many connections, skipping cached ones.
+
+        Identifiers are deduplicated, and the ones missing from the parameter
+        cache are read as by :meth:`iter_connection_parameters` and cached.
+        Passwords are neither cached nor returned.
+
+        Args:
+            identifiers: IDs of the connections
+            max_workers: Number of concurrent reads (default: 8)
+
+        Returns:
+            Parameters by connection identifier; connections which could not
+            be read are left out
+        """
+        unique = list(dict.fromkeys(identifiers))
+        missing = [identifier for identifier in unique if identifier not in self.parameter_cache]
+        for identifier, params in self.iter_connection_parameters(missing, max_workers):
+            if params is not None:
+                self.parameter_cache[identifier] = _without_password(params)
+        parameters = {
+            identifier: self.parameter_cache[identifier]
+            for identifier in unique
+            if identifier in self.parameter_cache
+        }
+        if len(parameters) < len(unique):
+            logger.warning(
+                f"Failed to read the parameters of {len(unique) - len(parameters)} "
+                "connections"
+            )
+        return parameters
+
     def create_connection(
         self, connection_data: Dict[str, Any], parent_id: str = "ROOT"
     ) -> Optional[str]:
@@ -129,17 +493,11 @@ class GuacamoleAPIClient:
         """
         url = f"{self.base_url}/session/data/{self.data_source}/connections"
 
-        # Add parent identifier
-        connection_data["parentIdentifier"] = parent_id
-
-        connection_data["attributes"] = {
-            "guacd-hostname": "guacd",
-            "guacd-port": "4822",
-            "guacd-encryption": "none",
-        }
+        self._prepare_connection_data(connection_data, parent_id)
 
         try:
-            response = self.session.post(
+            response = self._request(
+                "POST",
                 url,
                 params=self._get_auth_params(),
                 json=connection_data,
@@ -149,7 +507,7 @@ class GuacamoleAPIClient:
 
             # Extract connection ID from response
             connection_id = response.json().get("identifier")
-            logger.info(
+            logger.debug(
                 f"Created connection '{connection_data.get('name')}' with ID {connection_id}"
             )
             return connection_id
@@ -160,6 +518,134 @@ class GuacamoleAPIClient:
             )
             return None
 
+    def create_connections(
+        self, connections: List[Tuple[Dict[str, Any], str]]
+    ) -> Optional[List[Optional[str]]]:
+        """Create many connections with a single JSON Patch request.
+
+        Guacamole applies the ``add`` operations of a patch in one transaction,
+        so either every connection is created or the whole batch is rejected.
+
+        Args:
+            connections: List of (connection data dictionary, parent group ID)
+
+        Returns:
+            IDs of the created connections, in the order of ``connections``;
+            None if the batch was rejected, so none of them was created; or
+            a list of None if the outcome is unknown, e.g. after a gateway
+            error, so the connections must not be created again
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connections"
+
+        patch = [
+            {
+                "op": "add",
+                "path": "/",
+                "value": self._prepare_connection_data(connection_data, parent_id),
+            }
+            for connection_data, parent_id in connections
+        ]
+
+        try:
+            response = self._request(
+                "PATCH",
+                url,
+                params=self._get_auth_params(),
+                json=patch,
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+
+            outcomes = response.json().get("patches", [])
+            connection_ids = [outcome.get("identifier") for outcome in outcomes]
+            if len(connection_ids) != len(connections):
+                logger.error(
+                    f"Batch create returned {len(connection_ids)} results "
+                    f"for {len(connections)} connections"
+                )
+                return [None] * len(connections)
+
+            logger.debug(f"Created {len(connection_ids)} connections in one batch")
+            return connection_ids
+
+        except HTTPError as e:
+            logger.error(f"Failed to create batch of {len(connections)} connections: {e}")
+            if e.response is not None and e.response.status_code < 500:
+                return None
+            return [None] * len(connections)
+        except RequestException as e:
+            logger.error(f"Failed to create batch of {len(connections)} connections: {e}")
+            return [None] * len(connections)
+
+    def update_connection(
+        self, identifier: str, connection_data: Dict[str, Any], parent_id: str = "ROOT"
+    ) -> bool:
+        """Replace an existing connection.
+
+        Guacamole replaces every parameter and attribute of the connection, so
+        ``connection_data`` has to hold all of them, e.g. the result of
+        :meth:`get_connection` with the parameters of the connection. Its
+        attributes are sent as they are.
+
+        Args:
+            identifier: ID of the connection
+            connection_data: Connection data dictionary
+            parent_id: ID of the parent connection group (default: "ROOT")
+
+        Returns:
+            True if the connection was updated, False otherwise
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connections/{identifier}"
+
+        connection_data["parentIdentifier"] = parent_id
+        connection_data["identifier"] = identifier
+
+        try:
+            response = self._request(
+                "PUT",
+                url,
+                params=self._get_auth_params(),
+                json=connection_data,
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+            logger.debug(
+                f"Updated connection '{connection_data.get('name')}' with ID {identifier}"
+            )
+            self.parameter_cache[identifier] = _without_password(
+                connection_data["parameters"]
+            )
+            return True
+
+        except RequestException as e:
+            logger.error(
+                f"Failed to update connection '{connection_data.get('name')}': {e}"
+            )
+            return False
+
+    @staticmethod
+    def _prepare_connection_data(
+        connection_data: Dict[str, Any], parent_id: str
+    ) -> Dict[str, Any]:
+        """Add the parent identifier and default attributes to connection data.
+
+        Args:
+            connection_data: Connection data dictionary, updated in place
+            parent_id: ID of the parent connection group
+
+        Returns:
+            The updated connection data dictionary
+        """
+        # Add parent identifier
+        connection_data["parentIdentifier"] = parent_id
+
+        connection_data["attributes"] = {
+            "guacd-hostname": "guacd",
+            "guacd-port": "4822",
+            "guacd-encryption": "none",
+        }
+        return connection_data
+
     def create_connection_group(
         self, name: str, parent_id: str = "ROOT"
     ) -> Optional[str]:
@@ -186,7 +672,8 @@ class GuacamoleAPIClient:
         }
 
         try:
-            response = self.session.post(
+            response = self._request(
+                "POST",
                 url, params=self._get_auth_params(), json=group_data
             )
             response.raise_for_status()
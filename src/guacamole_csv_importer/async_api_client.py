@@ -0,0 +1,406 @@
+"""Asynchronous Guacamole API client module.
+
+This module provides an asyncio-native client for the Guacamole REST API with the
+same surface as :class:`~guacamole_csv_importer.api_client.GuacamoleAPIClient`.
+It requires the optional ``aiohttp`` dependency
+(``pip install guacamole-csv-importer[async]``).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .api_client import AUTH_FAILURE_STATUSES
+from .metrics import ImportMetrics, endpoint_template
+from .throttling import RetryPolicy, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGuacamoleAPIClient:
+    """Asyncio client for interacting with the Guacamole REST API.
+
+    The client owns an ``aiohttp.ClientSession`` which is opened lazily on the
+    first request. Use it as an async context manager, or call :meth:`close`
+    when done.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        pool_maxsize: int = 100,
+        compression: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limit: Optional[float] = None,
+        metrics: Optional[ImportMetrics] = None,
+    ):
+        """Initialize the asynchronous Guacamole API client.
+
+        Args:
+            base_url: Base URL of the Guacamole API (e.g., 'http://localhost:8080/guacamole/api')
+            username: Guacamole admin username
+            password: Guacamole admin password
+            pool_maxsize: Maximum number of open connections per host; should be
+                at least the importer concurrency (default: 100)
+            compression: Accept gzip/deflate compressed responses (default: True)
+            retry_policy: Retry policy for transient failures (default: RetryPolicy())
+            rate_limit: Maximum number of requests per second (default: None,
+                i.e. unlimited)
+            metrics: Collector of per-endpoint request metrics (default: None)
+
+        Raises:
+            ImportError: If aiohttp is not installed
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "The asynchronous client requires aiohttp. "
+                "Install it with 'pip install guacamole-csv-importer[async]'"
+            )
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.token = None
+        self.data_source = None
+        self.pool_maxsize = pool_maxsize
+        self.compression = compression
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.metrics = metrics
+        self.session: Optional["aiohttp.ClientSession"] = None
+        # created on first use, so it belongs to the running event loop
+        self._auth_lock: Optional[asyncio.Lock] = None
+        # token which was still rejected right after logging in to get it
+        self._denied_token: Optional[str] = None
+
+    async def __aenter__(self) -> "AsyncGuacamoleAPIClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_maxsize, limit_per_host=self.pool_maxsize
+                ),
+                headers={
+                    "Accept-Encoding": "gzip, deflate" if self.compression else "identity"
+                },
+            )
+        return self.session
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> Any:
+        """Send a request and return its JSON body, retrying transient failures.
+
+        Every attempt first takes a token from the rate limiter, if any, and
+        is reported to the metrics collector, if any. A request rejected
+        because its token has expired is sent again once, after
+        re-authenticating; if the new token is rejected as well, later
+        rejections of it are not taken for an expired token. Requests which
+        are not idempotent are only sent again when they cannot have been
+        processed, see :class:`RetryPolicy`.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Arguments of ``aiohttp.ClientSession.request``
+
+        Returns:
+            Decoded JSON body, or None if the response has no body
+
+        Raises:
+            aiohttp.ClientError: If the last attempt failed
+            asyncio.TimeoutError: If the last attempt timed out
+        """
+        attempt = 0
+        refreshed = False
+        while True:
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            retry_after = None
+            token = (kwargs.get("params") or {}).get("token")
+            rejected_token = None
+            status = None
+            started = time.perf_counter()
+            try:
+                async with self._get_session().request(method, url, **kwargs) as response:
+                    status = response.status
+                    if refreshed and response.status in AUTH_FAILURE_STATUSES:
+                        self._denied_token = token
+                    if (
+                        token
+                        and not refreshed
+                        and response.status in AUTH_FAILURE_STATUSES
+                        and token != self._denied_token
+                    ):
+                        rejected_token = token
+                    elif (
+                        not self.retry_policy.retries_status(method, response.status)
+                        or attempt >= self.retry_policy.total
+                    ):
+                        response.raise_for_status()
+                        if response.content_length == 0:
+                            return None
+                        return await response.json()
+                    else:
+                        reason = f"HTTP {response.status}"
+                        retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # a request which is not idempotent may have been processed
+                # unless the connection could not even be opened
+                if attempt >= self.retry_policy.total or not (
+                    self.retry_policy.is_idempotent(method)
+                    or isinstance(e, aiohttp.ClientConnectorError)
+                ):
+                    raise
+                reason = str(e) or type(e).__name__
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe_request(
+                        method,
+                        endpoint_template(url.replace(self.base_url, "")),
+                        status,
+                        time.perf_counter() - started,
+                    )
+
+            if rejected_token is not None:
+                refreshed = True
+                if await self._refresh_token(rejected_token):
+                    kwargs["params"] = dict(kwargs["params"], token=self.token)
+                continue
+
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            attempt += 1
+            logger.warning(
+                f"{method} {url.replace(self.base_url, '')} failed ({reason}), "
+                f"retry {attempt}/{self.retry_policy.total} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def _refresh_token(self, stale_token: str) -> bool:
+        """Re-authenticate after a request was rejected with ``stale_token``.
+
+        Only one task re-authenticates; tasks which were rejected with the same
+        token wait for it and then reuse the new token.
+
+        Args:
+            stale_token: Token of the rejected request
+
+        Returns:
+            True if a new token is available, False otherwise
+        """
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        async with self._auth_lock:
+            if self.token != stale_token:
+                return self.token is not None
+            logger.info("Authentication token was rejected, re-authenticating")
+            return await self.authenticate()
+
+    async def authenticate(self) -> bool:
+        """Authenticate with the Guacamole API.
+
+        Returns:
+            True if authentication was successful, False otherwise
+        """
+        auth_url = f"{self.base_url}/tokens"
+
+        try:
+            data = await self._request(
+                "POST",
+                auth_url,
+                data={"username": self.username, "password": self.password},
+            )
+
+            if data and "authToken" in data:
+                self.token = data["authToken"]
+                self.data_source = data["dataSource"]
+                logger.info("Successfully authenticated with Guacamole API")
+                logger.debug(f"Data source: {self.data_source}")
+                return True
+            return False
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Authentication failed: {e!r}")
+            return False
+
+    def _get_auth_params(self) -> Dict[str, str]:
+        """Get authentication parameters for API requests.
+
+        Returns:
+            Dictionary of authentication parameters
+        """
+        if not self.token:
+            raise ValueError("Not authenticated. Call authenticate() first.")
+
+        return {"token": self.token}
+
+    async def _get_values(self, url: str) -> List[Dict[str, Any]]:
+        """GET an identifier-keyed listing and return its values."""
+        resp_json = await self._request("GET", url, params=self._get_auth_params())
+        return list((resp_json or {}).values())
+
+    async def get_connection_groups(self) -> List[Dict[str, Any]]:
+        """Get all connection groups.
+
+        Returns:
+            List of connection group dictionaries
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connectionGroups"
+
+        try:
+            return await self._get_values(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to get connection groups: {e!r}")
+            raise ValueError(f"API request failed: {e}")
+
+    async def get_connections(self) -> List[Dict[str, Any]]:
+        """Get all connections.
+
+        Returns:
+            List of connection dictionaries
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connections"
+
+        try:
+            return await self._get_values(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to get connections: {e!r}")
+            raise ValueError(f"API request failed: {e}")
+
+    async def get_connection_tree(self, group_id: str = "ROOT") -> Dict[str, Any]:
+        """Get a connection group with all its descendant groups and connections.
+
+        Args:
+            group_id: ID of the connection group (default: "ROOT")
+
+        Returns:
+            Connection group dictionary, with its child groups nested in
+            ``childConnectionGroups`` and its connections in ``childConnections``
+
+        Raises:
+            ValueError: If not authenticated or API request fails
+        """
+        url = (
+            f"{self.base_url}/session/data/{self.data_source}"
+            f"/connectionGroups/{group_id}/tree"
+        )
+
+        try:
+            return await self._request("GET", url, params=self._get_auth_params())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to get connection tree of group {group_id}: {e!r}")
+            raise ValueError(f"API request failed: {e}")
+
+    async def create_connection(
+        self, connection_data: Dict[str, Any], parent_id: str = "ROOT"
+    ) -> Optional[str]:
+        """Create a new connection.
+
+        Args:
+            connection_data: Connection data dictionary
+            parent_id: ID of the parent connection group (default: "ROOT")
+
+        Returns:
+            ID of the created connection if successful, None otherwise
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connections"
+
+        # Add parent identifier
+        connection_data["parentIdentifier"] = parent_id
+
+        connection_data["attributes"] = {
+            "guacd-hostname": "guacd",
+            "guacd-port": "4822",
+            "guacd-encryption": "none",
+        }
+
+        try:
+            resp_json = await self._request(
+                "POST", url, params=self._get_auth_params(), json=connection_data
+            )
+
+            # Extract connection ID from response
+            connection_id = (resp_json or {}).get("identifier")
+            if connection_id is None:
+                logger.error(
+                    f"Creating connection '{connection_data.get('name')}' "
+                    "returned no identifier"
+                )
+                return None
+            logger.debug(
+                f"Created connection '{connection_data.get('name')}' with ID {connection_id}"
+            )
+            return connection_id
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(
+                f"Failed to create connection '{connection_data.get('name')}': {e!r}"
+            )
+            return None
+
+    async def create_connection_group(
+        self, name: str, parent_id: str = "ROOT"
+    ) -> Optional[str]:
+        """Create a new connection group.
+
+        Args:
+            name: Name of the connection group
+            parent_id: ID of the parent connection group (default: "ROOT")
+
+        Returns:
+            ID of the created connection group if successful, None otherwise
+        """
+        url = f"{self.base_url}/session/data/{self.data_source}/connectionGroups"
+
+        group_data = {
+            "parentIdentifier": parent_id,
+            "name": name,
+            "type": "ORGANIZATIONAL",
+            "attributes": {
+                "max-connections": "",
+                "max-connections-per-user": "",
+                "enable-session-affinity": "",
+            },
+        }
+
+        try:
+            resp_json = await self._request(
+                "POST", url, params=self._get_auth_params(), json=group_data
+            )
+
+            # Extract group ID from response
+            group_id = (resp_json or {}).get("identifier")
+            if group_id is None:
+                logger.error(f"Creating connection group '{name}' returned no identifier")
+                return None
+            logger.info(f"Created connection group '{name}' with ID {group_id}")
+            return group_id
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to create connection group '{name}': {e!r}")
+            return None
@@ -0,0 +1,187 @@
+"""Asynchronous Guacamole CSV Importer module.
+
+This module provides an asyncio importer which keeps many connection creates in
+flight from a single thread, bounded by a concurrency semaphore.
+"""
+
+import asyncio
+import logging
+from functools import partial
+from typing import Optional, Set, Tuple
+
+from .async_api_client import AsyncGuacamoleAPIClient
+from .connection_csv_data import ConnectionCsvData
+from .connection_group_tree import ConnectionGroupNode, ConnectionGroupTree
+from .importer import BaseConnectionImporter
+from .metrics import ImportMetrics
+from .progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConnectionImporter(BaseConnectionImporter):
+    """Asyncio importer for Guacamole connections from CSV files."""
+
+    def __init__(
+        self,
+        api_client: AsyncGuacamoleAPIClient,
+        concurrency: int = 100,
+        metrics: Optional[ImportMetrics] = None,
+        progress: Optional[ProgressReporter] = None,
+    ):
+        """Initialize the asynchronous connection importer.
+
+        Args:
+            api_client: Asynchronous Guacamole API client
+            concurrency: Maximum number of connection creates in flight (default: 100)
+            metrics: Collector of the phase timings and import counters
+                (default: None)
+            progress: Reporter of the import progress (default: a
+                ProgressReporter logging every 10 seconds)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.api_client = api_client
+        self.concurrency = concurrency
+        self.metrics = metrics
+        self.progress = progress if progress is not None else ProgressReporter()
+        # tree of groups and connections after the last import
+        self.tree: Optional[ConnectionGroupTree] = None
+
+    async def import_connections(self, csv_file_path: str) -> Tuple[int, int]:
+        """Import connections from the CSV file into Guacamole.
+
+        Connection groups are created inline, so a parent group exists before
+        any of its connections are posted. Connection creates run as tasks,
+        at most ``self.concurrency`` of them at a time.
+
+        Returns:
+            Tuple of (number of successful imports, total number of connections)
+
+        Raises:
+            ValueError: If authentication fails or CSV parsing fails
+        """
+        successful_imports = 0
+        write_failures = 0
+        total_connections = 0
+
+        # Authenticate with the Guacamole API
+        with self._phase("authenticate"):
+            if not await self.api_client.authenticate():
+                raise ValueError("Failed to authenticate with Guacamole API")
+
+        with self._phase("tree_fetch"):
+            nested = await self.api_client.get_connection_tree()
+
+        with self._phase("tree_build"):
+            tree = ConnectionGroupTree(keep_attributes=False)
+            tree.build_from_nested(nested)
+        groups, connections = tree.counts()
+        logger.info(
+            f"Found {groups} existing connection groups and {connections} connections"
+        )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # (parent identifier, connection name) of creates that are in flight,
+        # so duplicated CSV rows are not posted twice
+        pending: Set[Tuple[str, str]] = set()
+        tasks: Set[asyncio.Task] = set()
+        progress = self.progress
+        # the CSV file is read once, so the total is not known up front
+        progress.start()
+
+        async def create(
+            parent_grp: ConnectionGroupNode, connection: ConnectionCsvData
+        ) -> Optional[str]:
+            identifier = None
+            try:
+                identifier = await self.api_client.create_connection(
+                    connection.to_create_dict(), parent_grp.identifier
+                )
+                if identifier is not None:
+                    self._add_created_connection(
+                        tree, parent_grp, connection, identifier
+                    )
+                return identifier
+            finally:
+                pending.discard((parent_grp.identifier, connection.device_name))
+                semaphore.release()
+                if identifier is None:
+                    progress.update(failed=1, in_flight=len(pending))
+                else:
+                    progress.update(done=1, in_flight=len(pending))
+
+        def collect(connection: ConnectionCsvData, task: asyncio.Task) -> None:
+            nonlocal successful_imports, write_failures
+            tasks.discard(task)
+            if task.cancelled():
+                return
+            error = task.exception()
+            if error is not None:
+                write_failures += 1
+                logger.error(
+                    f"Failed to create connection '{connection.device_name}': {error!r}"
+                )
+            elif task.result() is None:
+                write_failures += 1
+            else:
+                successful_imports += 1
+
+        # groups are created inline, so their time counts as connection_create
+        with self._phase("connection_create"):
+            for connection in self._iter_connection_data(csv_file_path):
+                total_connections += 1
+                parent_grp = await self._ensure_group_path(tree, connection.site)
+
+                # check connection in the grp
+                key = (parent_grp.identifier, connection.device_name)
+                if (
+                    parent_grp.get_connection_in_children(connection.device_name)
+                    is not None
+                    or key in pending
+                ):
+                    progress.update(skipped=1)
+                    continue
+
+                await semaphore.acquire()
+                pending.add(key)
+                task = asyncio.ensure_future(create(parent_grp, connection))
+                tasks.add(task)
+                # a task is dropped once done, so collect its outcome then
+                task.add_done_callback(partial(collect, connection))
+
+            if tasks:
+                await asyncio.wait(tasks)
+        progress.finish()
+
+        if self.metrics is not None:
+            self.metrics.count("rows", total_connections)
+            self.metrics.count("successful_imports", successful_imports)
+            self.metrics.count("write_failures", write_failures)
+
+        self.tree = tree
+        logger.info(
+            f"Imported {successful_imports}/{total_connections} connections successfully"
+        )
+
+        return successful_imports, total_connections
+
+    async def _ensure_group_path(
+        self, tree: ConnectionGroupTree, site: str
+    ) -> ConnectionGroupNode:
+        """Return the group for a site path, creating missing groups on the way.
+
+        Args:
+            tree: Tree of the existing connection groups
+            site: Full path of the group (e.g. 'ROOT/DC1/Rack1')
+
+        Returns:
+            The connection group node at the end of the path
+        """
+        node, missing = self._resolve_group_path(tree, site)
+        for path_name in missing:
+            group_id = await self.api_client.create_connection_group(
+                name=path_name, parent_id=node.identifier
+            )
+            node = self._add_created_group(tree, node, path_name, group_id)
+        return node
@@ -0,0 +1,204 @@
+"""Benchmark harness for Guacamole CSV Importer.
+
+This module runs :class:`~guacamole_csv_importer.importer.ConnectionImporter`
+against a local :class:`~guacamole_csv_importer.fake_server.FakeGuacamoleServer`
+with a synthetic CSV file and reports throughput, request latency and memory use.
+It is available as ``gu-import bench``.
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .api_client import GuacamoleAPIClient
+from .fake_server import FakeGuacamoleServer
+from .importer import ConnectionImporter
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def generate_csv(path: Path, sites: int, devices: int) -> int:
+    """Write a synthetic connection CSV.
+
+    Args:
+        path: Path of the CSV file to write
+        sites: Number of sites, each one a 'region/site' group path
+        devices: Number of devices per site
+
+    Returns:
+        Number of rows written
+    """
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(
+            ["site", "device_name", "hostname", "protocol", "port", "username", "password"]
+        )
+        for site in range(sites):
+            site_path = f"region-{site % 10}/site-{site}"
+            for device in range(devices):
+                writer.writerow(
+                    [
+                        site_path,
+                        f"dev-{site}-{device}",
+                        f"10.{site // 256 % 256}.{site % 256}.{device % 256}",
+                        "ssh",
+                        "22",
+                        "admin",
+                        "admin",
+                    ]
+                )
+    return sites * devices
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident set size of this process, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_benchmark(
+    sites: int = 10,
+    devices: int = 100,
+    workers: int = 1,
+    batch_size: int = 1,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = 0,
+) -> Dict[str, Any]:
+    """Import a synthetic CSV into a fake Guacamole server and measure it.
+
+    Args:
+        sites: Number of sites in the synthetic CSV
+        devices: Number of devices per site
+        workers: Number of importer workers
+        batch_size: Number of connections per JSON Patch request
+        latency: Seconds of latency added to every response
+        error_rate: Fraction of requests answered with an error
+        seed: Seed of the error injection
+
+    Returns:
+        Report dictionary
+    """
+    latencies: List[float] = []
+    latencies_lock = threading.Lock()
+
+    def record_latency(response, *args, **kwargs):
+        with latencies_lock:
+            latencies.append(response.elapsed.total_seconds())
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeGuacamoleServer(
+        latency=latency, error_rate=error_rate, seed=seed
+    ) as server:
+        csv_path = Path(tmp_dir) / "bench.csv"
+        rows = generate_csv(csv_path, sites, devices)
+
+        client = GuacamoleAPIClient(
+            server.url, server.username, server.password, pool_maxsize=max(10, workers)
+        )
+        client.session.hooks["response"].append(record_latency)
+        importer = ConnectionImporter(client, workers=workers, batch_size=batch_size)
+
+        started = time.perf_counter()
+        successful, total = importer.import_connections(str(csv_path))
+        elapsed = time.perf_counter() - started
+
+        return {
+            "rows": rows,
+            "successful": successful,
+            "total": total,
+            "connections_on_server": len(server.connections),
+            "workers": workers,
+            "batch_size": batch_size,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_second": round(total / elapsed, 2) if elapsed else None,
+            "requests": server.request_count,
+            "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments of the benchmark.
+
+    Args:
+        args: Command-line arguments
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="gu-import bench",
+        description="Benchmark the importer against a local fake Guacamole server",
+    )
+    parser.add_argument("--sites", type=int, default=10, help="Number of sites (default: 10)")
+    parser.add_argument(
+        "--devices", type=int, default=100, help="Devices per site (default: 100)"
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="Importer workers (default: 1)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="Connections per batch (default: 1)"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds of latency added to every response (default: 0)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with 503 (default: 0)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the error injection (default: 0)"
+    )
+    return parser.parse_args(args)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print its report as JSON.
+
+    Args:
+        args: Command-line arguments
+
+    Returns:
+        Exit code (0 for success)
+    """
+    parsed_args = parse_args(args)
+    report = run_benchmark(
+        sites=parsed_args.sites,
+        devices=parsed_args.devices,
+        workers=parsed_args.workers,
+        batch_size=parsed_args.batch_size,
+        latency=parsed_args.latency,
+        error_rate=parsed_args.error_rate,
+        seed=parsed_args.seed,
+    )
+    print(json.dumps(report, indent=2))
+    return 0
@@ -0,0 +1,147 @@
+"""Checkpoint journal module for resumable imports.
+
+This module records the CSV rows applied by an import in an append-only JSON Lines
+file, so an interrupted import can be resumed without re-applying those rows.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, TextIO, Tuple
+
+from .connection_csv_data import ConnectionCsvData
+
+logger = logging.getLogger(__name__)
+
+
+def default_journal_path(csv_file_path: Path) -> Path:
+    """Return the journal path of a CSV file, next to it.
+
+    Args:
+        csv_file_path: Path to the CSV file
+
+    Returns:
+        Path of the form '<csv file>.journal.jsonl'
+    """
+    csv_file_path = Path(csv_file_path)
+    return csv_file_path.with_name(f"{csv_file_path.name}.journal.jsonl")
+
+
+class CheckpointJournal:
+    """Append-only journal of the CSV rows applied by an import.
+
+    Each line records the site path, device name and fingerprint of a row,
+    and the identifier of its connection. Rows are looked up by (site, device
+    name) in a dictionary, and a row only counts as applied if its
+    fingerprint is unchanged since it was journaled.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        """Initialize the checkpoint journal.
+
+        Args:
+            path: Path to the JSON Lines journal file
+            resume: Load the rows of an existing journal and append to it
+                (default: False, i.e. start a new journal)
+        """
+        self.path = Path(path)
+        self.resume = resume
+        self._applied: Dict[Tuple[str, str], str] = {}
+        self._file: Optional[TextIO] = None
+
+    def __len__(self) -> int:
+        return len(self._applied)
+
+    def __enter__(self) -> "CheckpointJournal":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """Open the journal for writing, loading it first when resuming.
+
+        An unwritable journal only disables checkpointing, the import goes on.
+        """
+        if self.resume:
+            self._load()
+        else:
+            self._applied.clear()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a" if self.resume else "w", encoding="utf-8")
+            os.chmod(self.path, 0o600)
+        except OSError as e:
+            logger.warning(f"Failed to open checkpoint journal {self.path}: {e}")
+            self._file = None
+
+    def close(self) -> None:
+        """Close the journal file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """Close and delete the journal, e.g. once an import has completed."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            return
+        logger.info(f"Removed checkpoint journal {self.path}")
+
+    def _load(self) -> None:
+        self._applied.clear()
+        if not self.path.exists():
+            logger.warning(f"No checkpoint journal at {self.path}, starting from scratch")
+            return
+
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line_number, line in enumerate(journal_file, start=1):
+                try:
+                    entry = json.loads(line)
+                    self._applied[(entry["site"], entry["name"])] = entry["fingerprint"]
+                except (ValueError, KeyError, TypeError):
+                    # the last line is truncated if the import was killed mid-write
+                    logger.warning(
+                        f"Ignoring malformed line {line_number} of {self.path}"
+                    )
+        logger.info(f"Loaded {len(self._applied)} applied rows from {self.path}")
+
+    def is_applied(self, connection: ConnectionCsvData) -> bool:
+        """Check whether a row was applied by a previous run.
+
+        Args:
+            connection: CSV row
+
+        Returns:
+            True if the row was journaled with the same fingerprint
+        """
+        fingerprint = self._applied.get((connection.site, connection.device_name))
+        return fingerprint is not None and fingerprint == connection.fingerprint()
+
+    def record(self, connection: ConnectionCsvData, identifier: Optional[str]) -> None:
+        """Append an applied row to the journal.
+
+        Args:
+            connection: CSV row
+            identifier: ID of the connection created or updated for the row
+        """
+        if self._file is None:
+            return
+        self._file.write(
+            json.dumps(
+                {
+                    "site": connection.site,
+                    "name": connection.device_name,
+                    "fingerprint": connection.fingerprint(),
+                    "identifier": identifier,
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+        )
+        # flushed per row, so a killed process loses at most the row being written
+        self._file.flush()
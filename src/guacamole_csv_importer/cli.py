@@ -5,16 +5,27 @@ into Apache Guacamole.
 """
 
 import argparse
+import asyncio
 import logging
 import sys
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from dotenv import load_dotenv
 
+from .connection_group_tree import ConnectionGroupTree
 from .importer import ConnectionImporter
+from .planner import ImportPlan
+from .progress import ProgressReporter
 from .api_client import GuacamoleAPIClient
+from .checkpoint import CheckpointJournal, default_journal_path
+from .csv_parser import expand_csv_paths
+from .exporter import ConnectionExporter
+from .metrics import ImportMetrics
+from .snapshot_cache import SnapshotCache
+from .throttling import RetryPolicy
+from .tree_renderer import TREE_FORMATS, render_tree
 from . import __version__
 
 
@@ -32,6 +43,84 @@ def setup_logging(verbose: bool = False) -> None:
     # Reduce verbosity of requests library
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("aiohttp").setLevel(logging.WARNING)
+
+
+def add_credential_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the API URL and credential arguments to a parser."""
+    parser.add_argument(
+        "--url",
+        required=False,
+        help="Base URL of the Guacamole API (e.g., 'http://localhost:8080/guacamole/api')",
+    )
+
+    parser.add_argument(
+        "--username",
+        "-u",
+        required=False,
+        help="Guacamole admin username",
+    )
+
+    parser.add_argument(
+        "--password",
+        "-p",
+        required=False,
+        help="Guacamole admin password",
+    )
+
+
+def add_http_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the HTTP connection pool, retry and rate limit arguments to a parser."""
+    parser.add_argument(
+        "--pool-connections",
+        type=int,
+        default=10,
+        help="Number of per-host HTTP connection pools to keep (default: 10)",
+    )
+
+    parser.add_argument(
+        "--pool-maxsize",
+        type=int,
+        help="Maximum number of kept-alive HTTP connections per host "
+        "(default: the larger of 10 and --workers)",
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        dest="compression",
+        action="store_false",
+        help="Do not accept gzip/deflate compressed responses",
+    )
+
+    parser.add_argument(
+        "--tcp-keepalive",
+        type=int,
+        default=60,
+        help="Idle seconds before TCP keep-alive probes are sent, 0 to disable "
+        "(default: 60)",
+    )
+
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries of requests failing with a connection error or HTTP 429/502/503/504 "
+        "(default: 3)",
+    )
+
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=0.5,
+        help="Base delay in seconds of the exponential retry backoff (default: 0.5)",
+    )
+
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Maximum number of API requests per second (default: unlimited)",
+    )
 
 
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
@@ -48,29 +137,140 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     )
 
     parser.add_argument(
-        "csv_file",
+        "csv_files",
+        nargs="*",
+        metavar="csv_file",
+        help="CSV file containing connection data; several files, glob patterns or "
+        "directories of CSV files are merged into one import (not used with --apply)",
+    )
+
+    add_credential_arguments(parser)
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Number of concurrent workers used to create connections (default: 1)",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of connections created per JSON Patch request (default: 1)",
+    )
+
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=None,
+        help="Number of processes parsing CSV files when importing several "
+        "(default: one per CPU)",
+    )
+
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Update existing connections whose hostname, port, protocol or "
+        "username differ from the CSV",
+    )
+
+    parser.add_argument(
+        "--cache",
         type=Path,
-        help="Path to the CSV file containing connection data",
+        help="Path to a SQLite file caching the existing connection tree between runs",
     )
 
     parser.add_argument(
-        "--url",
-        required=False,
-        help="Base URL of the Guacamole API (e.g., 'http://localhost:8080/guacamole/api')",
+        "--cache-ttl",
+        type=float,
+        default=300.0,
+        help="Maximum age in seconds of a cached connection tree (default: 300)",
+    )
+
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument(
+        "--plan",
+        type=Path,
+        metavar="PLAN_FILE",
+        help="Compute the groups and connections to create or update, without "
+        "writing anything, and save them to PLAN_FILE",
+    )
+    plan_group.add_argument(
+        "--apply",
+        type=Path,
+        metavar="PLAN_FILE",
+        help="Apply a plan saved by --plan instead of reading a CSV file",
     )
 
     parser.add_argument(
-        "--username",
-        "-u",
-        required=False,
-        help="Guacamole admin username",
+        "--journal",
+        type=Path,
+        help="Record applied rows in a checkpoint journal at this path "
+        "(default: no journal, or <csv or plan file>.journal.jsonl with --resume)",
     )
 
     parser.add_argument(
-        "--password",
-        "-p",
-        required=False,
-        help="Guacamole admin password",
+        "--resume",
+        action="store_true",
+        help="Skip rows recorded in the checkpoint journal by a previous, "
+        "interrupted import, and keep recording applied rows",
+    )
+
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Use the asyncio client; --workers sets the number of creates in flight "
+        "(requires the 'async' extra)",
+    )
+
+    add_http_arguments(parser)
+
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress lines (rows/s, ETA, failures), 0 to disable "
+        "(default: 10)",
+    )
+
+    parser.add_argument(
+        "--tree",
+        choices=TREE_FORMATS,
+        help="After the import, write the connection tree as indented text, "
+        "JSON Lines or a Graphviz DOT graph",
+    )
+
+    parser.add_argument(
+        "--tree-out",
+        type=Path,
+        help="Write the tree to this file instead of stdout",
+    )
+
+    parser.add_argument(
+        "--tree-depth",
+        type=int,
+        help="Deepest level of the tree to write, the root group being 0 "
+        "(default: unlimited)",
+    )
+
+    parser.add_argument(
+        "--tree-root",
+        help="Full path of the group whose subtree is written (default: ROOT)",
+    )
+
+    parser.add_argument(
+        "--metrics-out",
+        type=Path,
+        help="Write phase timings and per-endpoint request metrics to this JSON file",
+    )
+
+    parser.add_argument(
+        "--metrics-prometheus",
+        type=Path,
+        help="Write the metrics to this file in the Prometheus textfile format",
     )
 
     parser.add_argument(
@@ -86,11 +286,102 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
         version=f"Guacamole CSV Importer {__version__}",
     )
 
+    parsed_args = parser.parse_args(args)
+    if bool(parsed_args.csv_files) == bool(parsed_args.apply):
+        parser.error("give either CSV files or --apply")
+    if parsed_args.tree_depth is not None and parsed_args.tree_depth < 0:
+        parser.error("--tree-depth must not be negative")
+    return parsed_args
+
+
+def parse_export_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments of the export command.
+
+    Args:
+        args: Command-line arguments
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="gu-import export",
+        description="Export the connections of Apache Guacamole to a CSV file",
+    )
+
+    parser.add_argument(
+        "output",
+        help="Path of the CSV file to write, '-' for stdout",
+    )
+
+    add_credential_arguments(parser)
+
+    parser.add_argument(
+        "--root",
+        help="Full path of the group whose connections are exported (default: ROOT)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=8,
+        help="Number of concurrent workers reading connection parameters (default: 8)",
+    )
+
+    add_http_arguments(parser)
+
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress lines, 0 to disable (default: 10)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Enable verbose logging",
+    )
+
     return parser.parse_args(args)
 
 
-def build_api_client(parsed_args: argparse.Namespace) -> GuacamoleAPIClient:
-    """Build an API client from parsed arguments."""
+def export_main(args: List[str]) -> int:
+    """Run the export command.
+
+    Args:
+        args: Command-line arguments of the export command
+
+    Returns:
+        Exit code (0 for success, non-zero for failure)
+    """
+    load_dotenv()
+    parsed_args = parse_export_args(args)
+    setup_logging(parsed_args.verbose)
+
+    logger = logging.getLogger(__name__)
+    try:
+        exporter = ConnectionExporter(
+            build_api_client(parsed_args),
+            workers=parsed_args.workers,
+            progress=ProgressReporter(parsed_args.progress_interval),
+        )
+        exported, failed = exporter.export_connections(
+            parsed_args.output, root_path=parsed_args.root
+        )
+    except Exception as e:
+        logger.exception(f"Error exporting connections: {e}")
+        return 1
+
+    if failed:
+        logger.error(f"Failed to read {failed} connections, exported {exported}")
+        return 1
+    return 0
+
+
+def get_credentials(parsed_args: argparse.Namespace) -> Tuple[str, str, str]:
+    """Get the API URL, username and password from arguments or environment."""
     url = parsed_args.url or os.getenv("GUACAMOLE_URL")
     username = parsed_args.username or os.getenv("GUACAMOLE_USERNAME")
     password = parsed_args.password or os.getenv("GUACAMOLE_PASSWORD")
@@ -101,7 +392,100 @@ def build_api_client(parsed_args: argparse.Namespace) -> GuacamoleAPIClient:
             "and password via arguments or environment variables"
         )
 
-    return GuacamoleAPIClient(url, username, password)
+    return url, username, password
+
+
+def get_pool_maxsize(parsed_args: argparse.Namespace) -> int:
+    """Get the per-host connection pool size, large enough for all workers."""
+    return parsed_args.pool_maxsize or max(10, parsed_args.workers)
+
+
+def get_retry_policy(parsed_args: argparse.Namespace) -> RetryPolicy:
+    """Get the retry policy of the API clients."""
+    return RetryPolicy(total=parsed_args.retries, backoff_factor=parsed_args.backoff)
+
+
+def build_api_client(
+    parsed_args: argparse.Namespace, metrics: Optional[ImportMetrics] = None
+) -> GuacamoleAPIClient:
+    """Build an API client from parsed arguments."""
+    return GuacamoleAPIClient(
+        *get_credentials(parsed_args),
+        pool_connections=parsed_args.pool_connections,
+        pool_maxsize=get_pool_maxsize(parsed_args),
+        compression=parsed_args.compression,
+        tcp_keepalive=parsed_args.tcp_keepalive or None,
+        retry_policy=get_retry_policy(parsed_args),
+        rate_limit=parsed_args.rate_limit,
+        metrics=metrics,
+    )
+
+
+def write_metrics(parsed_args: argparse.Namespace, metrics: Optional[ImportMetrics]) -> None:
+    """Write the metrics files requested by the arguments."""
+    if metrics is None:
+        return
+
+    logger = logging.getLogger(__name__)
+    try:
+        if parsed_args.metrics_out:
+            metrics.write_json(parsed_args.metrics_out)
+            logger.info(f"Wrote metrics to {parsed_args.metrics_out}")
+        if parsed_args.metrics_prometheus:
+            metrics.write_prometheus(parsed_args.metrics_prometheus)
+            logger.info(f"Wrote Prometheus metrics to {parsed_args.metrics_prometheus}")
+    except OSError as e:
+        logger.warning(f"Failed to write metrics: {e}")
+
+
+def write_tree(
+    parsed_args: argparse.Namespace, tree: Optional[ConnectionGroupTree]
+) -> None:
+    """Write the imported tree if the arguments request it."""
+    if not parsed_args.tree or tree is None:
+        return
+
+    logger = logging.getLogger(__name__)
+    options = {
+        "fmt": parsed_args.tree,
+        "max_depth": parsed_args.tree_depth,
+        "root_path": parsed_args.tree_root,
+    }
+    try:
+        if parsed_args.tree_out:
+            with open(parsed_args.tree_out, "w", encoding="utf-8") as tree_file:
+                lines = render_tree(tree, tree_file, **options)
+            logger.info(f"Wrote {lines} tree lines to {parsed_args.tree_out}")
+        else:
+            render_tree(tree, sys.stdout, **options)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to write the tree: {e}")
+
+
+async def import_connections_async(
+    parsed_args: argparse.Namespace, metrics: Optional[ImportMetrics] = None
+) -> Tuple[int, int]:
+    """Import connections with the asyncio client and importer."""
+    from .async_api_client import AsyncGuacamoleAPIClient
+    from .async_importer import AsyncConnectionImporter
+
+    async with AsyncGuacamoleAPIClient(
+        *get_credentials(parsed_args),
+        pool_maxsize=get_pool_maxsize(parsed_args),
+        compression=parsed_args.compression,
+        retry_policy=get_retry_policy(parsed_args),
+        rate_limit=parsed_args.rate_limit,
+        metrics=metrics,
+    ) as client:
+        importer = AsyncConnectionImporter(
+            client,
+            concurrency=parsed_args.workers,
+            metrics=metrics,
+            progress=ProgressReporter(parsed_args.progress_interval),
+        )
+        result = await importer.import_connections(parsed_args.csv_files[0])
+        write_tree(parsed_args, importer.tree)
+        return result
 
 
 def main(args: Optional[List[str]] = None) -> int:
@@ -113,6 +497,15 @@ def main(args: Optional[List[str]] = None) -> int:
     Returns:
         Exit code (0 for success, non-zero for failure)
     """
+    if args is None:
+        args = sys.argv[1:]
+    if args and args[0] == "bench":
+        from .bench import main as bench_main
+
+        return bench_main(args[1:])
+    if args and args[0] == "export":
+        return export_main(args[1:])
+
     load_dotenv()
     parsed_args = parse_args(args)
     setup_logging(parsed_args.verbose)
@@ -120,19 +513,89 @@ def main(args: Optional[List[str]] = None) -> int:
     logger = logging.getLogger(__name__)
     logger.info(f"Guacamole CSV Importer {__version__}")
 
+    metrics = (
+        ImportMetrics()
+        if parsed_args.metrics_out or parsed_args.metrics_prometheus
+        else None
+    )
     try:
-        # Validate CSV file
-        if not parsed_args.csv_file.exists():
-            logger.error(f"CSV file not found: {parsed_args.csv_file}")
-            return 1
-
-        guacamole_api_client = build_api_client(parsed_args)
-
-        # Create importer
-        importer = ConnectionImporter(guacamole_api_client)
-
-        # Import connections
-        successful, total = importer.import_connections(parsed_args.csv_file)
+        # Validate CSV or plan files
+        if parsed_args.apply:
+            if not parsed_args.apply.exists():
+                logger.error(f"Plan file not found: {parsed_args.apply}")
+                return 1
+            journal_path = default_journal_path(parsed_args.apply)
+        else:
+            try:
+                parsed_args.csv_files = expand_csv_paths(parsed_args.csv_files)
+            except FileNotFoundError as e:
+                logger.error(str(e))
+                return 1
+            if len(parsed_args.csv_files) == 1:
+                journal_path = default_journal_path(parsed_args.csv_files[0])
+            else:
+                journal_path = Path("gu-import.journal.jsonl")
+
+        if parsed_args.use_async:
+            unsupported = [
+                flag
+                for flag, given in (
+                    ("--resume", parsed_args.resume),
+                    ("--plan", parsed_args.plan),
+                    ("--apply", parsed_args.apply),
+                    ("--journal", parsed_args.journal),
+                    ("--sync", parsed_args.sync),
+                    ("--cache", parsed_args.cache),
+                    ("--batch-size", parsed_args.batch_size != 1),
+                )
+                if given
+            ]
+            if unsupported:
+                logger.error(f"Not supported with --async: {', '.join(unsupported)}")
+                return 1
+            if len(parsed_args.csv_files) > 1:
+                logger.error("Importing several CSV files is not supported with --async")
+                return 1
+            successful, total = asyncio.run(import_connections_async(parsed_args, metrics))
+        else:
+            guacamole_api_client = build_api_client(parsed_args, metrics)
+
+            # Create importer
+            importer = ConnectionImporter(
+                guacamole_api_client,
+                workers=parsed_args.workers,
+                batch_size=parsed_args.batch_size,
+                sync=parsed_args.sync,
+                snapshot_cache=(
+                    SnapshotCache(parsed_args.cache, parsed_args.cache_ttl)
+                    if parsed_args.cache
+                    else None
+                ),
+                journal=(
+                    CheckpointJournal(
+                        parsed_args.journal or journal_path, resume=parsed_args.resume
+                    )
+                    if parsed_args.journal or parsed_args.resume
+                    else None
+                ),
+                parse_processes=parsed_args.parse_processes,
+                metrics=metrics,
+                progress=ProgressReporter(parsed_args.progress_interval),
+            )
+
+            if parsed_args.plan:
+                plan = importer.plan_connections(parsed_args.csv_files)
+                plan.save(parsed_args.plan)
+                for name, count in plan.summary(parsed_args.batch_size).items():
+                    logger.info(f"Plan {name.replace('_', ' ')}: {count}")
+                return 0
+
+            if parsed_args.apply:
+                successful, total = importer.apply_plan(ImportPlan.load(parsed_args.apply))
+            else:
+                # Import connections
+                successful, total = importer.import_connections(parsed_args.csv_files)
+            write_tree(parsed_args, importer.tree)
 
         # Report results
         if successful == total:
@@ -149,6 +612,9 @@ def main(args: Optional[List[str]] = None) -> int:
         logger.exception(f"Error importing connections: {e}")
         return 1
 
+    finally:
+        write_metrics(parsed_args, metrics)
+
 
 if __name__ == "__main__":
     sys.exit(main())
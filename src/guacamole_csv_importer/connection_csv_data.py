@@ -1,7 +1,24 @@
-from typing import Any, Dict
+import hashlib
+from typing import Any, Dict, Optional
 from dataclasses import dataclass
 
 
+def connection_fingerprint(
+    hostname: Optional[str],
+    port: Optional[str],
+    protocol: Optional[str],
+    username: Optional[str],
+) -> str:
+    """Return a stable hash of the connection settings that the CSV manages.
+
+    Passwords are not part of the fingerprint, as Guacamole does not have to
+    return them when reading connection parameters.
+    """
+    values = [hostname, port, protocol, username]
+    payload = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 @dataclass
 class ConnectionCsvData:
     __slots__ = [
@@ -56,3 +73,8 @@ class ConnectionCsvData:
                 "password": self.password,
             }
         }
+
+    def fingerprint(self) -> str:
+        return connection_fingerprint(
+            self.hostname, self.port, self.protocol, self.username
+        )
@@ -1,61 +1,166 @@
-from typing import List, Dict, Any
-from dataclasses import dataclass, field
+import logging
+import sys
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from .connection_csv_data import connection_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
 
 
-@dataclass
 class ConnectionGroupNode:
-    name: str
-    identifier: str
-    parentIdentifier: str = None
-    type: str = "ORGANIZATIONAL"
-    activeConnections: int = 0
-    attributes: dict = field(default_factory=dict)
-    childrens: List["ConnectionGroupNode"] = field(default_factory=list)
-    connections: List["ConnectionNode"] = field(default_factory=list)
+    """Connection group of a :class:`ConnectionGroupTree`.
 
-    def get_group_in_children(self, group_name: str):
+    Nodes are slotted, and group names and types, which repeat across sites,
+    are interned, so large trees stay small in memory. ``attributes`` is None
+    when the tree does not keep attributes.
+    """
+
+    __slots__ = (
+        "name",
+        "identifier",
+        "parentIdentifier",
+        "type",
+        "activeConnections",
+        "attributes",
+        "childrens",
+        "connections",
+        # name -> child, kept in sync by add_group/add_connection; the lists
+        # above keep the insertion order
+        "_children_by_name",
+        "_connections_by_name",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        identifier: str,
+        parentIdentifier: Optional[str] = None,
+        type: str = "ORGANIZATIONAL",
+        activeConnections: int = 0,
+        attributes: Optional[dict] = None,
+        childrens: Optional[List["ConnectionGroupNode"]] = None,
+        connections: Optional[List["ConnectionNode"]] = None,
+    ):
+        self.name = _intern(name)
+        self.identifier = identifier
+        self.parentIdentifier = parentIdentifier
+        self.type = _intern(type)
+        self.activeConnections = activeConnections
+        self.attributes = attributes
+        self.childrens: List[ConnectionGroupNode] = childrens or []
+        self.connections: List[ConnectionNode] = connections or []
+        self._children_by_name: Dict[str, ConnectionGroupNode] = {}
+        self._connections_by_name: Dict[str, ConnectionNode] = {}
         for child in self.childrens:
-            if child.name == group_name:
-                return child
-        return None
+            self._children_by_name.setdefault(child.name, child)
+        for conn in self.connections:
+            self._connections_by_name.setdefault(conn.name, conn)
+
+    def __repr__(self) -> str:
+        return (
+            f"ConnectionGroupNode(name={self.name!r}, identifier={self.identifier!r}, "
+            f"parentIdentifier={self.parentIdentifier!r}, "
+            f"childrens={len(self.childrens)}, connections={len(self.connections)})"
+        )
+
+    def get_group_in_children(self, group_name: str):
+        return self._children_by_name.get(group_name)
 
     def get_connection_in_children(self, connection_name: str):
-        for child in self.connections:
-            if child.name == connection_name:
-                return child
-        return None
+        return self._connections_by_name.get(connection_name)
 
-    def add_connection(self, connection: Dict[str, Any]) -> "ConnectionNode":
+    def add_connection(
+        self, connection: Dict[str, Any], keep_attributes: bool = True
+    ) -> "ConnectionNode":
         conn = ConnectionNode(
             name=connection["name"],
             identifier=connection["identifier"],
-            parentIdentifier=connection["parentIdentifier"],
+            parentIdentifier=self._parent_identifier(
+                connection.get("parentIdentifier", self.identifier)
+            ),
             protocol=connection["protocol"],
-            attributes=connection["attributes"],
+            attributes=connection.get("attributes", {}) if keep_attributes else None,
+            parameters=connection.get("parameters"),
         )
         self.connections.append(conn)
+        self._connections_by_name.setdefault(conn.name, conn)
         return conn
 
-    def add_group(self, group: Dict[str, Any]) -> "ConnectionGroupNode":
+    def add_group(
+        self, group: Dict[str, Any], keep_attributes: bool = True
+    ) -> "ConnectionGroupNode":
         grp = ConnectionGroupNode(
             name=group["name"],
             identifier=group["identifier"],
-            parentIdentifier=group["parentIdentifier"],
+            parentIdentifier=self._parent_identifier(
+                group.get("parentIdentifier", self.identifier)
+            ),
             type=group["type"],
-            activeConnections=group["activeConnections"],
-            attributes=group["attributes"],
+            activeConnections=group.get("activeConnections", 0),
+            attributes=group.get("attributes", {}) if keep_attributes else None,
         )
         self.childrens.append(grp)
+        self._children_by_name.setdefault(grp.name, grp)
         return grp
 
+    def _parent_identifier(self, parent_identifier: Optional[str]) -> Optional[str]:
+        # share this node's identifier string instead of keeping an equal copy
+        return self.identifier if parent_identifier == self.identifier else parent_identifier
+
 
-@dataclass
 class ConnectionNode:
-    name: str
-    identifier: str
-    parentIdentifier: str
-    protocol: str
-    attributes: dict = field(default_factory=dict)
+    """Connection of a :class:`ConnectionGroupTree`.
+
+    Nodes are slotted and protocol names are interned. ``attributes`` is None
+    when the tree does not keep attributes.
+    """
+
+    __slots__ = (
+        "name",
+        "identifier",
+        "parentIdentifier",
+        "protocol",
+        "attributes",
+        # connection parameters, None until they have been fetched
+        "parameters",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        identifier: str,
+        parentIdentifier: str,
+        protocol: str,
+        attributes: Optional[dict] = None,
+        parameters: Optional[dict] = None,
+    ):
+        self.name = name
+        self.identifier = identifier
+        self.parentIdentifier = parentIdentifier
+        self.protocol = _intern(protocol)
+        self.attributes = attributes
+        self.parameters = parameters
+
+    def __repr__(self) -> str:
+        return (
+            f"ConnectionNode(name={self.name!r}, identifier={self.identifier!r}, "
+            f"parentIdentifier={self.parentIdentifier!r}, protocol={self.protocol!r})"
+        )
+
+    def fingerprint(self) -> Optional[str]:
+        if self.parameters is None:
+            return None
+        return connection_fingerprint(
+            self.parameters.get("hostname"),
+            self.parameters.get("port"),
+            self.protocol,
+            self.parameters.get("username"),
+        )
 
 
 class ConnectionGroupTree:
@@ -64,92 +169,225 @@ class ConnectionGroupTree:
     This class is decoupled from any API or external system.
     """
 
-    def __init__(self):
-        """Initialize an empty connection group tree with a ROOT node."""
+    def __init__(self, keep_attributes: bool = True):
+        """Initialize an empty connection group tree with a ROOT node.
+
+        Args:
+            keep_attributes: Store the attributes of groups and connections
+                (default: True); without them a large tree takes much less
+                memory, and to_data() returns empty attributes
+        """
+        self.keep_attributes = keep_attributes
         self.group_tree_root = ConnectionGroupNode(name="ROOT", identifier="ROOT")
         self.path_mapping: Dict[str, ConnectionGroupNode] = {
             "ROOT": self.group_tree_root
         }
+        # identifier -> group, so parent lookups do not walk the tree
+        self.group_index: Dict[str, ConnectionGroupNode] = {
+            "ROOT": self.group_tree_root
+        }
+        # records whose parent group was not reachable from ROOT
+        self.orphan_groups: List[Dict[str, Any]] = []
+        self.orphan_connections: List[Dict[str, Any]] = []
 
     def find_group(self, group_id: str):
-        stack = [self.group_tree_root]
+        return self.group_index.get(group_id)
 
-        while len(stack) > 0:
-            current = stack.pop()
-            if current.identifier == group_id:
-                return current
-            stack.extend(current.childrens)
+    def get_group_by_path(self, path: str) -> ConnectionGroupNode:
+        """Return the group at a full path.
+
+        Args:
+            path: Path of the group, with or without the leading 'ROOT/'
+                (e.g. 'ROOT/DC1' or 'DC1')
+
+        Returns:
+            The connection group node
+
+        Raises:
+            ValueError: If the group does not exist
+        """
+        path = path.strip("/")
+        if path != "ROOT" and not path.startswith("ROOT/"):
+            path = f"ROOT/{path}"
+        group = self.path_mapping.get(path)
+        if group is None:
+            raise ValueError(f"Connection group {path} does not exist")
+        return group
 
-        return None
+    def add_group(
+        self, parent: ConnectionGroupNode, group: Dict[str, Any]
+    ) -> ConnectionGroupNode:
+        """Add a group under a parent and register it in the lookup indexes."""
+        grp = parent.add_group(group, self.keep_attributes)
+        self._register_group(grp, self.reverse_get_full_path_name(parent, grp.name))
+        return grp
+
+    def _register_group(self, group: ConnectionGroupNode, path: str):
+        if group.identifier is not None:
+            self.group_index[group.identifier] = group
+        self.path_mapping[path] = group
 
     def reverse_get_full_path_name(self, group: ConnectionGroupNode, postfix: str = ""):
-        current_path = group.name
+        names = [group.name]
+        while group.parentIdentifier is not None:
+            group = self.group_index[group.parentIdentifier]
+            names.append(group.name)
+        current_path = "/".join(reversed(names))
         if postfix != "":
             current_path = f"{current_path}/{postfix}"
-        if group.parentIdentifier is None:
-            return current_path
-        return self.reverse_get_full_path_name(
-            self.find_group(group.parentIdentifier), current_path
-        )
+        return current_path
 
     def build_from_data(
         self, connection_groups: List[Dict[str, Any]], connections: List[Dict[str, Any]]
     ):
-        tmp_groups = [*connection_groups]
-        while len(tmp_groups) > 0:
-            group = tmp_groups.pop(0)
-            parent_id = group["parentIdentifier"]
-            parent_obj = self.find_group(parent_id)
-            if parent_obj is not None:
-                grp = ConnectionGroupNode(
-                    name=group["name"],
-                    identifier=group["identifier"],
-                    parentIdentifier=group["parentIdentifier"],
-                    type=group["type"],
-                    activeConnections=group["activeConnections"],
-                    attributes=group["attributes"],
+        """Attach groups and connections to the tree by their parent identifiers.
+
+        Records are bucketed by ``parentIdentifier`` and attached breadth-first
+        from ROOT, so every record is visited once. Records whose parent is not
+        reachable from ROOT are kept in ``orphan_groups`` and
+        ``orphan_connections`` instead of being attached.
+        """
+        groups_by_parent: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for group in connection_groups:
+            groups_by_parent[group["parentIdentifier"]].append(group)
+
+        connections_by_parent: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for connection in connections:
+            connections_by_parent[connection["parentIdentifier"]].append(connection)
+
+        queue = deque([(self.group_tree_root, "ROOT")])
+        while queue:
+            parent_obj, parent_path = queue.popleft()
+
+            for group in groups_by_parent.pop(parent_obj.identifier, []):
+                grp = parent_obj.add_group(group, self.keep_attributes)
+                self._register_group(grp, f"{parent_path}/{grp.name}")
+
+            for child in parent_obj.childrens:
+                queue.append((child, f"{parent_path}/{child.name}"))
+
+            for connection in connections_by_parent.pop(parent_obj.identifier, []):
+                parent_obj.add_connection(connection, self.keep_attributes)
+
+        self.orphan_groups = [
+            group for groups in groups_by_parent.values() for group in groups
+        ]
+        self.orphan_connections = [
+            connection
+            for bucket in connections_by_parent.values()
+            for connection in bucket
+        ]
+        if self.orphan_groups or self.orphan_connections:
+            logger.warning(
+                f"Skipped {len(self.orphan_groups)} connection groups and "
+                f"{len(self.orphan_connections)} connections whose parent group "
+                "is not reachable from ROOT"
+            )
+
+    def build_from_nested(self, root_group: Dict[str, Any]):
+        """Attach the groups and connections of a nested tree of ROOT.
+
+        ``root_group`` is the body of ``GET /connectionGroups/ROOT/tree``, in
+        which every group lists its child groups in ``childConnectionGroups``
+        and its connections in ``childConnections``. Records are attached in
+        one pass, without recursion; records without a ``parentIdentifier``
+        get the group they are nested in.
+        """
+        stack = [(self.group_tree_root, "ROOT", root_group)]
+        while stack:
+            parent_obj, parent_path, record = stack.pop()
+
+            for connection in record.get("childConnections") or ():
+                parent_obj.add_connection(connection, self.keep_attributes)
+
+            for group in record.get("childConnectionGroups") or ():
+                grp = parent_obj.add_group(group, self.keep_attributes)
+                path = f"{parent_path}/{grp.name}"
+                self._register_group(grp, path)
+                stack.append((grp, path, group))
+
+    def counts(self) -> Tuple[int, int]:
+        """Return the number of groups, ROOT excluded, and of connections."""
+        groups = 0
+        connections = 0
+        stack = [self.group_tree_root]
+        while stack:
+            current = stack.pop()
+            connections += len(current.connections)
+            groups += len(current.childrens)
+            stack.extend(current.childrens)
+        return groups, connections
+
+    def to_data(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Flatten the tree into the records accepted by build_from_data.
+
+        Connection parameters are left out: they can change on the server at
+        any time, so a tree rebuilt from the records reads them again.
+
+        Returns:
+            Tuple of (connection group dictionaries, connection dictionaries)
+        """
+        groups: List[Dict[str, Any]] = []
+        connections: List[Dict[str, Any]] = []
+
+        stack = [self.group_tree_root]
+        while stack:
+            current = stack.pop()
+            if current is not self.group_tree_root:
+                groups.append(
+                    {
+                        "name": current.name,
+                        "identifier": current.identifier,
+                        "parentIdentifier": current.parentIdentifier,
+                        "type": current.type,
+                        "activeConnections": current.activeConnections,
+                        "attributes": current.attributes or {},
+                    }
                 )
-                parent_obj.childrens.append(grp)
-                self.path_mapping[self.reverse_get_full_path_name(grp)] = grp
-            else:
-                tmp_groups.append(group)
-
-        tmp_connections = [*connections]
-        while len(tmp_connections) > 0:
-            connection = tmp_connections.pop(0)
-            parent_id = connection["parentIdentifier"]
-            parent_obj = self.find_group(parent_id)
-            if parent_obj is not None:
-                parent_obj.connections.append(
-                    ConnectionNode(
-                        name=connection["name"],
-                        identifier=connection["identifier"],
-                        parentIdentifier=connection["parentIdentifier"],
-                        protocol=connection["protocol"],
-                        attributes=connection["attributes"],
-                    )
+            for conn in current.connections:
+                connections.append(
+                    {
+                        "name": conn.name,
+                        "identifier": conn.identifier,
+                        "parentIdentifier": conn.parentIdentifier,
+                        "protocol": conn.protocol,
+                        "attributes": conn.attributes or {},
+                    }
                 )
-            else:
-                tmp_connections.append(connection)
-
-    def print_tree(self):
-        root = self.group_tree_root
-        print("")
-        print(f"- Group: {root.name} (ID: {root.identifier})")
-        for connection in root.connections:
-            print(f"  * Connection: {connection.name} (ID: {connection.identifier})")
-
-        for child in root.childrens:
-            self._print_tree_internal(child, 1)
-
-    def _print_tree_internal(self, current, indent):
-        print("  " * indent + f"- Group: {current.name} (ID: {current.identifier})")
-
-        for connection in current.connections:
-            print(
-                "  " * (indent + 1)
-                + f"* Connection: {connection.name} (ID: {connection.identifier})"
-            )
+            stack.extend(reversed(current.childrens))
+
+        return groups, connections
+
+    def walk(
+        self, start: Optional[ConnectionGroupNode] = None, max_depth: Optional[int] = None
+    ) -> Iterator[Tuple[int, str, Union[ConnectionGroupNode, ConnectionNode]]]:
+        """Walk a subtree depth-first, without recursion.
+
+        Each group is followed by its connections, then by its child groups.
+
+        Args:
+            start: Group to start from (default: ROOT)
+            max_depth: Deepest level to visit, ``start`` being level 0
+                (default: None, i.e. unlimited)
+
+        Yields:
+            Tuples of (depth, full path, group or connection node)
+        """
+        if start is None:
+            start = self.group_tree_root
+        stack = [(0, self.reverse_get_full_path_name(start), start)]
+        while stack:
+            depth, path, group = stack.pop()
+            yield depth, path, group
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for conn in group.connections:
+                yield depth + 1, f"{path}/{conn.name}", conn
+            for child in reversed(group.childrens):
+                stack.append((depth + 1, f"{path}/{child.name}", child))
+
+    def print_tree(self, stream: Optional[TextIO] = None):
+        """Write the tree as indented text, to stdout by default."""
+        from .tree_renderer import render_tree
 
-        for child in current.childrens:
-            self._print_tree_internal(child, indent + 1)
+        render_tree(self, stream if stream is not None else sys.stdout)
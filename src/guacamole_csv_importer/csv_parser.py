@@ -4,24 +4,55 @@ This module handles the parsing and validation of CSV files containing
 Guacamole connection information.
 """
 
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Union
 import csv
+import glob
+import io
 import logging
+from functools import reduce
+from operator import itemgetter
 from pathlib import Path
 
+from .connection_csv_data import ConnectionCsvData
+
+try:
+    import pyarrow
+    import pyarrow.compute as pyarrow_compute
+    from pyarrow import csv as pyarrow_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
 logger = logging.getLogger(__name__)
 
+# Decoders of CSVParser.iter_rows; "auto" uses pyarrow when it is installed
+CSV_BACKENDS = ("auto", "csv", "pyarrow")
+
 
 class CSVParser:
     """Parser for CSV files containing Guacamole connection information."""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, backend: str = "auto"):
         """Initialize the CSV parser.
 
         Args:
             file_path: Path to the CSV file to parse
+            backend: Decoder used by :meth:`iter_rows`, one of CSV_BACKENDS
+                (default: "auto", i.e. pyarrow if installed, else csv)
+
+        Raises:
+            ValueError: If the backend is unknown
+            ImportError: If the pyarrow backend is requested but not installed
         """
+        if backend not in CSV_BACKENDS:
+            raise ValueError(f"Unknown CSV backend '{backend}'")
+        if backend == "pyarrow" and pyarrow is None:
+            raise ImportError(
+                "The pyarrow CSV backend requires pyarrow. "
+                "Install it with 'pip install guacamole-csv-importer[fast]'"
+            )
         self.file_path = Path(file_path)
+        self.backend = backend
         # site,device_name,hostname,protocol,port,username,password
         self.required_fields = [
             "site",
@@ -56,6 +87,31 @@ class CSVParser:
         Returns:
             List of dictionaries, each representing a connection
 
+        Raises:
+            FileNotFoundError: If the CSV file does not exist
+            ValueError: If the CSV file is invalid
+        """
+        connections = list(self._iter_dicts())
+        logger.info(f"Successfully parsed {len(connections)} connections from CSV")
+        return connections
+
+    def iter_rows(self) -> Iterator[ConnectionCsvData]:
+        """Stream validated connections from the CSV file.
+
+        Rows are read lazily, so memory use does not grow with the size of the
+        file. Invalid rows are logged and skipped, as in :meth:`parse`.
+
+        This is the fast path of the parser. With the pyarrow backend, the
+        file is decoded column-wise in batches. Otherwise the header is mapped
+        to column indexes once, and each ``csv.reader`` row is turned into a
+        ConnectionCsvData without building intermediate dictionaries. Both
+        backends yield the same rows: from the first row which pyarrow rejects
+        but the csv module accepts, e.g. a row with extra trailing columns, the
+        rest of the file is decoded by the csv module.
+
+        Yields:
+            One ConnectionCsvData per valid row
+
         Raises:
             FileNotFoundError: If the CSV file does not exist
             ValueError: If the CSV file is invalid
@@ -63,7 +119,143 @@ class CSVParser:
         if not self.file_path.exists():
             raise FileNotFoundError(f"CSV file not found: {self.file_path}")
 
-        connections = []
+        if self.backend == "pyarrow" or (self.backend == "auto" and pyarrow is not None):
+            with open(self.file_path, "r", newline="", encoding="utf-8") as csvfile:
+                headers = next(csv.reader(csvfile), [])
+            if not self.validate_headers(headers):
+                raise ValueError("Invalid CSV headers")
+
+            fallback: List[int] = []
+            yielded = 0
+            for connection in self._iter_rows_arrow(headers, fallback):
+                yielded += 1
+                yield connection
+            if not fallback:
+                return
+            # rows before the one pyarrow could not decode were already yielded
+            logger.info(
+                f"Line {fallback[0]} does not have as many columns as the header, "
+                "decoding the rest of the file with the csv module"
+            )
+            yield from self._iter_rows_csv(skip=yielded)
+            return
+
+        yield from self._iter_rows_csv()
+
+    def _iter_rows_csv(self, skip: int = 0) -> Iterator[ConnectionCsvData]:
+        """Stream connections decoded by ``csv.reader``.
+
+        Args:
+            skip: Number of valid rows to leave out, silently, from the start
+        """
+        try:
+            with open(self.file_path, "r", newline="", encoding="utf-8") as csvfile:
+                reader = csv.reader(csvfile)
+
+                headers = next(reader, [])
+                if not self.validate_headers(headers):
+                    raise ValueError("Invalid CSV headers")
+
+                # required_fields are in the order of the ConnectionCsvData fields
+                indexes = [headers.index(field) for field in self.required_fields]
+                get_fields = itemgetter(*indexes)
+
+                for row in reader:
+                    try:
+                        values = get_fields(row)
+                    except IndexError:  # short row
+                        if not row:
+                            continue
+                    else:
+                        if all(values):
+                            if skip:
+                                skip -= 1
+                                continue
+                            yield ConnectionCsvData(*values)
+                            continue
+
+                    if skip:
+                        continue
+                    missing = next(
+                        field
+                        for field, index in zip(self.required_fields, indexes)
+                        if index >= len(row) or not row[index]
+                    )
+                    logger.warning(
+                        f"Skipping line {reader.line_num}: Missing required field: {missing}"
+                    )
+
+        except csv.Error as e:
+            raise ValueError(f"Error parsing CSV file: {e}")
+
+    def _iter_rows_arrow(
+        self, headers: List[str], fallback: List[int]
+    ) -> Iterator[ConnectionCsvData]:
+        """Stream connections decoded column-wise by pyarrow.
+
+        pyarrow rejects rows whose number of columns differs from the header.
+        Rejected rows which the csv module would accept, e.g. rows with extra
+        trailing columns, stop the decoding: their line number is appended to
+        ``fallback`` and the rows of the failed batch are not yielded.
+        """
+        indexes = [headers.index(field) for field in self.required_fields]
+
+        def handle_invalid_row(row) -> str:
+            values = next(csv.reader(io.StringIO(row.text)), [])
+            if all(index < len(values) and values[index] for index in indexes):
+                fallback.append(row.number)
+                return "error"
+            logger.warning(
+                f"Skipping line {row.number}: expected {row.expected_columns} "
+                f"columns, got {row.actual_columns}"
+            )
+            return "skip"
+
+        try:
+            reader = pyarrow_csv.open_csv(
+                str(self.file_path),
+                parse_options=pyarrow_csv.ParseOptions(
+                    newlines_in_values=True, invalid_row_handler=handle_invalid_row
+                ),
+                convert_options=pyarrow_csv.ConvertOptions(
+                    column_types={field: pyarrow.string() for field in self.required_fields},
+                    include_columns=self.required_fields,
+                    strings_can_be_null=False,
+                ),
+            )
+            for batch in reader:
+                # rows whose required fields are all non-empty
+                valid = reduce(
+                    pyarrow_compute.and_,
+                    (
+                        pyarrow_compute.greater(pyarrow_compute.utf8_length(column), 0)
+                        for column in batch.columns
+                    ),
+                )
+                if not pyarrow_compute.all(valid).as_py():
+                    self._log_invalid_rows(batch.filter(pyarrow_compute.invert(valid)))
+                    batch = batch.filter(valid)
+
+                yield from map(
+                    ConnectionCsvData,
+                    *(batch.column(field).to_pylist() for field in self.required_fields),
+                )
+        except pyarrow.ArrowInvalid as e:
+            if fallback:
+                return
+            raise ValueError(f"Error parsing CSV file: {e}")
+
+    def _log_invalid_rows(self, batch) -> None:
+        for row in batch.to_pylist():
+            missing = next(field for field in self.required_fields if not row[field])
+            logger.warning(
+                f"Skipping row of '{row['device_name']}': Missing required field: {missing}"
+            )
+
+    def _iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Stream processed connection dictionaries from the CSV file."""
+        if not self.file_path.exists():
+            raise FileNotFoundError(f"CSV file not found: {self.file_path}")
 
         try:
             with open(self.file_path, "r", newline="", encoding="utf-8") as csvfile:
@@ -80,16 +272,13 @@ class CSVParser:
                     try:
                         connection = self._process_row(row)
                         if connection:
-                            connections.append(connection)
+                            yield connection
                     except ValueError as e:
                         logger.warning(f"Skipping row {row_num}: {e}")
 
         except csv.Error as e:
             raise ValueError(f"Error parsing CSV file: {e}")
 
-        logger.info(f"Successfully parsed {len(connections)} connections from CSV")
-        return connections
-
     def _process_row(self, row: Dict[str, str]) -> Optional[Dict[str, Any]]:
         """Process a single row from the CSV file.
 
@@ -128,3 +317,64 @@ class CSVParser:
                 connection["parameters"][key] = value
 
         return connection
+
+
+def expand_csv_paths(inputs: Iterable[Union[str, Path]]) -> List[Path]:
+    """Expand CSV file arguments into a list of files.
+
+    Each input may be a file, a glob pattern, or a directory, which stands
+    for the ``*.csv`` files directly inside it. Files are returned in sorted
+    order within each input, and each file only once.
+
+    Args:
+        inputs: Files, glob patterns or directories
+
+    Returns:
+        Paths of the CSV files
+
+    Raises:
+        FileNotFoundError: If an input matches no file
+    """
+    paths: List[Path] = []
+    for item in inputs:
+        item_path = Path(item)
+        if item_path.is_dir():
+            matches = sorted(item_path.glob("*.csv"))
+        elif item_path.exists():
+            matches = [item_path]
+        else:
+            matches = [Path(match) for match in sorted(glob.glob(str(item)))]
+        if not matches:
+            raise FileNotFoundError(f"No CSV file found for '{item}'")
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+
+def _parse_file(file_path: str) -> List[ConnectionCsvData]:
+    return list(CSVParser(file_path).iter_rows())
+
+
+def parse_csv_files(
+    file_paths: List[Path], processes: Optional[int] = None
+) -> Iterator[List[ConnectionCsvData]]:
+    """Parse CSV files in a process pool.
+
+    Args:
+        file_paths: Paths of the CSV files
+        processes: Number of parser processes (default: None, i.e. one per
+            CPU); with 1, or a single file, files are parsed in this process
+
+    Yields:
+        The valid rows of each file, in the order of ``file_paths``
+
+    Raises:
+        FileNotFoundError: If a CSV file does not exist
+        ValueError: If a CSV file is invalid
+    """
+    if processes == 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield _parse_file(str(file_path))
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        yield from pool.map(_parse_file, [str(file_path) for file_path in file_paths])
@@ -0,0 +1,170 @@
+"""Guacamole CSV exporter module.
+
+This module writes the connections of a live Guacamole server back to a CSV file in
+the format read by :class:`~guacamole_csv_importer.csv_parser.CSVParser`, for
+backups and round-trips of the importer.
+"""
+
+import csv
+import logging
+import os
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Deque, Iterator, Optional, TextIO, Tuple, Union
+
+from .api_client import GuacamoleAPIClient
+from .connection_group_tree import ConnectionGroupTree, ConnectionNode
+from .progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ["site", "device_name", "hostname", "protocol", "port", "username", "password"]
+
+
+class ConnectionExporter:
+    """Exporter of Guacamole connections to CSV files."""
+
+    def __init__(
+        self,
+        api_client: GuacamoleAPIClient,
+        workers: int = 8,
+        progress: Optional[ProgressReporter] = None,
+    ):
+        """Initialize the connection exporter.
+
+        Args:
+            api_client: Guacamole API client
+            workers: Number of concurrent workers reading connection parameters
+                (default: 8)
+            progress: Reporter of the export progress (default: a
+                ProgressReporter logging every 10 seconds)
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.api_client = api_client
+        self.workers = workers
+        self.progress = progress if progress is not None else ProgressReporter()
+
+    def export_connections(
+        self, output: Union[str, Path, TextIO], root_path: Optional[str] = None
+    ) -> Tuple[int, int]:
+        """Export the connections of the server, or of one of its groups, to CSV.
+
+        The parameters of the connections are read by the client's
+        :meth:`~GuacamoleAPIClient.iter_connection_parameters` on
+        ``self.workers`` threads, and rows are written as they arrive, in
+        tree order. Parameters are not cached, so memory does not grow with
+        the number of exported connections. A file is written next to its
+        final path and renamed once complete, so an interrupted export never
+        replaces a previous one.
+
+        Connections whose parameters cannot be read are logged and left out.
+        Guacamole may not return passwords; such rows are written with an
+        empty password and have to be completed before they can be imported.
+
+        Args:
+            output: Path of the CSV file, '-' for stdout, or a text stream
+            root_path: Full path of the group to export (e.g. 'ROOT/DC1')
+                (default: None, i.e. all connections)
+
+        Returns:
+            Tuple of (number of exported connections, number of failed reads)
+
+        Raises:
+            ValueError: If authentication fails or the group does not exist
+        """
+        if not self.api_client.authenticate():
+            raise ValueError("Failed to authenticate with Guacamole API")
+
+        tree = ConnectionGroupTree(keep_attributes=False)
+        tree.build_from_nested(self.api_client.get_connection_tree())
+
+        start = tree.get_group_by_path(root_path) if root_path is not None else None
+
+        if not isinstance(output, (str, Path)):
+            return self._write_rows(tree, start, output)
+        if str(output) == "-":
+            return self._write_rows(tree, start, sys.stdout)
+
+        path = Path(output)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            # create the file private, rows hold the passwords Guacamole returns
+            fd = os.open(str(tmp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.chmod(tmp_path, 0o600)
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as csvfile:
+                result = self._write_rows(tree, start, csvfile)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        logger.info(f"Exported {result[0]} connections to {path}")
+        return result
+
+    def _write_rows(self, tree: ConnectionGroupTree, start, stream: TextIO) -> Tuple[int, int]:
+        """Read the parameters of the connections and write them as CSV rows."""
+        writer = csv.writer(stream)
+        writer.writerow(CSV_FIELDS)
+
+        exported = 0
+        failed = 0
+        incomplete = 0
+        progress = self.progress
+        progress.start(total=sum(1 for _ in self._iter_connections(tree, start)))
+
+        connections = self._iter_connections(tree, start)
+        # sites and connections in the order their parameters are requested
+        requested: Deque[Tuple[str, ConnectionNode]] = deque()
+
+        def identifiers() -> Iterator[str]:
+            for site, conn in connections:
+                requested.append((site, conn))
+                yield conn.identifier
+
+        for _, parameters in self.api_client.iter_connection_parameters(
+            identifiers(), self.workers
+        ):
+            site, conn = requested.popleft()
+            if parameters is None:
+                logger.warning(f"Skipping connection {conn.name} in {site}")
+                failed += 1
+                progress.update(failed=1, in_flight=len(requested))
+                continue
+
+            row = [
+                site,
+                conn.name,
+                parameters.get("hostname", ""),
+                conn.protocol,
+                parameters.get("port", ""),
+                parameters.get("username", ""),
+                parameters.get("password", ""),
+            ]
+            if not all(row):
+                incomplete += 1
+            writer.writerow(row)
+            exported += 1
+            progress.update(done=1, in_flight=len(requested))
+
+        progress.finish()
+        if incomplete:
+            logger.warning(
+                f"{incomplete} exported rows have empty fields (e.g. passwords not "
+                "returned by Guacamole) and are skipped on import until completed"
+            )
+        return exported, failed
+
+    @staticmethod
+    def _iter_connections(
+        tree: ConnectionGroupTree, start=None
+    ) -> Iterator[Tuple[str, ConnectionNode]]:
+        """Yield the connections of a subtree with their sites.
+
+        Sites are written without the 'ROOT/' prefix, as in hand-written CSV
+        files; connections directly under ROOT get the site 'ROOT'.
+        """
+        for _, path, node in tree.walk(start):
+            if isinstance(node, ConnectionNode):
+                site = path[: -len(node.name) - 1]
+                yield site[len("ROOT/"):] if site.startswith("ROOT/") else site, node
@@ -0,0 +1,320 @@
+"""In-process stand-in for the Guacamole REST API.
+
+This module provides a small HTTP server implementing the parts of the Guacamole
+REST API used by the importer. It keeps its state in memory and can inject latency
+and errors, which makes it suitable for benchmarks and integration tests.
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DATA_SOURCE = "postgresql"
+
+
+class FakeGuacamoleServer:
+    """In-memory Guacamole REST API served from a background thread.
+
+    Use it as a context manager; :attr:`url` is the API base URL to pass to
+    the clients.
+    """
+
+    def __init__(
+        self,
+        username: str = "guacadmin",
+        password: str = "guacadmin",
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """Initialize the fake server.
+
+        Args:
+            username: Accepted username
+            password: Accepted password
+            latency: Seconds added to every response
+            error_rate: Fraction of requests answered with 503 Service Unavailable
+            seed: Seed of the error injection, for reproducible runs
+        """
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.error_rate = error_rate
+        # answer writes with 403, as for a user lacking the permission to create
+        self.read_only = False
+        self.token = "FAKE-TOKEN-0"
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self.connections: Dict[str, Dict[str, Any]] = {}
+        self.parameters: Dict[str, Dict[str, str]] = {}
+        self.request_count = 0
+        self._next_id = 1
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the fake API."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "FakeGuacamoleServer":
+        """Start serving on a free localhost port."""
+        server = self
+
+        class Handler(_FakeGuacamoleHandler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeGuacamoleServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def expire_token(self) -> None:
+        """Invalidate the current token, as a Guacamole session timeout would."""
+        with self._lock:
+            self.token = f"FAKE-TOKEN-{self._new_id()}"
+
+    def _new_id(self) -> str:
+        identifier = str(self._next_id)
+        self._next_id += 1
+        return identifier
+
+    def add_group(self, group: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            if not group.get("name"):
+                return 400, {"message": "Connection group names must not be blank."}
+            identifier = self._new_id()
+            self.groups[identifier] = {
+                "name": group["name"],
+                "identifier": identifier,
+                "parentIdentifier": group.get("parentIdentifier", "ROOT"),
+                "type": group.get("type", "ORGANIZATIONAL"),
+                "activeConnections": 0,
+                "attributes": group.get("attributes", {}),
+            }
+            return 200, self.groups[identifier]
+
+    def add_connection(self, connection: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            if not connection.get("name"):
+                return 400, {"message": "Connection names must not be blank."}
+            identifier = self._new_id()
+            self._store_connection(identifier, connection)
+            return 200, self.connections[identifier]
+
+    def connection_tree(self, group_id: str) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            if group_id == "ROOT":
+                root = {
+                    "name": "ROOT",
+                    "identifier": "ROOT",
+                    "type": "ORGANIZATIONAL",
+                    "activeConnections": 0,
+                    "attributes": {},
+                }
+            elif group_id in self.groups:
+                root = self.groups[group_id]
+            else:
+                return 404, {"message": "Not Found"}
+
+            nested: Dict[str, Dict[str, Any]] = {group_id: dict(root)}
+            for identifier, group in self.groups.items():
+                nested.setdefault(identifier, dict(group))
+            # like Guacamole, leave out the lists of groups without children
+            for identifier, group in self.groups.items():
+                parent = nested.get(group["parentIdentifier"])
+                if parent is not None:
+                    parent.setdefault("childConnectionGroups", []).append(nested[identifier])
+            for connection in self.connections.values():
+                parent = nested.get(connection["parentIdentifier"])
+                if parent is not None:
+                    parent.setdefault("childConnections", []).append(dict(connection))
+            return 200, nested[group_id]
+
+    def _store_connection(self, identifier: str, connection: Dict[str, Any]) -> None:
+        self.connections[identifier] = {
+            "name": connection["name"],
+            "identifier": identifier,
+            "parentIdentifier": connection.get("parentIdentifier", "ROOT"),
+            "protocol": connection.get("protocol"),
+            "attributes": connection.get("attributes", {}),
+            "activeConnections": 0,
+        }
+        self.parameters[identifier] = dict(connection.get("parameters") or {})
+
+
+class _FakeGuacamoleHandler(BaseHTTPRequestHandler):
+    """Request handler of :class:`FakeGuacamoleServer`."""
+
+    fake: FakeGuacamoleServer
+    protocol_version = "HTTP/1.1"
+
+    _session_path = re.compile(
+        r"^/api/session/data/(?P<ds>[^/]+)/(?P<kind>connectionGroups|connections)"
+        r"(?:/(?P<id>[^/]+))?(?:/(?P<sub>parameters|tree))?$"
+    )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def do_PATCH(self) -> None:
+        self._handle("PATCH")
+
+    def _handle(self, method: str) -> None:
+        fake = self.fake
+        with fake._lock:
+            fake.request_count += 1
+            inject_error = fake._random.random() < fake.error_rate
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if inject_error:
+            self._send(503, {"message": "Service Unavailable"})
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/api/tokens" and method == "POST":
+            form = parse_qs(body.decode("utf-8"))
+            if (
+                form.get("username", [""])[0] == fake.username
+                and form.get("password", [""])[0] == fake.password
+            ):
+                self._send(
+                    200,
+                    {
+                        "authToken": fake.token,
+                        "username": fake.username,
+                        "dataSource": DATA_SOURCE,
+                        "availableDataSources": [DATA_SOURCE],
+                    },
+                )
+            else:
+                self._send(403, {"message": "Invalid login", "type": "INVALID_CREDENTIALS"})
+            return
+
+        match = self._session_path.match(url.path)
+        if match is None or match.group("ds") != DATA_SOURCE:
+            self._send(404, {"message": "Not Found"})
+            return
+
+        if query.get("token", [""])[0] != fake.token:
+            self._send(403, {"message": "Permission Denied.", "type": "PERMISSION_DENIED"})
+            return
+        if fake.read_only and method != "GET":
+            self._send(403, {"message": "Permission Denied.", "type": "PERMISSION_DENIED"})
+            return
+
+        payload = json.loads(body) if body else None
+        status, response = self._route(
+            method, match.group("kind"), match.group("id"), match.group("sub"), payload
+        )
+        self._send(status, response)
+
+    def _route(
+        self,
+        method: str,
+        kind: str,
+        identifier: Optional[str],
+        sub: Optional[str],
+        payload: Any,
+    ) -> Tuple[int, Any]:
+        fake = self.fake
+
+        if kind == "connectionGroups":
+            if method == "GET" and identifier is None:
+                with fake._lock:
+                    return 200, dict(fake.groups)
+            if method == "GET" and sub == "tree":
+                return fake.connection_tree(identifier)
+            if method == "POST" and identifier is None:
+                return fake.add_group(payload)
+            return 404, {"message": "Not Found"}
+
+        if method == "GET" and identifier is None:
+            with fake._lock:
+                return 200, dict(fake.connections)
+        if method == "POST" and identifier is None:
+            return fake.add_connection(payload)
+        if method == "PATCH" and identifier is None:
+            return self._patch_connections(payload)
+        if method == "GET" and sub is None:
+            with fake._lock:
+                if identifier not in fake.connections:
+                    return 404, {"message": "Not Found"}
+                return 200, dict(fake.connections[identifier])
+        if method == "GET" and sub == "parameters":
+            with fake._lock:
+                if identifier not in fake.parameters:
+                    return 404, {"message": "Not Found"}
+                return 200, dict(fake.parameters[identifier])
+        if method == "PUT" and sub is None:
+            with fake._lock:
+                if identifier not in fake.connections:
+                    return 404, {"message": "Not Found"}
+                fake._store_connection(identifier, payload)
+                return 204, None
+        return 404, {"message": "Not Found"}
+
+    def _patch_connections(self, patch: Any) -> Tuple[int, Any]:
+        fake = self.fake
+        with fake._lock:
+            # Guacamole applies a patch in one transaction: validate first
+            if any(
+                operation.get("op") != "add" or not operation["value"].get("name")
+                for operation in patch
+            ):
+                return 400, {"message": "Connection names must not be blank.", "patches": []}
+
+            outcomes = []
+            for operation in patch:
+                identifier = fake._new_id()
+                fake._store_connection(identifier, operation["value"])
+                outcomes.append({"op": "add", "path": "/", "identifier": identifier})
+            return 200, {"patches": outcomes}
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -5,130 +5,822 @@ into Apache Guacamole.
 """
 
 import logging
-from typing import Any, Dict, List, Tuple
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from .api_client import GuacamoleAPIClient
+from .checkpoint import CheckpointJournal
 from .connection_csv_data import ConnectionCsvData
-from .connection_group_tree import (ConnectionGroupNode, ConnectionGroupTree)
-from .csv_parser import CSVParser
+from .connection_group_tree import (
+    ConnectionGroupNode,
+    ConnectionGroupTree,
+    ConnectionNode,
+)
+from .csv_parser import CSVParser, parse_csv_files
+from .metrics import ImportMetrics
+from .planner import ImportPlan
+from .progress import ProgressReporter
+from .snapshot_cache import SnapshotCache
 
 logger = logging.getLogger(__name__)
 
+# Outcomes of syncing an existing connection with its CSV row
+SYNC_UPDATED = "updated"
+SYNC_UNCHANGED = "unchanged"
+SYNC_FAILED = "failed"
 
-class ConnectionImporter:
+# A CSV file, or several CSV files imported as one
+CsvFiles = Union[str, Path, Sequence[Union[str, Path]]]
+
+
+class BaseConnectionImporter:
+    """Shared, I/O free helpers of the synchronous and asynchronous importers."""
+
+    # collector of the phase timings, set by the importers
+    metrics: Optional[ImportMetrics] = None
+
+    def _phase(self, name: str) -> ContextManager[None]:
+        """Time a phase of the import, if metrics are collected.
+
+        Args:
+            name: Name of the phase (e.g. 'tree_fetch')
+        """
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.phase(name)
+
+    @staticmethod
+    def _iter_connection_data(csv_file_path: str) -> Iterator[ConnectionCsvData]:
+        """Stream the CSV rows with every site path normalized under ROOT.
+
+        Args:
+            csv_file_path: Path to the CSV file
+
+        Yields:
+            One connection row at a time
+        """
+        for conn_data in CSVParser(csv_file_path).iter_rows():
+            yield BaseConnectionImporter._normalize_site(conn_data)
+
+    @staticmethod
+    def _normalize_site(conn_data: ConnectionCsvData) -> ConnectionCsvData:
+        # 'ROOT' alone is the root group, as written by the exporter
+        if conn_data.site != "ROOT" and not conn_data.site.startswith("ROOT/"):
+            conn_data.site = "ROOT/" + conn_data.site
+        return conn_data
+
+    @classmethod
+    def _merge_connection_data(
+        cls, csv_file_paths: Sequence[Union[str, Path]], processes: Optional[int] = None
+    ) -> List[ConnectionCsvData]:
+        """Parse several CSV files in a process pool and merge their rows.
+
+        Rows are deduplicated by (site, device name); the first row wins, in
+        the order of ``csv_file_paths``.
+
+        Args:
+            csv_file_paths: Paths to the CSV files
+            processes: Number of parser processes (default: None, i.e. one per CPU)
+
+        Returns:
+            The merged rows, with every site path normalized under ROOT
+        """
+        rows: Dict[Tuple[str, str], ConnectionCsvData] = {}
+        duplicates = 0
+        for file_rows in parse_csv_files(list(csv_file_paths), processes):
+            for conn_data in file_rows:
+                conn_data = cls._normalize_site(conn_data)
+                key = (conn_data.site, conn_data.device_name)
+                if key in rows:
+                    duplicates += 1
+                    continue
+                rows[key] = conn_data
+
+        if duplicates:
+            logger.warning(f"Ignored {duplicates} duplicate rows across the CSV files")
+        logger.info(f"Merged {len(rows)} rows from {len(csv_file_paths)} CSV files")
+        return list(rows.values())
+
+    @staticmethod
+    def _resolve_group_path(
+        tree: ConnectionGroupTree, site: str
+    ) -> Tuple[ConnectionGroupNode, List[str]]:
+        """Find the deepest existing group of a site path.
+
+        Args:
+            tree: Tree of the existing connection groups
+            site: Full path of the group (e.g. 'ROOT/DC1/Rack1')
+
+        Returns:
+            Tuple of (deepest existing group, names of the missing groups below it)
+        """
+        parent_grp = tree.path_mapping.get(site)
+        if parent_grp is not None:
+            return parent_grp, []
+
+        sep_path = site.split("/")
+        if sep_path[0] != "ROOT":
+            sep_path.insert(0, "ROOT")
+
+        node: ConnectionGroupNode = tree.path_mapping.get("ROOT")
+        for i in range(1, len(sep_path)):
+            grp = node.get_group_in_children(sep_path[i])
+            if grp is None:
+                return node, sep_path[i:]
+            node = grp
+
+        return node, []
+
+    @staticmethod
+    def _add_created_group(
+        tree: ConnectionGroupTree,
+        parent_grp: ConnectionGroupNode,
+        name: str,
+        identifier: Optional[str],
+    ) -> ConnectionGroupNode:
+        """Record a newly created connection group in the local tree."""
+        return tree.add_group(
+            parent_grp,
+            {
+                "name": name,
+                "identifier": identifier,
+                "parentIdentifier": parent_grp.identifier,
+                "type": "ORGANIZATIONAL",
+                "activeConnections": 0,
+                "attributes": {},
+            },
+        )
+
+    @staticmethod
+    def _add_created_connection(
+        tree: ConnectionGroupTree,
+        parent_grp: ConnectionGroupNode,
+        connection: ConnectionCsvData,
+        identifier: Optional[str],
+    ) -> None:
+        """Record a newly created connection in the local tree."""
+        parent_grp.add_connection(
+            {
+                "name": connection.device_name,
+                "identifier": identifier,
+                "parentIdentifier": parent_grp.identifier,
+                "protocol": connection.protocol,
+                "parameters": connection.to_create_dict()["parameters"],
+                "attributes": {
+                    "guacd-encryption": "none",
+                    "failover-only": "true",
+                    "weight": None,
+                    "max-connections": "15",
+                    "guacd-hostname": "guacd",
+                    "guacd-port": "4822",
+                    "max-connections-per-user": "1",
+                },
+            },
+            tree.keep_attributes,
+        )
+
+
+class ConnectionImporter(BaseConnectionImporter):
     """Importer for Guacamole connections from CSV files."""
 
-    def __init__(self, api_client: GuacamoleAPIClient):
+    def __init__(
+        self,
+        api_client: GuacamoleAPIClient,
+        workers: int = 1,
+        batch_size: int = 1,
+        sync: bool = False,
+        snapshot_cache: Optional[SnapshotCache] = None,
+        journal: Optional[CheckpointJournal] = None,
+        parse_processes: Optional[int] = None,
+        metrics: Optional[ImportMetrics] = None,
+        progress: Optional[ProgressReporter] = None,
+    ):
         """Initialize the connection importer.
 
         Args:
             api_client: Guacamole API client
+            workers: Number of concurrent workers used to create connections
+                (default: 1, i.e. sequential)
+            batch_size: Number of connections created per JSON Patch request
+                (default: 1, i.e. one POST per connection)
+            sync: Update existing connections whose hostname, port, protocol or
+                username differ from the CSV (default: False, i.e. skip them)
+            snapshot_cache: Cache of the existing tree, used instead of downloading
+                it when fresh (default: None, i.e. always download)
+            journal: Checkpoint journal recording the applied rows; rows it
+                already holds are skipped (default: None, i.e. no journal)
+            parse_processes: Number of processes parsing the CSV files when
+                importing several at once (default: None, i.e. one per CPU)
+            metrics: Collector of the phase timings and import counters
+                (default: None)
+            progress: Reporter of the import progress (default: a
+                ProgressReporter logging every 10 seconds)
         """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
         self.api_client = api_client
+        self.workers = workers
+        self.batch_size = batch_size
+        self.sync = sync
+        self.snapshot_cache = snapshot_cache
+        self.journal = journal
+        self.parse_processes = parse_processes
+        self.metrics = metrics
+        self.progress = progress if progress is not None else ProgressReporter()
+        # writes that failed during the last import
+        self.write_failures = 0
+        # tree of groups and connections after the last import
+        self.tree: Optional[ConnectionGroupTree] = None
 
-    def import_connections(self, csv_file_path: str) -> Tuple[int, int]:
+    def import_connections(self, csv_file_path: CsvFiles) -> Tuple[int, int]:
         """Import connections from the CSV file into Guacamole.
 
+        Several CSV files are parsed in a process pool and merged into one
+        deduplicated set of rows, imported against a single tree. A single
+        CSV file is streamed twice instead. The first pass collects the site
+        paths, and every missing connection group is created level by level,
+        with the siblings of each depth created concurrently. The second pass
+        creates the connections: they are grouped into batches of
+        ``self.batch_size`` and dispatched to a pool of ``self.workers``
+        threads, with at most ``2 * workers`` batches queued at any time.
+
+        In sync mode, rows of existing connections are compared by fingerprint
+        and only changed connections are updated. Updated connections count as
+        successful imports.
+
+        With a checkpoint journal, every created or synced row is appended to
+        it, and rows applied by a previous run are skipped and counted as
+        successful. The journal is removed once an import completes without
+        failed writes.
+
+        Progress (rows/sec, ETA, in-flight, failed and skipped rows) is logged
+        by ``self.progress`` at a bounded rate.
+
+        Args:
+            csv_file_path: Path to the CSV file, or a list of paths
+
         Returns:
             Tuple of (number of successful imports, total number of connections)
 
         Raises:
             ValueError: If authentication fails or CSV parsing fails
         """
+        iter_rows = self._row_source(csv_file_path)
 
-        csv_parser = CSVParser(csv_file_path)
+        self._authenticate()
 
+        tree = self._load_tree()
+        return self._import_rows(tree, iter_rows, self.sync)
+
+    def _row_source(
+        self, csv_file_path: CsvFiles
+    ) -> Callable[[], Iterator[ConnectionCsvData]]:
+        """Return a function iterating over the rows of one or more CSV files."""
+        if isinstance(csv_file_path, (str, Path)):
+            csv_file_path = [csv_file_path]
+        if len(csv_file_path) == 1:
+            return lambda: self._iter_connection_data(csv_file_path[0])
+
+        with self._phase("csv_parse"):
+            rows = self._merge_connection_data(csv_file_path, self.parse_processes)
+        return lambda: iter(rows)
+
+    def _authenticate(self) -> None:
+        """Authenticate with the Guacamole API.
+
+        Raises:
+            ValueError: If authentication fails
+        """
+        with self._phase("authenticate"):
+            if not self.api_client.authenticate():
+                raise ValueError("Failed to authenticate with Guacamole API")
+
+    def plan_connections(self, csv_file_path: CsvFiles) -> ImportPlan:
+        """Compute the changes an import of a CSV file would make, without writing.
+
+        The existing tree is loaded as for an import, from the snapshot cache
+        when it is fresh. In sync mode, the parameters of existing connections
+        which are not known yet are read with ``self.workers`` threads, so
+        the changed connections can be told apart.
+
+        Args:
+            csv_file_path: Path to the CSV file, or a list of paths
+
+        Returns:
+            The import plan
+
+        Raises:
+            ValueError: If authentication fails, CSV parsing fails or parameters
+                of an existing connection cannot be read
+        """
+        iter_rows = self._row_source(csv_file_path)
+
+        self._authenticate()
+
+        tree = self._load_tree()
+        plan = ImportPlan(
+            *self._snapshot_key(),
+            source=(
+                str(csv_file_path)
+                if isinstance(csv_file_path, (str, Path))
+                else ", ".join(str(path) for path in csv_file_path)
+            ),
+        )
+        missing_groups: Set[str] = set()
+        seen: Set[Tuple[str, str]] = set()
+        existing: List[Tuple[ConnectionNode, ConnectionCsvData]] = []
+
+        for connection in iter_rows():
+            plan.total_rows += 1
+            key = (connection.site, connection.device_name)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            node, missing = self._resolve_group_path(tree, connection.site)
+            conn = None
+            if missing:
+                path = tree.reverse_get_full_path_name(node)
+                for path_name in missing:
+                    path = f"{path}/{path_name}"
+                    missing_groups.add(path)
+            else:
+                conn = node.get_connection_in_children(connection.device_name)
+
+            if conn is None:
+                plan.creates.append(connection.to_dict())
+            elif self.sync:
+                existing.append((conn, connection))
+            else:
+                plan.unchanged += 1
+
+        self._hydrate_parameters(conn for conn, _ in existing)
+        for conn, connection in existing:
+            if conn.parameters is None:
+                raise ValueError(f"Failed to read the parameters of connection {conn.name}")
+            if conn.fingerprint() == connection.fingerprint():
+                plan.unchanged += 1
+            else:
+                plan.updates.append({"identifier": conn.identifier, **connection.to_dict()})
+
+        plan.groups = sorted(missing_groups, key=lambda path: (path.count("/"), path))
+        return plan
+
+    def apply_plan(self, plan: ImportPlan) -> Tuple[int, int]:
+        """Apply a plan computed by :meth:`plan_connections`.
+
+        The planned rows go through the same engine as an import, against the
+        current tree: groups are created level by level, connections in
+        batches on ``self.workers`` threads, and planned updates are synced.
+        Rows which were applied since the plan was made are left alone.
+
+        Args:
+            plan: The import plan
+
+        Returns:
+            Tuple of (number of successful imports, number of planned rows)
+
+        Raises:
+            ValueError: If authentication fails or the plan was computed for
+                another server, data source or user
+        """
+        self._authenticate()
+
+        if (plan.base_url, plan.data_source, plan.username) != self._snapshot_key():
+            raise ValueError(
+                f"Plan was computed for {plan.username}@{plan.base_url} "
+                f"({plan.data_source}), not for this server"
+            )
+
+        tree = self._load_tree()
+        return self._import_rows(tree, plan.iter_rows, bool(plan.updates))
+
+    def _import_rows(
+        self,
+        tree: ConnectionGroupTree,
+        iter_rows: Callable[[], Iterator[ConnectionCsvData]],
+        sync: bool,
+    ) -> Tuple[int, int]:
+        """Create, and in sync mode update, the connections of some rows.
+
+        Args:
+            tree: Tree of the existing connection groups and connections
+            iter_rows: Returns a new iterator over the rows, called once per pass
+            sync: Update existing connections which differ from their row
+
+        Returns:
+            Tuple of (number of successful imports, total number of connections)
+        """
         successful_imports = 0
         total_connections = 0
+        self.write_failures = 0
+        resumed_rows = 0
 
-        # Authenticate with the Guacamole API
-        if not self.api_client.authenticate():
-            raise ValueError("Failed to authenticate with Guacamole API")
-
-        existing_connection_groups = self.api_client.get_connection_groups()
-        logger.info(f"Existing connection groups: {existing_connection_groups}")
-        existing_connections = self.api_client.get_connections()
-        logger.info(f"Existing connections: {existing_connections}")
-
-        tree = ConnectionGroupTree()
-        tree.build_from_data(existing_connection_groups, existing_connections)
-
-        connections = csv_parser.parse()
-        connection_data: List[ConnectionCsvData] = []
-        for connection in connections:
-            conn_data = ConnectionCsvData.from_dict(connection)
-            if not conn_data.site.startswith("ROOT/"):
-                conn_data.site = "ROOT/" + conn_data.site
-            connection_data.append(conn_data)
-
-        total_connections = len(connections)
-        for connection in connection_data:
-            parent_grp = tree.path_mapping.get(connection.site)
-
-            if parent_grp is None:
-                # create the group
-                sep_path = connection.site.split("/")
-                if sep_path[0] != "ROOT":
-                    sep_path.insert(0, "ROOT")
-
-                node: ConnectionGroupNode = tree.path_mapping.get("ROOT")
-                for i in range(1, len(sep_path)):
-                    path_name = sep_path[i]
-                    grp = node.get_group_in_children(path_name)
-                    if grp is None:
-                        group_id = self.api_client.create_connection_group(
-                            name=path_name, parent_id=node.identifier
-                        )
-                        # need to build the group
-                        grp = node.add_group(
-                            {
-                                "name": path_name,
-                                "identifier": group_id,
-                                "parentIdentifier": node.identifier,
-                                "type": "ORGANIZATIONAL",
-                                "activeConnections": 0,
-                                "attributes": {},
-                            }
-                        )
-                        # need refactor
-                        tree.path_mapping[tree.reverse_get_full_path_name(grp)] = grp
-                    node = grp
-
-                parent_grp = node
-
-            # check connection in the grp
-            conn = parent_grp.get_connection_in_children(connection.device_name)
-            if conn is None:
-                # create connection in the group
-                conn_resp = self.api_client.create_connection(
-                    connection.to_create_dict(), parent_grp.identifier
-                )
+        # (parent identifier, connection name) of writes that are in flight,
+        # so duplicated CSV rows are not posted twice
+        pending: Set[Tuple[str, str]] = set()
+        batch: List[Tuple[ConnectionGroupNode, ConnectionCsvData]] = []
+        # future -> callback that applies its result in the calling thread
+        in_flight: Dict[Future, Callable[[Any], None]] = {}
+        max_in_flight = self.workers * 2
+        sync_results: Counter = Counter()
+        progress = self.progress
+
+        def track(future: Future, on_done: Callable[[Any], None]) -> None:
+            in_flight[future] = on_done
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        def collect(futures) -> None:
+            for future in futures:
+                in_flight.pop(future)(future.result())
+
+        def on_created(created, identifiers) -> None:
+            nonlocal successful_imports
+            failed = 0
+            for (parent_grp, connection), identifier in zip(created, identifiers):
+                pending.discard((parent_grp.identifier, connection.device_name))
+                if identifier is None:
+                    failed += 1
+                    continue
                 successful_imports += 1
-                parent_grp.add_connection(
-                    {
-                        "name": connection.device_name,
-                        "identifier": conn_resp,
-                        "parentIdentifier": parent_grp.identifier,
-                        "protocol": connection.protocol,
-                        "attributes": {
-                            "guacd-encryption": "none",
-                            "failover-only": "true",
-                            "weight": None,
-                            "max-connections": "15",
-                            "guacd-hostname": "guacd",
-                            "guacd-port": "4822",
-                            "max-connections-per-user": "1",
-                        },
-                    }
-                )
+                self._add_created_connection(tree, parent_grp, connection, identifier)
+                if self.journal is not None:
+                    self.journal.record(connection, identifier)
+            self.write_failures += failed
+            progress.update(
+                done=len(created) - failed, failed=failed, in_flight=len(pending)
+            )
+
+        def on_synced(key, conn, connection, result) -> None:
+            nonlocal successful_imports
+            pending.discard(key)
+            sync_results[result] += 1
+            if result == SYNC_FAILED:
+                self.write_failures += 1
+                progress.update(failed=1, in_flight=len(pending))
+                return
+            # a connection which already matches its row was synced as well
+            successful_imports += 1
+            if result == SYNC_UPDATED:
+                progress.update(done=1, in_flight=len(pending))
+            else:
+                progress.update(skipped=1, in_flight=len(pending))
+            if self.journal is not None:
+                self.journal.record(connection, conn.identifier)
+
+        def submit_batch(executor: ThreadPoolExecutor) -> None:
+            created = list(batch)
+            batch.clear()
+            track(
+                executor.submit(self._create_batch, created),
+                lambda identifiers: on_created(created, identifiers),
+            )
+            progress.update(in_flight=len(pending))
+
+        # the cached tree goes stale with the first write: drop it now, so a
+        # run which stops before _store_tree does not leave it behind
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.invalidate(*self._snapshot_key())
+
+        journal = self.journal
+        if journal is not None:
+            journal.open()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                with self._phase("csv_parse"):
+                    sites: Set[str] = set()
+                    existing: List[ConnectionNode] = []
+                    rows = 0
+                    for connection in iter_rows():
+                        rows += 1
+                        if journal is None or not journal.is_applied(connection):
+                            sites.add(connection.site)
+                            grp = tree.path_mapping.get(connection.site) if sync else None
+                            if grp is not None:
+                                conn = grp.get_connection_in_children(connection.device_name)
+                                if conn is not None:
+                                    existing.append(conn)
+                if existing:
+                    self._hydrate_parameters(existing)
+                progress.start(total=rows)
+                with self._phase("group_create"):
+                    self._create_missing_groups(tree, sites, executor)
+
+                with self._phase("connection_create"):
+                    for connection in iter_rows():
+                        total_connections += 1
+                        if journal is not None and journal.is_applied(connection):
+                            resumed_rows += 1
+                            progress.update(skipped=1)
+                            continue
+                        parent_grp = self._ensure_group_path(tree, connection.site)
+
+                        # check connection in the grp
+                        key = (parent_grp.identifier, connection.device_name)
+                        if key in pending:
+                            progress.update(skipped=1)
+                            continue
+                        conn = parent_grp.get_connection_in_children(connection.device_name)
+                        if conn is not None:
+                            if sync:
+                                pending.add(key)
+                                track(
+                                    executor.submit(
+                                        self._sync_connection, parent_grp, conn, connection
+                                    ),
+                                    partial(on_synced, key, conn, connection),
+                                )
+                            else:
+                                progress.update(skipped=1)
+                            continue
+
+                        # create connection in the group
+                        pending.add(key)
+                        batch.append((parent_grp, connection))
+                        if len(batch) >= self.batch_size:
+                            submit_batch(executor)
+
+                    if batch:
+                        submit_batch(executor)
+                    collect(list(in_flight))
+                progress.finish()
+        finally:
+            if journal is not None:
+                journal.close()
+
+        if sync:
+            logger.info(
+                f"Sync: {sync_results[SYNC_UPDATED]} updated, "
+                f"{sync_results[SYNC_UNCHANGED]} unchanged, "
+                f"{sync_results[SYNC_FAILED]} failed"
+            )
+        if resumed_rows:
+            logger.info(f"Skipped {resumed_rows} rows applied by a previous run")
+            successful_imports += resumed_rows
+        if self.metrics is not None:
+            self.metrics.count("rows", total_connections)
+            self.metrics.count("successful_imports", successful_imports)
+            self.metrics.count("connection_updates", sync_results[SYNC_UPDATED])
+            self.metrics.count("resumed_rows", resumed_rows)
+            self.metrics.count("write_failures", self.write_failures)
+        if journal is not None and not self.write_failures:
+            journal.discard()
+        self._store_tree(tree)
+        self.tree = tree
 
-        tree.print_tree()
         logger.info(
             f"Imported {successful_imports}/{total_connections} connections successfully"
         )
 
         return successful_imports, total_connections
 
+    def _snapshot_key(self) -> Tuple[str, str, str]:
+        return (
+            self.api_client.base_url,
+            self.api_client.data_source,
+            self.api_client.username,
+        )
+
+    def _load_tree(self) -> ConnectionGroupTree:
+        """Build the tree of existing groups and connections.
+
+        The snapshot cache is used when it has a fresh entry, otherwise the
+        nested tree of ROOT is downloaded in a single request.
+
+        Returns:
+            Tree of the existing connection groups and connections
+        """
+        with self._phase("tree_fetch"):
+            snapshot = None
+            nested = None
+            if self.snapshot_cache is not None:
+                snapshot = self.snapshot_cache.load(*self._snapshot_key())
+            if snapshot is None:
+                nested = self.api_client.get_connection_tree()
+
+        with self._phase("tree_build"):
+            # the importer never reads attributes, leave them out to save memory
+            tree = ConnectionGroupTree(keep_attributes=False)
+            if nested is not None:
+                tree.build_from_nested(nested)
+            else:
+                tree.build_from_data(*snapshot)
+
+        if nested is not None:
+            groups, connections = tree.counts()
+            logger.info(
+                f"Found {groups} existing connection groups and {connections} connections"
+            )
+        return tree
+
+    def _store_tree(self, tree: ConnectionGroupTree) -> None:
+        """Refresh the snapshot cache once an import has completed.
+
+        The entry was dropped before the first write. After a failed write the
+        local tree may no longer match the server, so it is not saved and the
+        next run downloads the full tree again.
+        """
+        if self.snapshot_cache is None:
+            return
+
+        if not self.write_failures:
+            self.snapshot_cache.save(*self._snapshot_key(), *tree.to_data())
+
+    def _hydrate_parameters(self, conns: Iterable[ConnectionNode]) -> None:
+        """Read the unknown parameters of existing connections concurrently.
+
+        Only the connections matched by CSV rows are read, ``self.workers``
+        at a time, instead of one request per connection of the server.
+        Connections which could not be read keep ``parameters`` None.
+
+        Args:
+            conns: Existing connections
+        """
+        unknown = {conn.identifier: conn for conn in conns if conn.parameters is None}
+        if not unknown:
+            return
+        with self._phase("parameter_fetch"):
+            parameters = self.api_client.hydrate_parameters(unknown, self.workers)
+        for identifier, params in parameters.items():
+            unknown[identifier].parameters = params
+
+    def _create_missing_groups(
+        self, tree: ConnectionGroupTree, sites: Set[str], executor: ThreadPoolExecutor
+    ) -> None:
+        """Create the missing groups of all site paths, one depth at a time.
+
+        Groups of the same depth are created concurrently on ``executor``; a
+        depth starts once all groups of the previous one exist. Groups whose
+        creation failed are left out of the tree, so rows below them fall back
+        to :meth:`_ensure_group_path`.
+
+        Args:
+            tree: Tree of the existing connection groups
+            sites: Full site paths (e.g. 'ROOT/DC1/Rack1')
+            executor: Pool running the group creates
+        """
+        missing_by_depth: Dict[int, Set[str]] = defaultdict(set)
+        for site in sites:
+            node, missing = self._resolve_group_path(tree, site)
+            path = tree.reverse_get_full_path_name(node)
+            for path_name in missing:
+                path = f"{path}/{path_name}"
+                missing_by_depth[path.count("/")].add(path)
+
+        for depth in sorted(missing_by_depth):
+            futures: Dict[Future, Tuple[ConnectionGroupNode, str]] = {}
+            for path in sorted(missing_by_depth[depth]):
+                parent_path, path_name = path.rsplit("/", 1)
+                parent_grp = tree.path_mapping.get(parent_path)
+                if parent_grp is None:
+                    continue
+                future = executor.submit(
+                    self.api_client.create_connection_group,
+                    name=path_name,
+                    parent_id=parent_grp.identifier,
+                )
+                futures[future] = (parent_grp, path_name)
+
+            for future, (parent_grp, path_name) in futures.items():
+                group_id = future.result()
+                if group_id is None:
+                    self.write_failures += 1
+                    continue
+                self._add_created_group(tree, parent_grp, path_name, group_id)
+
+    def _ensure_group_path(
+        self, tree: ConnectionGroupTree, site: str
+    ) -> ConnectionGroupNode:
+        """Return the group for a site path, creating missing groups on the way.
+
+        Args:
+            tree: Tree of the existing connection groups
+            site: Full path of the group (e.g. 'ROOT/DC1/Rack1')
+
+        Returns:
+            The connection group node at the end of the path
+        """
+        node, missing = self._resolve_group_path(tree, site)
+        for path_name in missing:
+            group_id = self.api_client.create_connection_group(
+                name=path_name, parent_id=node.identifier
+            )
+            if group_id is None:
+                self.write_failures += 1
+            node = self._add_created_group(tree, node, path_name, group_id)
+        return node
+
+    def _sync_connection(
+        self,
+        parent_grp: ConnectionGroupNode,
+        conn: ConnectionNode,
+        connection: ConnectionCsvData,
+    ) -> str:
+        """Update an existing connection if it differs from its CSV row.
+
+        The connection parameters are fetched once and kept on the node, so
+        later comparisons against the same node do not call the API. An update
+        only changes the protocol, hostname, port, username and password; the
+        other parameters and the attributes of the connection are kept.
+
+        Args:
+            parent_grp: Parent group of the connection
+            conn: Existing connection
+            connection: CSV row of the connection
+
+        Returns:
+            One of SYNC_UPDATED, SYNC_UNCHANGED or SYNC_FAILED
+        """
+        if conn.parameters is None:
+            try:
+                conn.parameters = self.api_client.get_connection_parameters(
+                    conn.identifier
+                )
+            except ValueError as e:
+                logger.error(f"Failed to sync connection '{conn.name}': {e}")
+                return SYNC_FAILED
+
+        if conn.fingerprint() == connection.fingerprint():
+            return SYNC_UNCHANGED
+
+        # the update replaces the whole connection: start from the existing
+        # one, so the parameters and attributes the CSV does not manage are kept
+        try:
+            connection_data = self.api_client.get_connection(conn.identifier)
+        except ValueError as e:
+            logger.error(f"Failed to sync connection '{conn.name}': {e}")
+            return SYNC_FAILED
+        create_dict = connection.to_create_dict()
+        connection_data["protocol"] = create_dict["protocol"]
+        connection_data["parameters"] = {**conn.parameters, **create_dict["parameters"]}
+        if not self.api_client.update_connection(
+            conn.identifier, connection_data, parent_grp.identifier
+        ):
+            return SYNC_FAILED
+
+        conn.protocol = connection.protocol
+        conn.parameters = connection_data["parameters"]
+        return SYNC_UPDATED
+
+    def _create_batch(
+        self, batch: List[Tuple[ConnectionGroupNode, ConnectionCsvData]]
+    ) -> List[Optional[str]]:
+        """Create a batch of connections.
+
+        Batches of more than one connection are sent as a single JSON Patch
+        request. If the server rejects the batch, every connection of it is
+        retried with its own POST. If the outcome of the batch is unknown, its
+        connections are counted as failed rather than posted again.
+
+        Args:
+            batch: List of (parent group, connection row)
+
+        Returns:
+            IDs of the created connections, in the order of ``batch``
+        """
+        if len(batch) > 1:
+            connection_ids = self.api_client.create_connections(
+                [
+                    (connection.to_create_dict(), parent_grp.identifier)
+                    for parent_grp, connection in batch
+                ]
+            )
+            if connection_ids is not None:
+                return connection_ids
+            logger.warning(
+                f"Batch of {len(batch)} connections was rejected, "
+                "falling back to single creates"
+            )
+
+        return [
+            self.api_client.create_connection(
+                connection.to_create_dict(), parent_grp.identifier
+            )
+            for parent_grp, connection in batch
+        ]
+
     def _import_connection(self, connection: Dict[str, Any], parent_id: str) -> bool:
         """Import a single connection into Guacamole.
 
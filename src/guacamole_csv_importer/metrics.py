@@ -0,0 +1,235 @@
+"""Metrics module for Guacamole CSV Importer.
+
+This module collects the time spent in each phase of an import and per-endpoint
+request counts, errors and latency histograms, and exports them as a JSON report
+or in the Prometheus textfile format.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_PREFIX = "guacamole_import"
+
+_DATA_SOURCE_PATH = re.compile(r"/session/data/[^/]+")
+_OBJECT_PATH = re.compile(r"/(connections|connectionGroups)/(?!tree\b)[^/]+")
+
+
+def endpoint_template(path: str) -> str:
+    """Replace the data source and object identifiers of an API path.
+
+    Args:
+        path: Request path relative to the API base URL
+            (e.g. '/session/data/postgresql/connections/12/parameters')
+
+    Returns:
+        Path template (e.g. '/session/data/{dataSource}/connections/{id}/parameters')
+    """
+    path = _DATA_SOURCE_PATH.sub("/session/data/{dataSource}", path.split("?", 1)[0])
+    return _OBJECT_PATH.sub(r"/\1/{id}", path)
+
+
+class _EndpointStats:
+    __slots__ = ("count", "errors", "seconds_total", "seconds_max", "buckets", "statuses")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        # non-cumulative counts per bucket, the last one is +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statuses: Dict[str, int] = {}
+
+
+class ImportMetrics:
+    """Thread-safe collector of import phase timings and request metrics.
+
+    Phases are timed with :meth:`phase`; a phase entered several times
+    accumulates its time. API clients report every HTTP attempt, retries
+    included, through :meth:`observe_request`.
+    """
+
+    def __init__(self):
+        """Initialize an empty metrics collector."""
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._endpoints: Dict[Tuple[str, str], _EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the import.
+
+        Args:
+            name: Name of the phase (e.g. 'authenticate')
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add to a counter.
+
+        Args:
+            name: Name of the counter (e.g. 'rows')
+            value: Amount to add (default: 1)
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_request(
+        self, method: str, endpoint: str, status: Optional[int], seconds: float
+    ) -> None:
+        """Record one HTTP request.
+
+        Args:
+            method: HTTP method
+            endpoint: Path template of the endpoint, see :func:`endpoint_template`
+            status: HTTP status code, or None if no response was received
+            seconds: Duration of the request
+        """
+        with self._lock:
+            stats = self._endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self._endpoints[(method, endpoint)] = _EndpointStats()
+            stats.count += 1
+            if status is None or status >= 400:
+                stats.errors += 1
+            stats.seconds_total += seconds
+            stats.seconds_max = max(stats.seconds_max, seconds)
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            status_key = "error" if status is None else str(status)
+            stats.statuses[status_key] = stats.statuses.get(status_key, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the metrics as a JSON serializable report.
+
+        Histogram buckets are cumulative, keyed by their upper bound.
+
+        Returns:
+            Report dictionary
+        """
+        with self._lock:
+            requests: List[Dict[str, Any]] = []
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.buckets):
+                    cumulative += count
+                    buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+                requests.append(
+                    {
+                        "method": method,
+                        "endpoint": endpoint,
+                        "count": stats.count,
+                        "errors": stats.errors,
+                        "statuses": dict(stats.statuses),
+                        "seconds_total": round(stats.seconds_total, 6),
+                        "seconds_max": round(stats.seconds_max, 6),
+                        "buckets": buckets,
+                    }
+                )
+
+            return {
+                "started_at": self.started_at,
+                "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                "counters": dict(self.counters),
+                "requests": requests,
+            }
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format.
+
+        Returns:
+            Metrics text, suitable for the node exporter textfile collector
+        """
+        report = self.to_dict()
+        prefix = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent in each phase of the last import.",
+            f"# TYPE {prefix}_phase_seconds gauge",
+        ]
+        for name, seconds in report["phases"].items():
+            lines.append(f'{prefix}_phase_seconds{{phase="{name}"}} {seconds}')
+
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+
+        lines.append(f"# HELP {prefix}_requests_total API requests of the last import.")
+        lines.append(f"# TYPE {prefix}_requests_total counter")
+        for request in report["requests"]:
+            labels = f'method="{request["method"]}",endpoint="{request["endpoint"]}"'
+            lines.append(f"{prefix}_requests_total{{{labels}}} {request['count']}")
+
+        lines.append(
+            f"# HELP {prefix}_request_errors_total Failed API requests of the last import."
+        )
+        lines.append(f"# TYPE {prefix}_request_errors_total counter")
+        for request in report["requests"]:
+            labels = f'method="{request["method"]}",endpoint="{request["endpoint"]}"'
+            lines.append(f"{prefix}_request_errors_total{{{labels}}} {request['errors']}")
+
+        lines.append(
+            f"# HELP {prefix}_request_duration_seconds Latency of the API requests."
+        )
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for request in report["requests"]:
+            labels = f'method="{request["method"]}",endpoint="{request["endpoint"]}"'
+            for bound, count in request["buckets"].items():
+                lines.append(
+                    f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                    f"{count}"
+                )
+            lines.append(
+                f"{prefix}_request_duration_seconds_sum{{{labels}}} {request['seconds_total']}"
+            )
+            lines.append(
+                f"{prefix}_request_duration_seconds_count{{{labels}}} {request['count']}"
+            )
+
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {report['started_at']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        """Write the JSON report.
+
+        Args:
+            path: Path of the report file
+        """
+        _write_atomically(Path(path), json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def write_prometheus(self, path: Path) -> None:
+        """Write the metrics for the Prometheus node exporter textfile collector.
+
+        The file is replaced atomically, so the collector never reads a partial
+        file.
+
+        Args:
+            path: Path of the '.prom' file
+        """
+        _write_atomically(Path(path), self.to_prometheus())
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
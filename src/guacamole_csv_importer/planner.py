@@ -0,0 +1,118 @@
+"""Import plan module for Guacamole CSV Importer.
+
+This module holds the change set computed by a dry run of an import, so it can be
+reviewed and then applied in a separate step.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from .connection_csv_data import ConnectionCsvData
+
+logger = logging.getLogger(__name__)
+
+PLAN_VERSION = 1
+
+
+@dataclass
+class ImportPlan:
+    """Groups and connections an import would create or update.
+
+    Connections are stored as CSV rows (with ``site`` under ROOT), updates
+    with the identifier of the existing connection. The plan contains
+    connection passwords, so it is saved readable by its owner only.
+    """
+
+    base_url: str
+    data_source: str
+    username: str
+    source: str = ""
+    created_at: float = field(default_factory=time.time)
+    # full paths of the groups to create, parents first
+    groups: List[str] = field(default_factory=list)
+    creates: List[Dict[str, Any]] = field(default_factory=list)
+    updates: List[Dict[str, Any]] = field(default_factory=list)
+    unchanged: int = 0
+    total_rows: int = 0
+    version: int = PLAN_VERSION
+
+    def iter_rows(self) -> Iterator[ConnectionCsvData]:
+        """Yield the rows of all planned creates and updates."""
+        for row in self.creates:
+            yield ConnectionCsvData.from_dict(row)
+        for row in self.updates:
+            yield ConnectionCsvData.from_dict(row)
+
+    def summary(self, batch_size: int = 1) -> Dict[str, int]:
+        """Count the planned changes and the requests needed to apply them.
+
+        The estimate covers authentication, downloading the existing tree, one
+        request per group, one per batch of creates, and for each update the
+        reads of the connection and of its parameters and a PUT.
+
+        Args:
+            batch_size: Number of connections created per JSON Patch request
+
+        Returns:
+            Dictionary of counts
+        """
+        return {
+            "rows": self.total_rows,
+            "group_creates": len(self.groups),
+            "connection_creates": len(self.creates),
+            "connection_updates": len(self.updates),
+            "unchanged": self.unchanged,
+            "estimated_requests": (
+                2
+                + len(self.groups)
+                + math.ceil(len(self.creates) / batch_size)
+                + 3 * len(self.updates)
+            ),
+        }
+
+    def save(self, path: Path) -> None:
+        """Write the plan as JSON.
+
+        Args:
+            path: Path of the plan file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # create the file private, the plan holds connection passwords
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as plan_file:
+            json.dump(asdict(self), plan_file, indent=2)
+        os.chmod(path, 0o600)
+        logger.info(f"Wrote import plan to {path}")
+
+    @classmethod
+    def load(cls, path: Path) -> "ImportPlan":
+        """Read a plan written by :meth:`save`.
+
+        Args:
+            path: Path of the plan file
+
+        Returns:
+            The import plan
+
+        Raises:
+            ValueError: If the file is not a plan of a supported version
+        """
+        with open(path, encoding="utf-8") as plan_file:
+            try:
+                data = json.load(plan_file)
+            except ValueError as e:
+                raise ValueError(f"Invalid plan file {path}: {e}")
+
+        if not isinstance(data, dict) or data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan file {path}")
+        try:
+            return cls(**data)
+        except TypeError as e:
+            raise ValueError(f"Invalid plan file {path}: {e}")
@@ -0,0 +1,145 @@
+"""Progress reporting module for Guacamole CSV Importer.
+
+This module logs the progress of an import (rows per second, ETA, and in-flight,
+failed and skipped rows) at a bounded rate, so reporting stays cheap on imports of
+millions of rows.
+"""
+
+import logging
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as H:MM:SS.
+
+    Args:
+        seconds: Duration in seconds
+
+    Returns:
+        Formatted duration (e.g. '0:01:05')
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ProgressReporter:
+    """Throttled progress log of the rows of an import.
+
+    Rows are counted as done, failed or skipped once their outcome is known,
+    and as in flight while their write is pending. :meth:`update` is cheap
+    enough to call once per row: it logs a line at most every ``interval``
+    seconds.
+    """
+
+    def __init__(
+        self,
+        interval: float = 10.0,
+        total: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the progress reporter.
+
+        Args:
+            interval: Minimum number of seconds between two progress lines, 0
+                to disable them (default: 10)
+            total: Number of rows to import, if known (default: None)
+            clock: Monotonic clock, in seconds (default: time.monotonic)
+        """
+        self.interval = interval
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.in_flight = 0
+        self._clock = clock
+        self._started = clock()
+        self._next_report = self._started + interval
+
+    def start(self, total: Optional[int] = None) -> None:
+        """Reset the counters and the clock.
+
+        Args:
+            total: Number of rows to import, if known (default: None)
+        """
+        self.total = total
+        self.done = self.failed = self.skipped = self.in_flight = 0
+        self._started = self._clock()
+        self._next_report = self._started + self.interval
+
+    @property
+    def completed(self) -> int:
+        """Number of rows whose outcome is known."""
+        return self.done + self.failed + self.skipped
+
+    def update(
+        self,
+        done: int = 0,
+        failed: int = 0,
+        skipped: int = 0,
+        in_flight: Optional[int] = None,
+    ) -> None:
+        """Count finished rows, and log the progress if it is due.
+
+        Args:
+            done: Rows created or updated
+            failed: Rows whose write failed
+            skipped: Rows left alone (existing, duplicated or already applied)
+            in_flight: Rows whose write is pending, if changed
+        """
+        self.done += done
+        self.failed += failed
+        self.skipped += skipped
+        if in_flight is not None:
+            self.in_flight = in_flight
+
+        if self.interval > 0:
+            now = self._clock()
+            if now >= self._next_report:
+                self._next_report = now + self.interval
+                self.report(now)
+
+    def report(self, now: Optional[float] = None) -> str:
+        """Log the progress line.
+
+        Args:
+            now: Current time of ``clock`` (default: read it)
+
+        Returns:
+            The logged line
+        """
+        line = self._format(now if now is not None else self._clock())
+        logger.info(line)
+        return line
+
+    def finish(self) -> str:
+        """Log the final progress line, with the total elapsed time.
+
+        Returns:
+            The logged line
+        """
+        now = self._clock()
+        self.in_flight = 0
+        line = f"{self._format(now)}, finished in {format_duration(now - self._started)}"
+        logger.info(line)
+        return line
+
+    def _format(self, now: float) -> str:
+        elapsed = now - self._started
+        completed = self.completed
+        rate = completed / elapsed if elapsed > 0 else 0.0
+
+        if self.total:
+            line = (
+                f"Progress: {completed}/{self.total} rows "
+                f"({100 * completed / self.total:.1f}%), {rate:.1f} rows/s"
+            )
+            if rate > 0 and completed < self.total:
+                line += f", ETA {format_duration((self.total - completed) / rate)}"
+        else:
+            line = f"Progress: {completed} rows, {rate:.1f} rows/s"
+
+        return f"{line}, {self.in_flight} in flight, {self.failed} failed, {self.skipped} skipped"
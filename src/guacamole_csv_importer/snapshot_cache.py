@@ -0,0 +1,157 @@
+"""Snapshot cache module for Guacamole connection trees.
+
+This module stores the connection groups and connections of a Guacamole data source
+in a local SQLite file, so repeated imports can skip downloading the full tree.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Snapshot = Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+
+
+class SnapshotCache:
+    """On-disk cache of connection tree snapshots with a time to live.
+
+    Snapshots are keyed by API base URL, data source and username, as
+    different users may see different parts of the same data source. Each
+    snapshot is stored as zlib compressed JSON.
+    """
+
+    def __init__(self, path: Path, ttl: float = 300.0):
+        """Initialize the snapshot cache.
+
+        Args:
+            path: Path to the SQLite cache file, created if it does not exist
+            ttl: Maximum age of a snapshot in seconds (default: 300)
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path))
+        # The snapshot describes every connection of the data source, keep it private
+        os.chmod(self.path, 0o600)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " base_url TEXT NOT NULL,"
+            " data_source TEXT NOT NULL,"
+            " username TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " PRIMARY KEY (base_url, data_source, username))"
+        )
+        return conn
+
+    def load(self, base_url: str, data_source: str, username: str) -> Optional[Snapshot]:
+        """Load a snapshot if one exists and has not expired.
+
+        Args:
+            base_url: Base URL of the Guacamole API
+            data_source: Guacamole data source
+            username: Guacamole username
+
+        Returns:
+            Tuple of (connection groups, connections), or None on a cache miss
+        """
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT created_at, payload FROM snapshots"
+                    " WHERE base_url = ? AND data_source = ? AND username = ?",
+                    (base_url, data_source, username),
+                ).fetchone()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Failed to read snapshot cache {self.path}: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        created_at, payload = row
+        if time.time() - created_at > self.ttl:
+            logger.info("Snapshot cache entry has expired")
+            return None
+
+        try:
+            data = json.loads(zlib.decompress(payload).decode("utf-8"))
+            snapshot = data["groups"], data["connections"]
+        except (zlib.error, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring corrupt snapshot in {self.path}: {e}")
+            return None
+
+        logger.info(f"Loaded tree snapshot from {self.path}")
+        return snapshot
+
+    def save(
+        self,
+        base_url: str,
+        data_source: str,
+        username: str,
+        groups: List[Dict[str, Any]],
+        connections: List[Dict[str, Any]],
+    ) -> None:
+        """Store a snapshot, replacing any previous one for the same key.
+
+        Args:
+            base_url: Base URL of the Guacamole API
+            data_source: Guacamole data source
+            username: Guacamole username
+            groups: Connection group dictionaries
+            connections: Connection dictionaries
+        """
+        payload = zlib.compress(
+            json.dumps(
+                {"groups": groups, "connections": connections}, separators=(",", ":")
+            ).encode("utf-8")
+        )
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO snapshots"
+                        " (base_url, data_source, username, created_at, payload)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (base_url, data_source, username, time.time(), payload),
+                    )
+            finally:
+                conn.close()
+            logger.info(f"Saved tree snapshot to {self.path}")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Failed to write snapshot cache {self.path}: {e}")
+
+    def invalidate(self, base_url: str, data_source: str, username: str) -> None:
+        """Drop the snapshot for a key.
+
+        Args:
+            base_url: Base URL of the Guacamole API
+            data_source: Guacamole data source
+            username: Guacamole username
+        """
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "DELETE FROM snapshots"
+                        " WHERE base_url = ? AND data_source = ? AND username = ?",
+                        (base_url, data_source, username),
+                    )
+            finally:
+                conn.close()
+            logger.info(f"Invalidated tree snapshot in {self.path}")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Failed to invalidate snapshot cache {self.path}: {e}")
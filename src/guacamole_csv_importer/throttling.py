@@ -0,0 +1,120 @@
+"""Retry and rate limiting module for Guacamole API clients.
+
+This module provides the retry policy and the token bucket rate limiter shared by
+the synchronous and asynchronous API clients.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with jitter for transient API failures.
+
+    Requests answered with one of ``status_forcelist``, or failing with a
+    connection error, are retried up to ``total`` times. Requests of other
+    methods than ``idempotent_methods``, such as creates, may have reached
+    Guacamole after a gateway error or a dropped connection, and sending them
+    again could duplicate them. They are only retried when answered with one
+    of ``unprocessed_statuses``, or when the connection could not be opened.
+    """
+
+    total: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 30.0
+    # fraction of each delay that is randomized, so clients do not retry in lockstep
+    jitter: float = 0.5
+    status_forcelist: Tuple[int, ...] = (429, 502, 503, 504)
+    idempotent_methods: FrozenSet[str] = frozenset(
+        {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+    )
+    # statuses of requests which were turned away before being processed
+    unprocessed_statuses: Tuple[int, ...] = (429, 503)
+
+    def is_idempotent(self, method: str) -> bool:
+        """Return whether requests of a method can be sent again safely."""
+        return method.upper() in self.idempotent_methods
+
+    def retries_status(self, method: str, status: int) -> bool:
+        """Return whether a request answered with a status is retried.
+
+        Args:
+            method: HTTP method of the request
+            status: Status code of the response
+
+        Returns:
+            True if the request may be sent again
+        """
+        if status not in self.status_forcelist:
+            return False
+        return self.is_idempotent(method) or status in self.unprocessed_statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Return the delay before a retry.
+
+        Args:
+            attempt: Number of the failed attempt, starting at 0
+            retry_after: Value of the Retry-After response header, if any
+
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** attempt))
+        delay = random.uniform(delay * (1 - self.jitter), delay)
+        if retry_after:
+            try:
+                delay = max(delay, min(self.backoff_max, float(retry_after)))
+            except ValueError:
+                pass
+        return delay
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests per second.
+
+    Callers reserve a token and wait for the returned delay, so the bucket
+    serves both threads (:meth:`acquire`) and coroutines (``await
+    asyncio.sleep(bucket.reserve())``).
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Initialize the token bucket.
+
+        Args:
+            rate: Sustained number of requests per second
+            burst: Number of requests allowed at once (default: max(1, rate))
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it.
+
+        Returns:
+            Delay in seconds, 0 if a token was available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
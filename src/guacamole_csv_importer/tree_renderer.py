@@ -0,0 +1,122 @@
+"""Tree rendering module for Guacamole CSV Importer.
+
+This module writes a :class:`~guacamole_csv_importer.connection_group_tree.ConnectionGroupTree`
+as indented text, JSON Lines or a Graphviz DOT graph. Nodes are visited without
+recursion and lines are written in chunks, so trees of any depth and size render
+quickly.
+"""
+
+import json
+from typing import Callable, Dict, Iterator, List, Optional, TextIO
+
+from .connection_group_tree import ConnectionGroupNode, ConnectionGroupTree, ConnectionNode
+
+TREE_FORMATS = ("text", "jsonl", "dot")
+
+# number of lines joined into a single write
+CHUNK_LINES = 1000
+
+
+def _text_lines(tree: ConnectionGroupTree, start, max_depth) -> Iterator[str]:
+    for depth, _, node in tree.walk(start, max_depth):
+        indent = "  " * depth
+        if isinstance(node, ConnectionNode):
+            yield f"{indent}* Connection: {node.name} (ID: {node.identifier})\n"
+        else:
+            yield f"{indent}- Group: {node.name} (ID: {node.identifier})\n"
+
+
+def _jsonl_lines(tree: ConnectionGroupTree, start, max_depth) -> Iterator[str]:
+    for depth, path, node in tree.walk(start, max_depth):
+        if isinstance(node, ConnectionNode):
+            record = {
+                "kind": "connection",
+                "path": path,
+                "name": node.name,
+                "identifier": node.identifier,
+                "parentIdentifier": node.parentIdentifier,
+                "protocol": node.protocol,
+                "depth": depth,
+            }
+        else:
+            record = {
+                "kind": "group",
+                "path": path,
+                "name": node.name,
+                "identifier": node.identifier,
+                "parentIdentifier": node.parentIdentifier,
+                "type": node.type,
+                "depth": depth,
+            }
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def _dot_lines(tree: ConnectionGroupTree, start, max_depth) -> Iterator[str]:
+    # JSON string escaping is valid for DOT quoted strings
+    quote = json.dumps
+    yield "digraph connections {\n"
+    yield "  rankdir=LR;\n"
+    for _, _, node in tree.walk(start, max_depth):
+        if isinstance(node, ConnectionNode):
+            node_id = quote(f"c:{node.identifier}")
+            yield f"  {node_id} [label={quote(node.name)}, shape=box];\n"
+        else:
+            node_id = quote(f"g:{node.identifier}")
+            yield f"  {node_id} [label={quote(node.name)}, shape=folder];\n"
+        if node is not start and node.parentIdentifier is not None:
+            yield f"  {quote(f'g:{node.parentIdentifier}')} -> {node_id};\n"
+    yield "}\n"
+
+
+_RENDERERS: Dict[str, Callable[..., Iterator[str]]] = {
+    "text": _text_lines,
+    "jsonl": _jsonl_lines,
+    "dot": _dot_lines,
+}
+
+
+def render_tree(
+    tree: ConnectionGroupTree,
+    stream: TextIO,
+    fmt: str = "text",
+    max_depth: Optional[int] = None,
+    root_path: Optional[str] = None,
+) -> int:
+    """Write a tree, or one of its subtrees, to a text stream.
+
+    Args:
+        tree: Tree of connection groups and connections
+        stream: Stream to write to
+        fmt: Output format, one of :data:`TREE_FORMATS` (default: 'text')
+        max_depth: Deepest level to write, the start group being level 0
+            (default: None, i.e. unlimited)
+        root_path: Full path of the group to start from (e.g. 'ROOT/DC1')
+            (default: None, i.e. ROOT)
+
+    Returns:
+        Number of lines written
+
+    Raises:
+        ValueError: If the format is unknown or the group does not exist
+    """
+    renderer = _RENDERERS.get(fmt)
+    if renderer is None:
+        raise ValueError(f"Unknown tree format {fmt!r}, expected one of {TREE_FORMATS}")
+
+    start: ConnectionGroupNode = (
+        tree.get_group_by_path(root_path) if root_path is not None else tree.group_tree_root
+    )
+
+    written = 0
+    chunk: List[str] = []
+    for line in renderer(tree, start, max_depth):
+        chunk.append(line)
+        if len(chunk) >= CHUNK_LINES:
+            stream.write("".join(chunk))
+            written += len(chunk)
+            chunk.clear()
+    if chunk:
+        stream.write("".join(chunk))
+        written += len(chunk)
+    stream.flush()
+    return written
@@ -1,6 +1,7 @@
 """Test fixtures for Guacamole API client tests."""
 
 import pytest
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 import responses
 from responses import matchers
@@ -8,6 +9,19 @@ from responses import matchers
 # Configuration constants
 BASE_URL = "http://localhost:8080/guacamole/api"
 
+# The unpatched transport, captured before any test starts mocking requests
+REAL_HTTP_ADAPTER_SEND = HTTPAdapter.send
+
+
+@pytest.fixture
+def live_http(monkeypatch):
+    """Send real HTTP requests, e.g. to a FakeGuacamoleServer.
+
+    Use together with the ``withoutresponses`` marker. The fixture also undoes
+    request mocks that nested ``responses`` fixtures can leave behind.
+    """
+    monkeypatch.setattr(HTTPAdapter, "send", REAL_HTTP_ADAPTER_SEND)
+
 
 @pytest.fixture
 def api_responses(responses):
@@ -47,11 +61,14 @@ def client():
 def bad_client():
     """Fixture for creating a GuacamoleAPIClient instance."""
     from guacamole_csv_importer.api_client import GuacamoleAPIClient
+    from guacamole_csv_importer.throttling import RetryPolicy
 
     return GuacamoleAPIClient(
         base_url=BASE_URL,
         username="admin",
         password="guacadmin",
+        # unmatched mocked requests fail to connect, do not wait between retries
+        retry_policy=RetryPolicy(backoff_factor=0),
     )
 
 
@@ -297,6 +314,23 @@ def mock_post_connection_create_response(api_responses, auth_data, connection_da
     )
 
 
+def mock_patch_connections_response(api_responses, auth_data, identifiers):
+    api_responses.patch(
+        f"{BASE_URL}/session/data/postgresql/connections",
+        json={
+            "patches": [
+                {"op": "add", "path": "/", "identifier": identifier}
+                for identifier in identifiers
+            ]
+        },
+        status=200,
+        match=[
+            matchers.query_param_matcher({"token": auth_data["token"]}),
+            matchers.header_matcher({"Content-Type": "application/json"}),
+        ],
+    )
+
+
 def mock_post_connection_group(api_responses, auth_data, group_name="test-group-1"):
     request_json = {
         "parentIdentifier": "ROOT",
@@ -512,3 +546,37 @@ def default_connections():
             "lastActive": 1742057190918,
         },
     ]
+
+
+@pytest.fixture
+def default_connection_tree(default_connection_group, default_connections):
+    """The default groups and connections as returned by the tree endpoint."""
+    root = {
+        "name": "ROOT",
+        "identifier": "ROOT",
+        "type": "ORGANIZATIONAL",
+        "activeConnections": 0,
+        "attributes": {},
+    }
+    groups = {"ROOT": root}
+    for group in default_connection_group:
+        groups[group["identifier"]] = dict(group)
+    for group in default_connection_group:
+        groups[group["parentIdentifier"]].setdefault("childConnectionGroups", []).append(
+            groups[group["identifier"]]
+        )
+    for connection in default_connections:
+        groups[connection["parentIdentifier"]].setdefault("childConnections", []).append(
+            connection
+        )
+    return root
+
+
+def mock_get_connection_tree_response(api_responses, auth_data, tree):
+    api_responses.get(
+        f"{BASE_URL}/session/data/postgresql/connectionGroups/ROOT/tree",
+        json=tree,
+        match=[
+            matchers.query_param_matcher({"token": auth_data["token"]}),
+        ],
+    )
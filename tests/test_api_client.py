@@ -1,14 +1,26 @@
+import asyncio
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 import pytest_responses  # noqa
+import requests
+from responses import matchers
 
 from guacamole_csv_importer.api_client import GuacamoleAPIClient
+from guacamole_csv_importer.fake_server import FakeGuacamoleServer
+from guacamole_csv_importer.metrics import ImportMetrics
+from guacamole_csv_importer.throttling import RetryPolicy
 # Import from conftest.py
 from .conftest import (
     BASE_URL,
     mock_authenticated_response,
     mock_get_connection_groups_response,
     mock_get_connections_response,
+    mock_get_connection_tree_response,
     mock_post_connection_create_response,
+    mock_patch_connections_response,
     mock_post_connection_group,
     mock_server_error,
 )
@@ -38,6 +50,33 @@ class TestGuacamoleAPIClientInit:
         )
         assert client.base_url == BASE_URL
 
+    def test_connection_pool_settings(self):
+        """Test that pool, compression and keep-alive settings are applied."""
+        client = GuacamoleAPIClient(
+            base_url=BASE_URL,
+            username="admin",
+            password="password",
+            pool_connections=4,
+            pool_maxsize=32,
+            compression=False,
+            tcp_keepalive=30,
+        )
+        adapter = client.session.get_adapter(BASE_URL)
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 32
+        assert client.session.headers["Accept-Encoding"] == "identity"
+        socket_options = adapter.poolmanager.connection_pool_kw["socket_options"]
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in socket_options
+
+    def test_tcp_keepalive_disabled(self):
+        """Test that no extra socket options are set without TCP keep-alive."""
+        client = GuacamoleAPIClient(
+            base_url=BASE_URL, username="admin", password="password", tcp_keepalive=None
+        )
+        adapter = client.session.get_adapter(BASE_URL)
+        assert "socket_options" not in adapter.poolmanager.connection_pool_kw
+        assert client.session.headers["Accept-Encoding"] == "gzip, deflate"
+
 
 class TestGuacamoleAPIClientAuthenticate:
     """Tests for GuacamoleAPIClient.authenticate."""
@@ -170,6 +209,36 @@ class TestGuacamoleAPIClientGetConnections:
             authenticated_client.get_connections()
 
 
+class TestGuacamoleAPIClientGetConnectionTree:
+    """Tests for GuacamoleAPIClient.get_connection_tree."""
+
+    def test_successful_retrieval(
+        self, authenticated_client, api_responses, auth_data, default_connection_tree
+    ):
+        """Test that the nested tree of ROOT is returned in one request."""
+        mock_get_connection_tree_response(api_responses, auth_data, default_connection_tree)
+
+        result = authenticated_client.get_connection_tree()
+
+        assert result["identifier"] == "ROOT"
+        assert [grp["name"] for grp in result["childConnectionGroups"]] == [
+            "c8k",
+            "n9k",
+            "xrv",
+        ]
+        assert [conn["name"] for conn in result["childConnections"]] == ["lnx-1"]
+
+    def test_server_error(self, authenticated_client, api_responses):
+        """Test server error during retrieval."""
+        mock_server_error(
+            api_responses,
+            f"{BASE_URL}/session/data/postgresql/connectionGroups/ROOT/tree",
+        )
+
+        with pytest.raises(ValueError, match="API request failed: Server error"):
+            authenticated_client.get_connection_tree()
+
+
 class TestGuacamoleAPIClientCreateConnection:
     """Tests for GuacamoleAPIClient.create_connection."""
 
@@ -257,6 +326,447 @@ class TestGuacamoleAPIClientCreateConnection:
         assert result is None
 
 
+class TestGuacamoleAPIClientConnectionParameters:
+    """Tests for GuacamoleAPIClient.get_connection_parameters and update_connection."""
+
+    def test_get_connection_parameters(self, authenticated_client, api_responses):
+        """Test retrieval of the parameters of a connection."""
+        api_responses.get(
+            f"{BASE_URL}/session/data/postgresql/connections/1/parameters",
+            json={"hostname": "10.0.0.1", "port": "22"},
+        )
+
+        result = authenticated_client.get_connection_parameters("1")
+
+        assert result == {"hostname": "10.0.0.1", "port": "22"}
+
+    def test_get_connection_parameters_server_error(
+            self, authenticated_client, api_responses
+    ):
+        """Test server error during retrieval of parameters."""
+        mock_server_error(
+            api_responses,
+            f"{BASE_URL}/session/data/postgresql/connections/1/parameters",
+        )
+
+        with pytest.raises(ValueError, match="API request failed: Server error"):
+            authenticated_client.get_connection_parameters("1")
+
+    @pytest.mark.parametrize("status, expected_result", [(204, True), (400, False)])
+    def test_update_connection(
+            self, authenticated_client, api_responses, status, expected_result
+    ):
+        """Test that update_connection PUTs the connection with its identifier."""
+        api_responses.put(
+            f"{BASE_URL}/session/data/postgresql/connections/5", status=status
+        )
+
+        result = authenticated_client.update_connection(
+            "5", {"name": "conn", "protocol": "ssh", "parameters": {}}, "2"
+        )
+
+        assert result is expected_result
+        body = api_responses.calls[-1].request.body
+        assert b'"identifier": "5"' in body
+        assert b'"parentIdentifier": "2"' in body
+
+    def test_update_connection_keeps_attributes(self, authenticated_client, api_responses):
+        """Test that the attributes of the connection are sent unchanged."""
+        api_responses.get(
+            f"{BASE_URL}/session/data/postgresql/connections/5",
+            json={
+                "name": "conn",
+                "identifier": "5",
+                "parentIdentifier": "2",
+                "protocol": "ssh",
+                "attributes": {"max-connections": "15"},
+            },
+        )
+        api_responses.put(f"{BASE_URL}/session/data/postgresql/connections/5", status=204)
+
+        connection = authenticated_client.get_connection("5")
+        connection["parameters"] = {"hostname": "10.0.0.5"}
+        assert authenticated_client.update_connection("5", connection, "2")
+
+        body = json.loads(api_responses.calls[-1].request.body)
+        assert body["attributes"] == {"max-connections": "15"}
+        assert body["parameters"] == {"hostname": "10.0.0.5"}
+
+    def test_iter_connection_parameters(self, authenticated_client, api_responses):
+        """Test that parameters are streamed in order and not cached."""
+        for identifier in ("1", "2"):
+            api_responses.get(
+                f"{BASE_URL}/session/data/postgresql/connections/{identifier}/parameters",
+                json={"hostname": f"10.0.0.{identifier}", "password": "pw"},
+            )
+        mock_server_error(
+            api_responses,
+            f"{BASE_URL}/session/data/postgresql/connections/3/parameters",
+        )
+
+        results = list(authenticated_client.iter_connection_parameters(["1", "2", "3"], 2))
+
+        assert results == [
+            ("1", {"hostname": "10.0.0.1", "password": "pw"}),
+            ("2", {"hostname": "10.0.0.2", "password": "pw"}),
+            ("3", None),
+        ]
+        assert authenticated_client.parameter_cache == {}
+
+    def test_hydrate_parameters(self, authenticated_client, api_responses):
+        """Test that parameters are read once, cached without passwords, and
+        failures left out."""
+        for identifier in ("1", "2"):
+            api_responses.get(
+                f"{BASE_URL}/session/data/postgresql/connections/{identifier}/parameters",
+                json={"hostname": f"10.0.0.{identifier}", "password": "pw"},
+            )
+        mock_server_error(
+            api_responses,
+            f"{BASE_URL}/session/data/postgresql/connections/3/parameters",
+        )
+        authenticated_client.parameter_cache["4"] = {"hostname": "10.0.0.4"}
+
+        first = authenticated_client.hydrate_parameters(["1", "2", "3", "4", "1"])
+        second = authenticated_client.hydrate_parameters(["1", "2", "4"])
+
+        assert first == second == {
+            "1": {"hostname": "10.0.0.1"},
+            "2": {"hostname": "10.0.0.2"},
+            "4": {"hostname": "10.0.0.4"},
+        }
+        assert "3" not in authenticated_client.parameter_cache
+        # the second call is answered from the cache
+        assert len([c for c in api_responses.calls if "parameters" in c.request.url]) == 3
+
+    def test_update_connection_refreshes_cache(self, authenticated_client, api_responses):
+        """Test that an update replaces the cached parameters of the connection."""
+        api_responses.put(f"{BASE_URL}/session/data/postgresql/connections/5", status=204)
+        authenticated_client.parameter_cache["5"] = {"hostname": "old"}
+
+        authenticated_client.update_connection(
+            "5",
+            {
+                "name": "conn",
+                "protocol": "ssh",
+                "parameters": {"hostname": "new", "password": "pw"},
+            },
+        )
+
+        assert authenticated_client.hydrate_parameters(["5"]) == {"5": {"hostname": "new"}}
+
+
+class TestGuacamoleAPIClientCreateConnections:
+    """Tests for GuacamoleAPIClient.create_connections."""
+
+    def test_successful_batch(self, authenticated_client, api_responses, auth_data):
+        """Test that identifiers are returned in the order of the batch."""
+        mock_patch_connections_response(api_responses, auth_data, ["10", "11"])
+
+        result = authenticated_client.create_connections(
+            [
+                ({"name": "conn-1", "protocol": "ssh", "parameters": {}}, "ROOT"),
+                ({"name": "conn-2", "protocol": "ssh", "parameters": {}}, "5"),
+            ]
+        )
+
+        assert result == ["10", "11"]
+        patch = api_responses.calls[-1].request
+        assert patch.method == "PATCH"
+        assert b'"parentIdentifier": "5"' in patch.body
+
+    def test_rejected_batch(self, authenticated_client, api_responses):
+        """Test that a rejected batch returns None."""
+        api_responses.patch(
+            f"{BASE_URL}/session/data/postgresql/connections",
+            json={"message": "Connection names must not be blank.", "patches": []},
+            status=400,
+        )
+
+        result = authenticated_client.create_connections(
+            [({"protocol": "ssh", "parameters": {}}, "ROOT")]
+        )
+
+        assert result is None
+
+    def test_batch_with_unknown_outcome(self, authenticated_client, api_responses):
+        """Test that a batch lost behind a gateway error is not reported as rejected."""
+        api_responses.patch(
+            f"{BASE_URL}/session/data/postgresql/connections",
+            json={"message": "Bad Gateway"},
+            status=502,
+        )
+
+        result = authenticated_client.create_connections(
+            [
+                ({"name": "conn-1", "protocol": "ssh", "parameters": {}}, "ROOT"),
+                ({"name": "conn-2", "protocol": "ssh", "parameters": {}}, "ROOT"),
+            ]
+        )
+
+        assert result == [None, None]
+
+
+class TestGuacamoleAPIClientRetry:
+    """Tests for the retries and rate limiting of GuacamoleAPIClient requests."""
+
+    @pytest.fixture
+    def retrying_client(self, authenticated_client):
+        authenticated_client.retry_policy = RetryPolicy(total=2, backoff_factor=0)
+        return authenticated_client
+
+    def test_retries_transient_errors(self, retrying_client, api_responses, auth_data):
+        """Test that a create answered with 503 is retried until it succeeds."""
+        url = f"{BASE_URL}/session/data/postgresql/connections"
+        api_responses.post(url, json={"message": "Service Unavailable"}, status=503)
+        connection_data = {"name": "conn", "protocol": "ssh", "parameters": {}}
+        mock_post_connection_create_response(api_responses, auth_data, connection_data)
+
+        result = retrying_client.create_connection(dict(connection_data))
+
+        assert result == "10"
+        assert [call.request.method for call in api_responses.calls[-2:]] == ["POST"] * 2
+
+    def test_records_request_metrics(self, retrying_client, api_responses, auth_data):
+        """Test that every attempt is recorded under its endpoint template."""
+        retrying_client.metrics = ImportMetrics()
+        url = f"{BASE_URL}/session/data/postgresql/connections"
+        api_responses.post(url, json={"message": "Service Unavailable"}, status=503)
+        connection_data = {"name": "conn", "protocol": "ssh", "parameters": {}}
+        mock_post_connection_create_response(api_responses, auth_data, connection_data)
+
+        retrying_client.create_connection(dict(connection_data))
+
+        (request,) = retrying_client.metrics.to_dict()["requests"]
+        assert request["endpoint"] == "/session/data/{dataSource}/connections"
+        assert request["statuses"] == {"503": 1, "200": 1}
+        assert request["errors"] == 1
+
+    def test_gives_up_after_total_retries(self, retrying_client, api_responses):
+        """Test that the last response is returned once retries are exhausted."""
+        url = f"{BASE_URL}/session/data/postgresql/connections"
+        api_responses.post(url, json={"message": "Too Many Requests"}, status=429)
+
+        result = retrying_client.create_connection(
+            {"name": "conn", "protocol": "ssh", "parameters": {}}
+        )
+
+        assert result is None
+        assert len([c for c in api_responses.calls if c.request.url.startswith(url)]) == 3
+
+    def test_does_not_retry_client_errors(self, retrying_client, api_responses):
+        """Test that a 400 response is not retried."""
+        url = f"{BASE_URL}/session/data/postgresql/connectionGroups"
+        api_responses.post(url, json={"message": "Bad Request"}, status=400)
+
+        assert retrying_client.create_connection_group("group") is None
+        assert len([c for c in api_responses.calls if c.request.url.startswith(url)]) == 1
+
+    @pytest.mark.parametrize(
+        "failure",
+        [
+            {"json": {"message": "Bad Gateway"}, "status": 502},
+            {"body": requests.exceptions.ConnectionError("Connection aborted")},
+        ],
+        ids=["bad-gateway", "connection-aborted"],
+    )
+    def test_does_not_resend_processed_creates(self, retrying_client, api_responses, failure):
+        """Test that a create which may have reached the server is not sent again."""
+        url = f"{BASE_URL}/session/data/postgresql/connections"
+        api_responses.post(url, **failure)
+
+        result = retrying_client.create_connection(
+            {"name": "conn", "protocol": "ssh", "parameters": {}}
+        )
+
+        assert result is None
+        assert len([c for c in api_responses.calls if c.request.url.startswith(url)]) == 1
+
+    def test_retries_unopened_connections(self, retrying_client, api_responses, auth_data):
+        """Test that a create is sent again if the connection could not be opened."""
+        url = f"{BASE_URL}/session/data/postgresql/connections"
+        api_responses.post(url, body=requests.exceptions.ConnectTimeout("timed out"))
+        connection_data = {"name": "conn", "protocol": "ssh", "parameters": {}}
+        mock_post_connection_create_response(api_responses, auth_data, connection_data)
+
+        assert retrying_client.create_connection(dict(connection_data)) == "10"
+
+    def test_retries_reads_after_gateway_errors(self, retrying_client, api_responses):
+        """Test that a GET answered with 502 is retried."""
+        url = f"{BASE_URL}/session/data/postgresql/connectionGroups"
+        api_responses.get(url, json={"message": "Bad Gateway"}, status=502)
+        api_responses.get(url, json={"1": {"identifier": "1", "name": "group"}})
+
+        assert retrying_client.get_connection_groups() == [{"identifier": "1", "name": "group"}]
+
+    def test_rate_limit(self, auth_data):
+        """Test that a rate limit creates a token bucket of that rate."""
+        client = GuacamoleAPIClient(
+            base_url=BASE_URL,
+            username=auth_data["username"],
+            password=auth_data["password"],
+            rate_limit=50,
+        )
+
+        assert client.rate_limiter.rate == 50
+        assert GuacamoleAPIClient(BASE_URL, "u", "p").rate_limiter is None
+
+
+class TestGuacamoleAPIClientTokenRefresh:
+    """Tests for the re-authentication of requests rejected with an expired token."""
+
+    NEW_TOKEN = "NEW-TOKEN"
+
+    @pytest.fixture
+    def refreshing_client(self, authenticated_client, api_responses, auth_data):
+        """Authenticated client which gets a new token when it re-authenticates."""
+        api_responses.replace(
+            "POST",
+            f"{BASE_URL}/tokens",
+            json=dict(auth_data["response"], authToken=self.NEW_TOKEN),
+            match=[
+                matchers.urlencoded_params_matcher(
+                    {"username": auth_data["username"], "password": auth_data["password"]}
+                )
+            ],
+        )
+        return authenticated_client
+
+    def mock_groups(self, api_responses, token, status):
+        api_responses.get(
+            f"{BASE_URL}/session/data/postgresql/connectionGroups",
+            json={"1": {"name": "group-1"}} if status == 200 else {"message": "Denied"},
+            status=status,
+            match=[matchers.query_param_matcher({"token": token})],
+        )
+
+    @staticmethod
+    def count_calls(api_responses, path):
+        return len([c for c in api_responses.calls if path in c.request.url])
+
+    @pytest.mark.parametrize("status", [401, 403])
+    def test_reauthenticates_and_resends(
+        self, refreshing_client, api_responses, auth_data, status
+    ):
+        """Test that a rejected request is sent again with a new token."""
+        self.mock_groups(api_responses, auth_data["token"], status)
+        self.mock_groups(api_responses, self.NEW_TOKEN, 200)
+        token_calls = self.count_calls(api_responses, "/tokens")
+
+        result = refreshing_client.get_connection_groups()
+
+        assert result == [{"name": "group-1"}]
+        assert refreshing_client.token == self.NEW_TOKEN
+        assert self.count_calls(api_responses, "/tokens") == token_calls + 1
+        assert self.count_calls(api_responses, "/connectionGroups") == 2
+
+    def test_does_not_retry_rejection_after_refresh(
+        self, refreshing_client, api_responses, auth_data
+    ):
+        """Test that a request rejected again after re-authenticating fails."""
+        self.mock_groups(api_responses, auth_data["token"], 401)
+        self.mock_groups(api_responses, self.NEW_TOKEN, 401)
+        token_calls = self.count_calls(api_responses, "/tokens")
+
+        with pytest.raises(ValueError, match="API request failed"):
+            refreshing_client.get_connection_groups()
+
+        assert self.count_calls(api_responses, "/tokens") == token_calls + 1
+        assert self.count_calls(api_responses, "/connectionGroups") == 2
+
+    @pytest.mark.withoutresponses
+    def test_concurrent_requests_reauthenticate_once(self, live_http):
+        """Test that concurrent requests with an expired token re-authenticate once."""
+        with FakeGuacamoleServer() as server:
+            client = GuacamoleAPIClient(server.url, "guacadmin", "guacadmin")
+            assert client.authenticate()
+            client.create_connection_group("site-1")
+            server.expire_token()
+
+            authenticate = client.authenticate
+            auth_calls = []
+
+            def counting_authenticate():
+                auth_calls.append(1)
+                return authenticate()
+
+            client.authenticate = counting_authenticate
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: client.get_connection_groups(), range(8)))
+
+            assert len(auth_calls) == 1
+            assert client.token == server.token
+            assert all(len(groups) == 1 for groups in results)
+
+    @pytest.mark.withoutresponses
+    def test_async_client_reauthenticates_once(self):
+        """Test that the asyncio client re-authenticates once after token expiry."""
+        pytest.importorskip("aiohttp")
+        from guacamole_csv_importer.async_api_client import AsyncGuacamoleAPIClient
+
+        async def run(url):
+            async with AsyncGuacamoleAPIClient(url, "guacadmin", "guacadmin") as client:
+                assert await client.authenticate()
+                await client.create_connection_group("site-1")
+                server.expire_token()
+                results = await asyncio.gather(
+                    *(client.get_connection_groups() for _ in range(8))
+                )
+                return client.token, results
+
+        with FakeGuacamoleServer() as server:
+            token, results = asyncio.run(run(server.url))
+
+            assert token == server.token
+            assert all(len(groups) == 1 for groups in results)
+
+    @pytest.mark.withoutresponses
+    def test_permission_denied_reauthenticates_once(self, live_http):
+        """Test that creates denied to the user do not log in again for every row."""
+        with FakeGuacamoleServer() as server:
+            client = GuacamoleAPIClient(server.url, "guacadmin", "guacadmin")
+            assert client.authenticate()
+            server.read_only = True
+
+            authenticate = client.authenticate
+            auth_calls = []
+
+            def counting_authenticate():
+                auth_calls.append(1)
+                return authenticate()
+
+            client.authenticate = counting_authenticate
+            request_count = server.request_count
+            results = [client.create_connection_group(f"site-{i}") for i in range(10)]
+
+            assert results == [None] * 10
+            assert len(auth_calls) == 1
+            # the first create is sent again after logging in, the others once
+            assert server.request_count - request_count == 1 + 11
+
+    @pytest.mark.withoutresponses
+    def test_async_permission_denied_reauthenticates_once(self):
+        """Test that the asyncio client does not log in again for every denied create."""
+        pytest.importorskip("aiohttp")
+        from guacamole_csv_importer.async_api_client import AsyncGuacamoleAPIClient
+
+        async def run(url):
+            async with AsyncGuacamoleAPIClient(url, "guacadmin", "guacadmin") as client:
+                assert await client.authenticate()
+                server.read_only = True
+                request_count = server.request_count
+                results = [
+                    await client.create_connection_group(f"site-{i}") for i in range(10)
+                ]
+                return results, server.request_count - request_count
+
+        with FakeGuacamoleServer() as server:
+            results, requests_sent = asyncio.run(run(server.url))
+
+            assert results == [None] * 10
+            assert requests_sent == 1 + 11
+
+
 class TestGuacamoleAPIClientCreateConnectionGroup:
     """Tests for GuacamoleAPIClient.create_connection_group."""
 
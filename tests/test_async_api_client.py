@@ -0,0 +1,135 @@
+"""Tests for the retries and error handling of AsyncGuacamoleAPIClient."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from guacamole_csv_importer.throttling import RetryPolicy
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from guacamole_csv_importer.async_api_client import AsyncGuacamoleAPIClient  # noqa: E402
+
+CONNECTIONS = "/api/session/data/postgresql/connections"
+CONNECTION_GROUPS = "/api/session/data/postgresql/connectionGroups"
+
+
+def run_client(answers, call):
+    """Run ``call`` with an authenticated client against scripted answers.
+
+    Args:
+        answers: Dictionary of request path to the list of
+            (status, JSON body or None) answers of its successive requests
+        call: Coroutine function taking the client
+
+    Returns:
+        Tuple of (result of ``call``, paths of the requests after authenticating)
+    """
+    requests = []
+
+    async def handle(request):
+        if request.path == "/api/tokens":
+            return web.json_response({"authToken": "TOKEN", "dataSource": "postgresql"})
+        requests.append(request.path)
+        status, body = answers[request.path].pop(0)
+        if body is None:
+            return web.Response(status=status)
+        return web.json_response(body, status=status)
+
+    async def main():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handle)
+        async with TestServer(app) as server:
+            async with AsyncGuacamoleAPIClient(
+                str(server.make_url("/api")),
+                "guacadmin",
+                "guacadmin",
+                retry_policy=RetryPolicy(total=2, backoff_factor=0),
+            ) as client:
+                assert await client.authenticate()
+                return await call(client)
+
+    return asyncio.run(main()), requests
+
+
+def create_connection(client):
+    return client.create_connection({"name": "conn", "protocol": "ssh", "parameters": {}})
+
+
+def test_retries_unavailable_create():
+    """Test that a create answered with 503 is retried until it succeeds."""
+    result, requests = run_client(
+        {CONNECTIONS: [(503, {"message": "Unavailable"}), (200, {"identifier": "7"})]},
+        create_connection,
+    )
+
+    assert result == "7"
+    assert requests == [CONNECTIONS] * 2
+
+
+def test_gives_up_after_total_retries():
+    """Test that a create fails once its retries are exhausted."""
+    result, requests = run_client(
+        {CONNECTIONS: [(429, {"message": "Too Many Requests"})] * 3},
+        create_connection,
+    )
+
+    assert result is None
+    assert requests == [CONNECTIONS] * 3
+
+
+def test_does_not_resend_create_after_gateway_error():
+    """Test that a create which may have reached the server is not sent again."""
+    result, requests = run_client(
+        {CONNECTIONS: [(502, {"message": "Bad Gateway"})]}, create_connection
+    )
+
+    assert result is None
+    assert requests == [CONNECTIONS]
+
+
+def test_retries_reads_after_gateway_errors():
+    """Test that a GET answered with 502 is retried."""
+    result, requests = run_client(
+        {
+            CONNECTION_GROUPS: [
+                (502, {"message": "Bad Gateway"}),
+                (200, {"1": {"identifier": "1", "name": "group"}}),
+            ]
+        },
+        lambda client: client.get_connection_groups(),
+    )
+
+    assert result == [{"identifier": "1", "name": "group"}]
+    assert requests == [CONNECTION_GROUPS] * 2
+
+
+@pytest.mark.parametrize("path", [CONNECTIONS, CONNECTION_GROUPS])
+def test_create_without_body(path):
+    """Test that a create answered without a body fails instead of raising."""
+    result, _ = run_client(
+        {path: [(200, None)]},
+        create_connection
+        if path == CONNECTIONS
+        else lambda client: client.create_connection_group("group"),
+    )
+
+    assert result is None
+
+
+def test_create_timeout():
+    """Test that a create which timed out after its retries fails instead of raising."""
+
+    async def call(client):
+        client._request = AsyncMock(side_effect=asyncio.TimeoutError())
+        return (
+            await create_connection(client),
+            await client.create_connection_group("group"),
+        )
+
+    result, _ = run_client({}, call)
+
+    assert result == (None, None)
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import pytest
+from unittest.mock import AsyncMock
+
+from guacamole_csv_importer.async_importer import AsyncConnectionImporter
+
+
+@pytest.fixture
+def fake_async_api_client(default_connection_tree):
+    class FakeAsyncApiClient:
+        def __init__(self):
+            self.authenticate = AsyncMock(return_value=True)
+            self.get_connection_tree = AsyncMock(return_value=default_connection_tree)
+            self.create_connection = AsyncMock(return_value="100")
+            self.create_connection_group = AsyncMock(side_effect=["10", "11"])
+
+    return FakeAsyncApiClient()
+
+
+def test_async_importer(fake_async_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_1.csv"
+    )
+
+    importer = AsyncConnectionImporter(fake_async_api_client, concurrency=8)
+    successful, total = asyncio.run(importer.import_connections(test_csv_path))
+
+    assert (successful, total) == (1, 1)
+    assert fake_async_api_client.create_connection_group.await_count == 2
+    fake_async_api_client.create_connection.assert_awaited_once()
+    assert fake_async_api_client.create_connection.await_args.args[1] == "11"
+
+
+def test_async_importer_rejects_invalid_concurrency(fake_async_api_client):
+    with pytest.raises(ValueError):
+        AsyncConnectionImporter(fake_async_api_client, concurrency=0)
+
+
+def test_async_importer_collects_failed_creates(fake_async_api_client, caplog):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_async_api_client.create_connection_group = AsyncMock(
+        side_effect=["10", "11", "12", "13"]
+    )
+    fake_async_api_client.create_connection = AsyncMock(
+        side_effect=["100", RuntimeError("boom"), None, "101"]
+    )
+
+    importer = AsyncConnectionImporter(fake_async_api_client, concurrency=8)
+    successful, total = asyncio.run(importer.import_connections(test_csv_path))
+
+    # c8k-1 already exists, one create fails and one raises
+    assert (successful, total) == (2, 5)
+    assert "RuntimeError('boom')" in caplog.text
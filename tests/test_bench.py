@@ -0,0 +1,62 @@
+"""Tests for the benchmark harness and the fake Guacamole server."""
+
+import csv
+
+import pytest
+
+from guacamole_csv_importer.api_client import GuacamoleAPIClient
+from guacamole_csv_importer.bench import generate_csv, percentile, run_benchmark
+from guacamole_csv_importer.fake_server import FakeGuacamoleServer
+
+
+def test_generate_csv(tmp_path):
+    """Test that the synthetic CSV has one row per device of every site."""
+    path = tmp_path / "bench.csv"
+    assert generate_csv(path, sites=3, devices=4) == 12
+
+    with open(path, newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    assert len(rows) == 12
+    assert len({row["site"] for row in rows}) == 3
+
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile([float(i) for i in range(1, 101)], 99) == 99.0
+
+
+@pytest.mark.withoutresponses
+def test_fake_server_round_trip(live_http):
+    """Test the API client against the fake server."""
+    with FakeGuacamoleServer() as server:
+        client = GuacamoleAPIClient(server.url, "guacadmin", "guacadmin")
+        assert client.authenticate()
+
+        group_id = client.create_connection_group("site-1")
+        connection_id = client.create_connection(
+            {"name": "dev-1", "protocol": "ssh", "parameters": {"hostname": "h"}},
+            group_id,
+        )
+
+        assert [grp["name"] for grp in client.get_connection_groups()] == ["site-1"]
+        assert client.get_connections()[0]["parentIdentifier"] == group_id
+        assert client.get_connection_parameters(connection_id) == {"hostname": "h"}
+
+        tree = client.get_connection_tree()
+        assert tree["identifier"] == "ROOT" and "childConnections" not in tree
+        site = tree["childConnectionGroups"][0]
+        assert [conn["identifier"] for conn in site["childConnections"]] == [connection_id]
+
+
+@pytest.mark.withoutresponses
+def test_run_benchmark(live_http):
+    """Test that a small benchmark imports every row and reports its metrics."""
+    report = run_benchmark(sites=2, devices=5, workers=2, batch_size=3)
+
+    assert report["total"] == 10
+    assert report["successful"] == 10
+    assert report["connections_on_server"] == 10
+    assert report["rows_per_second"] > 0
+    assert report["latency_p99_ms"] >= report["latency_p50_ms"]
@@ -0,0 +1,72 @@
+"""Tests for the checkpoint journal module."""
+
+from pathlib import Path
+
+from guacamole_csv_importer.checkpoint import CheckpointJournal, default_journal_path
+from guacamole_csv_importer.connection_csv_data import ConnectionCsvData
+
+
+def make_row(device_name, hostname="10.0.0.1"):
+    return ConnectionCsvData(
+        site="ROOT/DC1",
+        device_name=device_name,
+        hostname=hostname,
+        protocol="ssh",
+        port="22",
+        username="admin",
+        password="secret",
+    )
+
+
+def test_default_journal_path():
+    assert default_journal_path(Path("/data/connections.csv")) == Path(
+        "/data/connections.csv.journal.jsonl"
+    )
+
+
+def test_resume_skips_recorded_rows(tmp_path):
+    """Test that recorded rows are applied on resume, unless they changed."""
+    path = tmp_path / "import.journal.jsonl"
+    with CheckpointJournal(path) as journal:
+        journal.record(make_row("sw-01"), "100")
+        journal.record(make_row("sw-02"), "101")
+
+    with CheckpointJournal(path, resume=True) as journal:
+        assert len(journal) == 2
+        assert journal.is_applied(make_row("sw-01"))
+        assert not journal.is_applied(make_row("sw-02", hostname="10.0.0.2"))
+        assert not journal.is_applied(make_row("sw-03"))
+
+    assert "secret" not in path.read_text()
+
+
+def test_new_journal_truncates(tmp_path):
+    """Test that a journal opened without resume starts empty."""
+    path = tmp_path / "import.journal.jsonl"
+    with CheckpointJournal(path) as journal:
+        journal.record(make_row("sw-01"), "100")
+
+    with CheckpointJournal(path) as journal:
+        assert not journal.is_applied(make_row("sw-01"))
+    assert path.read_text() == ""
+
+
+def test_resume_ignores_truncated_line(tmp_path):
+    """Test that a line cut short by a killed import is ignored."""
+    path = tmp_path / "import.journal.jsonl"
+    with CheckpointJournal(path) as journal:
+        journal.record(make_row("sw-01"), "100")
+    with open(path, "a") as journal_file:
+        journal_file.write('{"site":"ROOT/DC1","na')
+
+    with CheckpointJournal(path, resume=True) as journal:
+        assert len(journal) == 1
+
+
+def test_unwritable_journal_is_skipped(tmp_path):
+    """Test that a journal which cannot be opened does not fail the import."""
+    path = tmp_path / "missing-file-parent"
+    path.write_text("")
+    with CheckpointJournal(path / "import.journal.jsonl") as journal:
+        journal.record(make_row("sw-01"), "100")
+        assert not journal.is_applied(make_row("sw-01"))
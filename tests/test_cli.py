@@ -0,0 +1,42 @@
+"""Tests for the command line interface."""
+
+import pytest
+
+from guacamole_csv_importer.cli import main
+from guacamole_csv_importer.fake_server import FakeGuacamoleServer
+
+CSV = """site,device_name,hostname,protocol,port,username,password
+DC1/Rack1,sw-01,192.168.1.1,ssh,22,admin,secret
+DC1/Rack1,sw-02,192.168.1.2,ssh,22,admin,secret
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "connections.csv"
+    path.write_text(CSV)
+    return path
+
+
+@pytest.mark.withoutresponses
+def test_sync_rerun_of_up_to_date_server_succeeds(live_http, csv_path):
+    """Test that a sync which finds nothing to update exits with 0."""
+    with FakeGuacamoleServer() as server:
+        args = ["--url", server.url, "-u", "guacadmin", "-p", "guacadmin", str(csv_path)]
+        assert main(args) == 0
+
+        assert main(args + ["--sync"]) == 0
+        assert len(server.connections) == 2
+
+
+@pytest.mark.parametrize(
+    "option",
+    [["--sync"], ["--cache", "cache.sqlite"], ["--batch-size", "10"], ["--journal", "j.jsonl"]],
+    ids=["sync", "cache", "batch-size", "journal"],
+)
+def test_async_rejects_unsupported_options(csv_path, option, caplog):
+    """Test that --async refuses options it would otherwise ignore."""
+    args = ["--url", "http://localhost:8080/guacamole", "-u", "admin", "-p", "secret"]
+
+    assert main(args + ["--async", *option, str(csv_path)]) == 1
+    assert f"Not supported with --async: {option[0]}" in caplog.text
@@ -11,3 +11,171 @@ def test_connection_group_tree(default_connection_group, default_connections):
     assert tree.path_mapping["ROOT/c8k"] == c8k_grp
 
     tree.print_tree()
+
+
+def test_add_group_updates_indexes(default_connection_group, default_connections):
+    tree = ConnectionGroupTree()
+    tree.build_from_data(default_connection_group, default_connections)
+
+    c8k_grp = tree.find_group("1")
+    lab_grp = tree.add_group(
+        c8k_grp,
+        {
+            "name": "lab",
+            "identifier": "10",
+            "parentIdentifier": "1",
+            "type": "ORGANIZATIONAL",
+            "activeConnections": 0,
+            "attributes": {},
+        },
+    )
+
+    assert tree.find_group("10") is lab_grp
+    assert tree.path_mapping["ROOT/c8k/lab"] is lab_grp
+    assert tree.reverse_get_full_path_name(lab_grp) == "ROOT/c8k/lab"
+    assert tree.find_group("missing") is None
+
+
+def test_build_from_data_reports_orphans(default_connection_group, default_connections):
+    groups = [
+        {
+            "name": "nested",
+            "identifier": "11",
+            "parentIdentifier": "10",
+            "type": "ORGANIZATIONAL",
+            "activeConnections": 0,
+            "attributes": {},
+        },
+        {
+            "name": "child",
+            "identifier": "10",
+            "parentIdentifier": "1",
+            "type": "ORGANIZATIONAL",
+            "activeConnections": 0,
+            "attributes": {},
+        },
+        {
+            "name": "other-data-source",
+            "identifier": "20",
+            "parentIdentifier": "99",
+            "type": "ORGANIZATIONAL",
+            "activeConnections": 0,
+            "attributes": {},
+        },
+    ]
+    connections = [
+        {
+            "name": "lost",
+            "identifier": "30",
+            "parentIdentifier": "99",
+            "protocol": "ssh",
+            "attributes": {},
+        }
+    ]
+
+    tree = ConnectionGroupTree()
+    tree.build_from_data(
+        default_connection_group + groups, default_connections + connections
+    )
+
+    # Groups listed before their parent are still attached
+    assert tree.path_mapping["ROOT/c8k/child/nested"] is tree.find_group("11")
+    assert [grp["identifier"] for grp in tree.orphan_groups] == ["20"]
+    assert [conn["identifier"] for conn in tree.orphan_connections] == ["30"]
+    assert tree.find_group("20") is None
+
+
+def test_child_lookups_by_name(default_connection_group, default_connections):
+    tree = ConnectionGroupTree()
+    tree.build_from_data(default_connection_group, default_connections)
+
+    root = tree.group_tree_root
+    assert root.get_group_in_children("n9k") is tree.find_group("2")
+    assert root.get_group_in_children("missing") is None
+    assert root.get_connection_in_children("lnx-1").identifier == "7"
+
+    conn = tree.find_group("3").add_connection(
+        {
+            "name": "xrv-3",
+            "identifier": "8",
+            "parentIdentifier": "3",
+            "protocol": "ssh",
+            "attributes": {},
+        }
+    )
+    assert tree.find_group("3").get_connection_in_children("xrv-3") is conn
+    assert [c.name for c in tree.find_group("3").connections] == [
+        "xrv-1",
+        "xrv-2",
+        "xrv-3",
+    ]
+
+
+def test_to_data_round_trip(default_connection_group, default_connections):
+    tree = ConnectionGroupTree()
+    tree.build_from_data(default_connection_group, default_connections)
+    tree.find_group("1").connections[0].parameters = {
+        "hostname": "10.0.0.1",
+        "password": "secret",
+    }
+
+    groups, connections = tree.to_data()
+    rebuilt = ConnectionGroupTree()
+    rebuilt.build_from_data(groups, connections)
+
+    assert sorted(rebuilt.path_mapping) == sorted(tree.path_mapping)
+    assert len(connections) == len(default_connections)
+    # parameters are read from the server again, never from a snapshot
+    c8k_1 = rebuilt.find_group("1").get_connection_in_children("c8k-1")
+    assert c8k_1.parameters is None
+    assert all("parameters" not in connection for connection in connections)
+
+
+def test_build_from_nested(
+    default_connection_group, default_connections, default_connection_tree
+):
+    flat = ConnectionGroupTree()
+    flat.build_from_data(default_connection_group, default_connections)
+
+    tree = ConnectionGroupTree()
+    tree.build_from_nested(default_connection_tree)
+
+    assert tree.to_data() == flat.to_data()
+    assert tree.path_mapping.keys() == flat.path_mapping.keys()
+    assert tree.counts() == (3, 7)
+    xrv_1 = tree.get_group_by_path("xrv").get_connection_in_children("xrv-1")
+    assert xrv_1.parentIdentifier == "3"
+
+
+def test_build_from_nested_deep_tree():
+    """Test that nested payloads deeper than the recursion limit load."""
+    root = {"name": "ROOT", "identifier": "ROOT"}
+    record = root
+    for level in range(5000):
+        child = {"name": f"g{level}", "identifier": str(level), "type": "ORGANIZATIONAL"}
+        record["childConnectionGroups"] = [child]
+        record = child
+    record["childConnections"] = [{"name": "leaf", "identifier": "1", "protocol": "ssh"}]
+
+    tree = ConnectionGroupTree(keep_attributes=False)
+    tree.build_from_nested(root)
+
+    assert tree.counts() == (5000, 1)
+    leaf = tree.find_group("4999").get_connection_in_children("leaf")
+    assert leaf.parentIdentifier == "4999"
+
+
+def test_compact_tree_without_attributes(default_connection_group, default_connections):
+    tree = ConnectionGroupTree(keep_attributes=False)
+    tree.build_from_data(default_connection_group, default_connections)
+
+    c8k_grp = tree.find_group("1")
+    c8k_1 = c8k_grp.get_connection_in_children("c8k-1")
+    assert not hasattr(c8k_1, "__dict__")
+    assert c8k_grp.attributes is None and c8k_1.attributes is None
+    # equal strings from different records share one object
+    assert c8k_1.parentIdentifier is c8k_grp.identifier
+    assert c8k_1.protocol is tree.find_group("2").connections[0].protocol
+
+    groups, connections = tree.to_data()
+    assert all(record["attributes"] == {} for record in groups + connections)
@@ -2,7 +2,8 @@
 
 import pytest
 from pathlib import Path
-from guacamole_csv_importer.csv_parser import CSVParser
+from guacamole_csv_importer.connection_csv_data import ConnectionCsvData
+from guacamole_csv_importer.csv_parser import CSVParser, expand_csv_paths, parse_csv_files
 
 
 def test_validate_headers_valid():
@@ -60,3 +61,138 @@ def test_process_row_missing_required():
     }
     with pytest.raises(ValueError):
         parser._process_row(row)
+
+
+@pytest.fixture(params=["csv", "pyarrow"])
+def backend(request):
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+
+def test_iter_rows_streams_connections(tmp_path, backend):
+    """Test that iter_rows yields ConnectionCsvData and skips invalid rows."""
+    csv_file = tmp_path / "connections.csv"
+    csv_file.write_text(
+        "site,device_name,hostname,protocol,port,username,password\n"
+        "DC1/Rack1,sw-01,192.168.1.1,ssh,22,admin,admin\n"
+        "DC1/Rack1,sw-02,,ssh,22,admin,admin\n"
+        "DC1/Rack2,sw-03,192.168.1.3,telnet,23,admin,admin\n"
+    )
+    parser = CSVParser(csv_file, backend=backend)
+
+    rows = parser.iter_rows()
+    first = next(rows)
+    assert isinstance(first, ConnectionCsvData)
+    assert (first.site, first.device_name) == ("DC1/Rack1", "sw-01")
+    assert [row.device_name for row in rows] == ["sw-03"]
+
+
+def test_iter_rows_column_order_and_short_rows(tmp_path, backend):
+    """Test that columns are mapped by header and malformed rows are skipped."""
+    csv_file = tmp_path / "connections.csv"
+    csv_file.write_text(
+        "device_name,notes,password,username,port,protocol,hostname,site\n"
+        "sw-01,core,pw,admin,22,ssh,10.0.0.1,DC1\n"
+        "sw-02,edge\n"
+        "\n"
+        'sw-03,"multi\nline",pw,admin,23,telnet,10.0.0.3,DC2\n'
+    )
+
+    rows = list(CSVParser(csv_file, backend=backend).iter_rows())
+
+    assert [row.to_dict() for row in rows] == [
+        {
+            "site": "DC1",
+            "device_name": "sw-01",
+            "hostname": "10.0.0.1",
+            "protocol": "ssh",
+            "port": "22",
+            "username": "admin",
+            "password": "pw",
+        },
+        {
+            "site": "DC2",
+            "device_name": "sw-03",
+            "hostname": "10.0.0.3",
+            "protocol": "telnet",
+            "port": "23",
+            "username": "admin",
+            "password": "pw",
+        },
+    ]
+
+
+def test_iter_rows_column_count_mismatch(tmp_path, backend):
+    """Test that rows with extra or missing optional columns are kept by both backends."""
+    csv_file = tmp_path / "connections.csv"
+    csv_file.write_text(
+        "site,device_name,hostname,protocol,port,username,password,notes\n"
+        "DC1,sw-01,10.0.0.1,ssh,22,admin,pw,core,extra\n"
+        "DC1,sw-02,10.0.0.2,ssh,22,admin,pw,edge\n"
+        "DC1,sw-03,10.0.0.3,ssh,22,admin\n"
+        "DC1,sw-04,10.0.0.4,ssh,22,admin,pw\n"
+        "DC1,sw-05\n"
+        "DC1,sw-06,10.0.0.6,ssh,22,admin,pw,,\n"
+    )
+
+    rows = list(CSVParser(csv_file, backend=backend).iter_rows())
+
+    assert [row.device_name for row in rows] == ["sw-01", "sw-02", "sw-04", "sw-06"]
+
+
+def test_iter_rows_invalid_headers(tmp_path, backend):
+    csv_file = tmp_path / "connections.csv"
+    csv_file.write_text("site,device_name\nDC1,sw-01\n")
+
+    with pytest.raises(ValueError, match="Invalid CSV headers"):
+        list(CSVParser(csv_file, backend=backend).iter_rows())
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        CSVParser(Path("dummy.csv"), backend="pandas")
+
+
+def test_iter_rows_missing_file():
+    """Test that iter_rows raises FileNotFoundError for a missing file."""
+    with pytest.raises(FileNotFoundError):
+        next(CSVParser(Path("missing.csv")).iter_rows())
+
+
+HEADER = "site,device_name,hostname,protocol,port,username,password\n"
+
+
+def test_expand_csv_paths(tmp_path):
+    """Test that files, globs and directories expand to unique CSV files."""
+    (tmp_path / "regions").mkdir()
+    for name in ["regions/eu.csv", "regions/us.csv", "regions/notes.txt", "extra.csv"]:
+        (tmp_path / name).write_text(HEADER)
+
+    paths = expand_csv_paths(
+        [tmp_path / "regions", str(tmp_path / "regions" / "*.csv"), tmp_path / "extra.csv"]
+    )
+
+    assert paths == [
+        tmp_path / "regions" / "eu.csv",
+        tmp_path / "regions" / "us.csv",
+        tmp_path / "extra.csv",
+    ]
+    with pytest.raises(FileNotFoundError):
+        expand_csv_paths([str(tmp_path / "missing-*.csv")])
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_parse_csv_files(tmp_path, processes):
+    """Test that files parsed in a process pool keep their order."""
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"region-{index}.csv"
+        path.write_text(HEADER + f"DC{index},sw-{index},10.0.0.{index},ssh,22,admin,admin\n")
+        paths.append(path)
+
+    parsed = list(parse_csv_files(paths, processes=processes))
+
+    assert [[row.device_name for row in rows] for rows in parsed] == [
+        ["sw-0"], ["sw-1"], ["sw-2"]
+    ]
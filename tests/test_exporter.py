@@ -0,0 +1,85 @@
+import pytest
+
+import csv
+import io
+import stat
+
+from unittest.mock import MagicMock
+
+from guacamole_csv_importer.api_client import GuacamoleAPIClient
+from guacamole_csv_importer.csv_parser import CSVParser
+from guacamole_csv_importer.exporter import CSV_FIELDS, ConnectionExporter
+from guacamole_csv_importer.importer import ConnectionImporter
+from guacamole_csv_importer.progress import ProgressReporter
+
+
+PARAMETERS = {
+    "7": {"hostname": "10.0.0.7", "port": "22", "username": "root", "password": "pw"},
+    "1": {"hostname": "10.0.1.1", "port": "22", "username": "admin", "password": "pw"},
+    "2": {"hostname": "10.0.1.2", "port": "22", "username": "admin"},
+}
+
+
+@pytest.fixture
+def fake_api_client(default_connection_tree):
+    class FakeApiClient:
+        # the real streaming reads, on top of the fake get_connection_parameters
+        iter_connection_parameters = GuacamoleAPIClient.iter_connection_parameters
+
+        def __init__(self):
+            self.authenticate = MagicMock(return_value=True)
+            self.get_connection_tree = MagicMock(return_value=default_connection_tree)
+
+        def get_connection_parameters(self, identifier):
+            if identifier not in PARAMETERS:
+                raise ValueError("API request failed")
+            return PARAMETERS[identifier]
+
+    return FakeApiClient()
+
+
+def test_exporter_writes_rows_in_tree_order(fake_api_client):
+    out = io.StringIO()
+    exporter = ConnectionExporter(
+        fake_api_client, workers=1, progress=ProgressReporter(interval=0)
+    )
+
+    exported, failed = exporter.export_connections(out, root_path="c8k")
+
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows == [
+        CSV_FIELDS,
+        ["c8k", "c8k-1", "10.0.1.1", "ssh", "22", "admin", "pw"],
+        ["c8k", "c8k-2", "10.0.1.2", "ssh", "22", "admin", ""],
+    ]
+    assert (exported, failed) == (2, 0)
+
+
+def test_exporter_skips_unreadable_connections(
+    fake_api_client, default_connections, tmp_path
+):
+    output = tmp_path / "export.csv"
+    exporter = ConnectionExporter(
+        fake_api_client, workers=4, progress=ProgressReporter(interval=0)
+    )
+
+    exported, failed = exporter.export_connections(output)
+
+    assert exported == 3
+    assert failed == len(default_connections) - 3
+    assert not list(tmp_path.glob(".*.tmp"))
+    assert stat.S_IMODE(output.stat().st_mode) == 0o600
+    # rows exported with all fields can be imported again; ROOT is kept as the site
+    rows = list(CSVParser(output).iter_rows())
+    assert [(row.site, row.device_name) for row in rows] == [
+        ("ROOT", "lnx-1"),
+        ("c8k", "c8k-1"),
+    ]
+    assert ConnectionImporter._normalize_site(rows[0]).site == "ROOT"
+
+
+def test_exporter_rejects_unknown_group(fake_api_client):
+    exporter = ConnectionExporter(fake_api_client, progress=ProgressReporter(interval=0))
+
+    with pytest.raises(ValueError):
+        exporter.export_connections(io.StringIO(), root_path="ROOT/missing")
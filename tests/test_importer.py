@@ -4,18 +4,31 @@ import os
 
 from unittest.mock import MagicMock
 
+from guacamole_csv_importer.api_client import GuacamoleAPIClient
+from guacamole_csv_importer.checkpoint import CheckpointJournal
 from guacamole_csv_importer.importer import ConnectionImporter
+from guacamole_csv_importer.metrics import ImportMetrics
+from guacamole_csv_importer.planner import ImportPlan
+from guacamole_csv_importer.progress import ProgressReporter
+from guacamole_csv_importer.snapshot_cache import SnapshotCache
 
 
 @pytest.fixture
-def fake_api_client(default_connection_group, default_connections):
+def fake_api_client(default_connection_tree, default_connections):
+    connections = {connection["identifier"]: connection for connection in default_connections}
+
     class FakeApiClient:
+        # the real hydration layer, on top of the fake get_connection_parameters
+        iter_connection_parameters = GuacamoleAPIClient.iter_connection_parameters
+        hydrate_parameters = GuacamoleAPIClient.hydrate_parameters
+
         def __init__(self):
+            self.parameter_cache = {}
             self.authenticate = MagicMock(return_value=True)
-            self.get_connection_groups = MagicMock(
-                return_value=default_connection_group
+            self.get_connection_tree = MagicMock(return_value=default_connection_tree)
+            self.get_connection = MagicMock(
+                side_effect=lambda identifier: dict(connections[identifier])
             )
-            self.get_connections = MagicMock(return_value=default_connections)
             self.create_connection = MagicMock(return_value=True)
             self.create_connection_group = MagicMock(return_value=True)
 
@@ -34,3 +47,408 @@ def test_importer(fake_api_client):
     importer.import_connections(test_csv_path)
 
     assert importer is not None
+
+
+def test_importer_concurrent_workers(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_1.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11"])
+    fake_api_client.create_connection = MagicMock(return_value="100")
+
+    importer = ConnectionImporter(fake_api_client, workers=4)
+    successful, total = importer.import_connections(test_csv_path)
+
+    assert (successful, total) == (1, 1)
+    # The parent group path is created before the connection is posted
+    assert fake_api_client.create_connection_group.call_count == 2
+    fake_api_client.create_connection.assert_called_once()
+    assert fake_api_client.create_connection.call_args.args[1] == "11"
+
+
+def test_importer_rejects_invalid_workers(fake_api_client):
+    with pytest.raises(ValueError):
+        ConnectionImporter(fake_api_client, workers=0)
+
+
+def test_importer_batched_creates(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connections = MagicMock(
+        side_effect=lambda batch: [str(100 + i) for i in range(len(batch))]
+    )
+    fake_api_client.create_connection = MagicMock(return_value="200")
+
+    importer = ConnectionImporter(fake_api_client, batch_size=3)
+    successful, total = importer.import_connections(test_csv_path)
+
+    # c8k-1 already exists, the other four rows are sent as batches of 3 and 1
+    assert (successful, total) == (4, 5)
+    batches = [call.args[0] for call in fake_api_client.create_connections.call_args_list]
+    assert [len(batch) for batch in batches] == [3]
+    assert [parent for _, parent in batches[0]] == ["11", "11", "12"]
+    fake_api_client.create_connection.assert_called_once()
+
+
+def test_importer_batch_fallback(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connections = MagicMock(return_value=None)
+    fake_api_client.create_connection = MagicMock(return_value="200")
+
+    importer = ConnectionImporter(fake_api_client, batch_size=10)
+    successful, total = importer.import_connections(test_csv_path)
+
+    assert (successful, total) == (4, 5)
+    fake_api_client.create_connections.assert_called_once()
+    assert fake_api_client.create_connection.call_count == 4
+
+
+@pytest.mark.parametrize(
+    "deployed_hostname, expected_updates",
+    [("10.0.0.1", 0), ("10.0.0.99", 1)],
+)
+def test_importer_sync_updates_changed_rows(
+    fake_api_client, deployed_hostname, expected_updates
+):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(return_value="200")
+    fake_api_client.get_connection_parameters = MagicMock(
+        return_value={"hostname": deployed_hostname, "port": "22", "username": "admin"}
+    )
+    fake_api_client.update_connection = MagicMock(return_value=True)
+
+    importer = ConnectionImporter(fake_api_client, sync=True)
+    successful, total = importer.import_connections(test_csv_path)
+
+    # c8k-1 is synced whether or not it had to be updated
+    assert (successful, total) == (5, 5)
+    fake_api_client.get_connection_parameters.assert_called_once_with("1")
+    assert fake_api_client.update_connection.call_count == expected_updates
+
+
+def test_importer_sync_keeps_unmanaged_settings(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(return_value="200")
+    fake_api_client.get_connection_parameters = MagicMock(
+        return_value={
+            "hostname": "10.0.0.99",
+            "port": "22",
+            "username": "admin",
+            "enable-sftp": "true",
+        }
+    )
+    fake_api_client.update_connection = MagicMock(return_value=True)
+
+    ConnectionImporter(fake_api_client, sync=True).import_connections(test_csv_path)
+
+    identifier, data, parent_id = fake_api_client.update_connection.call_args.args
+    assert (identifier, parent_id) == ("1", "1")
+    assert data["parameters"]["hostname"] == "10.0.0.1"
+    assert data["parameters"]["enable-sftp"] == "true"
+    assert data["attributes"]["max-connections"] == "15"
+    assert data["attributes"]["failover-only"] == "true"
+
+
+def test_importer_snapshot_cache(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(
+        side_effect=[str(100 + i) for i in range(4)]
+    )
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+
+    ConnectionImporter(fake_api_client, snapshot_cache=cache).import_connections(
+        test_csv_path
+    )
+    successful, total = ConnectionImporter(
+        fake_api_client, snapshot_cache=cache
+    ).import_connections(test_csv_path)
+
+    # The second run reads the tree, including the new connections, from cache
+    assert (successful, total) == (0, 5)
+    fake_api_client.get_connection_tree.assert_called_once()
+
+
+def test_importer_sync_reads_live_parameters_after_cache_hit(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(
+        side_effect=[str(100 + i) for i in range(4)]
+    )
+    # parameters on the server: c8k-1 (ID 1) and the connections created below
+    live = {"1": {"hostname": "10.0.0.1", "port": "22", "username": "admin"}}
+    for index, port in enumerate(["22", "22", "22", "23"]):
+        live[str(100 + index)] = {
+            "hostname": f"192.168.1.{index + 1}", "port": port, "username": "admin"
+        }
+    fake_api_client.get_connection_parameters = MagicMock(
+        side_effect=lambda identifier: dict(live[identifier])
+    )
+    fake_api_client.update_connection = MagicMock(return_value=True)
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+
+    ConnectionImporter(fake_api_client, sync=True, snapshot_cache=cache).import_connections(
+        test_csv_path
+    )
+    fake_api_client.update_connection.assert_not_called()
+
+    # c8k-1 is edited on the server; the next run starts with a new client
+    live["1"]["hostname"] = "10.0.0.99"
+    fake_api_client.parameter_cache.clear()
+    successful, total = ConnectionImporter(
+        fake_api_client, sync=True, snapshot_cache=cache
+    ).import_connections(test_csv_path)
+
+    assert (successful, total) == (5, 5)
+    fake_api_client.get_connection_tree.assert_called_once()
+    fake_api_client.update_connection.assert_called_once()
+
+
+def test_importer_invalidates_snapshot_on_failure(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_1.csv"
+    )
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11"])
+    fake_api_client.create_connection = MagicMock(return_value=None)
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+    cache.save(fake_api_client.base_url, "postgresql", "guacadmin", [], [])
+
+    ConnectionImporter(fake_api_client, snapshot_cache=cache).import_connections(
+        test_csv_path
+    )
+
+    assert cache.load(fake_api_client.base_url, "postgresql", "guacadmin") is None
+
+
+def test_importer_drops_snapshot_of_interrupted_run(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12", "13"])
+    # the process dies after the first create reached the server
+    created = []
+
+    def create_connection(connection_data, parent_id):
+        if created:
+            raise KeyboardInterrupt()
+        created.append(connection_data["name"])
+        return "100"
+
+    fake_api_client.create_connection = create_connection
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+    importer = ConnectionImporter(fake_api_client, snapshot_cache=cache)
+    cache.save(fake_api_client.base_url, "postgresql", "guacadmin", [], [])
+
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_connections(test_csv_path)
+
+    # the next run downloads the tree, including what this run created
+    assert cache.load(fake_api_client.base_url, "postgresql", "guacadmin") is None
+
+
+def test_importer_does_not_count_failed_creates(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12", "13"])
+    fake_api_client.create_connection = MagicMock(
+        side_effect=["100", None, "101", "102"]
+    )
+
+    importer = ConnectionImporter(fake_api_client)
+    successful, total = importer.import_connections(test_csv_path)
+
+    # c8k-1 already exists, sw-02 fails to be created
+    assert (successful, total) == (3, 5)
+    assert importer.write_failures == 1
+
+
+def test_importer_reports_progress(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12", "13"])
+    fake_api_client.create_connection = MagicMock(
+        side_effect=["100", None, "101", "102"]
+    )
+    progress = ProgressReporter(interval=0)
+
+    importer = ConnectionImporter(fake_api_client, workers=2, progress=progress)
+    importer.import_connections(test_csv_path)
+
+    assert progress.total == 5
+    assert (progress.done, progress.failed, progress.skipped) == (3, 1, 1)
+    assert progress.in_flight == 0
+
+
+def test_importer_creates_groups_level_by_level(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    group_ids = {"DC1": "10", "Rack1": "11", "Rack2": "12"}
+    fake_api_client.create_connection_group = MagicMock(
+        side_effect=lambda name, parent_id: group_ids[name]
+    )
+    fake_api_client.create_connection = MagicMock(return_value="200")
+
+    importer = ConnectionImporter(fake_api_client, workers=4)
+    successful, total = importer.import_connections(test_csv_path)
+
+    assert (successful, total) == (4, 5)
+    calls = [call.kwargs for call in fake_api_client.create_connection_group.call_args_list]
+    assert calls[0] == {"name": "DC1", "parent_id": "ROOT"}
+    assert sorted(calls[1:], key=lambda call: call["name"]) == [
+        {"name": "Rack1", "parent_id": "10"},
+        {"name": "Rack2", "parent_id": "10"},
+    ]
+    # All groups exist before the first connection is created
+    parents = {call.args[1] for call in fake_api_client.create_connection.call_args_list}
+    assert parents == {"11", "12"}
+
+
+def test_importer_resumes_from_journal(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    journal_path = tmp_path / "connections_2.csv.journal.jsonl"
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(side_effect=["100", "101", None, "103"])
+
+    importer = ConnectionImporter(
+        fake_api_client, journal=CheckpointJournal(journal_path)
+    )
+    assert importer.import_connections(test_csv_path) == (3, 5)
+    assert len(journal_path.read_text().splitlines()) == 3
+
+    # The rerun only creates the row which failed, then drops the journal
+    fake_api_client.create_connection_group = MagicMock(side_effect=["20", "21"])
+    fake_api_client.create_connection = MagicMock(return_value="104")
+    importer = ConnectionImporter(
+        fake_api_client, journal=CheckpointJournal(journal_path, resume=True)
+    )
+    assert importer.import_connections(test_csv_path) == (4, 5)
+    fake_api_client.create_connection.assert_called_once()
+    assert fake_api_client.create_connection.call_args.args[0]["name"] == "sw-03"
+    assert not journal_path.exists()
+
+
+def test_importer_plan_and_apply(fake_api_client, tmp_path):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    fake_api_client.get_connection_parameters = MagicMock(
+        return_value={"hostname": "10.0.0.2", "port": "22", "username": "admin"}
+    )
+
+    plan = ConnectionImporter(fake_api_client, sync=True).plan_connections(
+        test_csv_path
+    )
+
+    assert plan.groups == ["ROOT/DC1", "ROOT/DC1/Rack1", "ROOT/DC1/Rack2"]
+    assert [row["device_name"] for row in plan.creates] == [
+        "sw-01", "sw-02", "sw-03", "sw-04"
+    ]
+    assert [row["device_name"] for row in plan.updates] == ["c8k-1"]
+    fake_api_client.create_connection_group.assert_not_called()
+    fake_api_client.create_connection.assert_not_called()
+
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(side_effect=["100", "101", "102", "103"])
+    fake_api_client.update_connection = MagicMock(return_value=True)
+    successful, total = ConnectionImporter(fake_api_client).apply_plan(plan)
+
+    assert (successful, total) == (5, 5)
+    assert fake_api_client.create_connection.call_count == 4
+    fake_api_client.update_connection.assert_called_once()
+
+
+def test_importer_apply_rejects_plan_of_other_server(fake_api_client):
+    fake_api_client.base_url = "http://localhost:8080/guacamole/api"
+    fake_api_client.data_source = "postgresql"
+    fake_api_client.username = "guacadmin"
+    plan = ImportPlan("http://other/api", "postgresql", "guacadmin")
+
+    with pytest.raises(ValueError, match="Plan was computed for"):
+        ConnectionImporter(fake_api_client).apply_plan(plan)
+
+
+def test_importer_merges_several_files(fake_api_client, tmp_path):
+    fixture_dir = os.path.join(os.path.dirname(__file__), "fixture")
+    override = tmp_path / "override.csv"
+    override.write_text(
+        "site,device_name,hostname,protocol,port,username,password\n"
+        "DC1/Rack1,sw-01,10.9.9.9,ssh,22,admin,admin\n"
+    )
+    fake_api_client.create_connection_group = MagicMock(side_effect=["10", "11", "12"])
+    fake_api_client.create_connection = MagicMock(side_effect=["100", "101", "102", "103"])
+
+    importer = ConnectionImporter(fake_api_client, parse_processes=1)
+    successful, total = importer.import_connections(
+        [
+            os.path.join(fixture_dir, "connections_1.csv"),
+            os.path.join(fixture_dir, "connections_2.csv"),
+            override,
+        ]
+    )
+
+    # sw-01 is in all three files, the row of connections_1.csv wins
+    assert (successful, total) == (4, 5)
+    fake_api_client.authenticate.assert_called_once()
+    fake_api_client.get_connection_tree.assert_called_once()
+    created = [call.args[0] for call in fake_api_client.create_connection.call_args_list]
+    assert [data["name"] for data in created] == ["sw-01", "sw-02", "sw-03", "sw-04"]
+    assert created[0]["parameters"]["hostname"] == "192.168.1.1"
+
+
+def test_importer_records_phase_metrics(fake_api_client):
+    test_csv_path = os.path.join(
+        os.path.dirname(__file__), "fixture/connections_2.csv"
+    )
+    fake_api_client.create_connection_group = MagicMock(return_value="10")
+    fake_api_client.create_connection = MagicMock(return_value="100")
+    metrics = ImportMetrics()
+
+    importer = ConnectionImporter(fake_api_client, metrics=metrics)
+    successful, total = importer.import_connections(test_csv_path)
+
+    assert set(metrics.phases) == {
+        "authenticate",
+        "tree_fetch",
+        "tree_build",
+        "csv_parse",
+        "group_create",
+        "connection_create",
+    }
+    assert metrics.counters["rows"] == total
+    assert metrics.counters["successful_imports"] == successful
+    assert metrics.counters["write_failures"] == 0
@@ -0,0 +1,99 @@
+"""Tests for the metrics module."""
+
+import json
+
+import pytest
+
+from guacamole_csv_importer.metrics import ImportMetrics, endpoint_template
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/tokens", "/tokens"),
+        (
+            "/session/data/postgresql/connections",
+            "/session/data/{dataSource}/connections",
+        ),
+        (
+            "/session/data/mysql/connections/42/parameters",
+            "/session/data/{dataSource}/connections/{id}/parameters",
+        ),
+        (
+            "/session/data/postgresql/connectionGroups/ROOT/tree?token=x",
+            "/session/data/{dataSource}/connectionGroups/{id}/tree",
+        ),
+    ],
+)
+def test_endpoint_template(path, expected):
+    """Test that data sources and identifiers are replaced by placeholders."""
+    assert endpoint_template(path) == expected
+
+
+def test_phases_accumulate():
+    """Test that a phase entered twice sums its time."""
+    metrics = ImportMetrics()
+
+    with metrics.phase("csv_parse"):
+        pass
+    first = metrics.phases["csv_parse"]
+    with metrics.phase("csv_parse"):
+        pass
+
+    assert metrics.phases["csv_parse"] >= first >= 0
+
+
+def test_phase_is_recorded_on_error():
+    """Test that a phase which raises is still timed."""
+    metrics = ImportMetrics()
+
+    with pytest.raises(ValueError):
+        with metrics.phase("authenticate"):
+            raise ValueError("denied")
+
+    assert "authenticate" in metrics.phases
+
+
+def test_request_report():
+    """Test the counts, errors and cumulative buckets of an endpoint."""
+    metrics = ImportMetrics()
+    endpoint = "/session/data/{dataSource}/connections"
+    metrics.observe_request("POST", endpoint, 200, 0.003)
+    metrics.observe_request("POST", endpoint, 503, 0.2)
+    metrics.observe_request("POST", endpoint, None, 20.0)
+    metrics.count("rows", 3)
+
+    report = metrics.to_dict()
+
+    assert report["counters"] == {"rows": 3}
+    (request,) = report["requests"]
+    assert request["method"] == "POST"
+    assert request["count"] == 3
+    assert request["errors"] == 2
+    assert request["statuses"] == {"200": 1, "503": 1, "error": 1}
+    assert request["seconds_max"] == 20.0
+    assert request["buckets"]["0.005"] == 1
+    assert request["buckets"]["0.25"] == 2
+    assert request["buckets"]["10.0"] == 2
+    assert request["buckets"]["+Inf"] == 3
+
+
+def test_write_json_and_prometheus(tmp_path):
+    """Test that both exports are written and describe the same requests."""
+    metrics = ImportMetrics()
+    with metrics.phase("tree_fetch"):
+        metrics.observe_request("GET", "/session/data/{dataSource}/connections", 200, 0.01)
+
+    metrics.write_json(tmp_path / "metrics.json")
+    metrics.write_prometheus(tmp_path / "prom" / "import.prom")
+
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert report["requests"][0]["count"] == 1
+    assert "tree_fetch" in report["phases"]
+
+    text = (tmp_path / "prom" / "import.prom").read_text()
+    labels = 'method="GET",endpoint="/session/data/{dataSource}/connections"'
+    assert f"guacamole_import_requests_total{{{labels}}} 1" in text
+    assert f'guacamole_import_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert 'guacamole_import_phase_seconds{phase="tree_fetch"}' in text
+    assert not list((tmp_path / "prom").glob(".*.tmp"))
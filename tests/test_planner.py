@@ -0,0 +1,70 @@
+"""Tests for the import plan module."""
+
+import json
+import stat
+
+import pytest
+
+from guacamole_csv_importer.planner import ImportPlan
+
+BASE_URL = "http://localhost:8080/guacamole/api"
+
+ROW = {
+    "site": "ROOT/DC1",
+    "device_name": "sw-01",
+    "hostname": "10.0.0.1",
+    "protocol": "ssh",
+    "port": "22",
+    "username": "admin",
+    "password": "secret",
+}
+
+
+def make_plan():
+    return ImportPlan(
+        BASE_URL,
+        "postgresql",
+        "guacadmin",
+        groups=["ROOT/DC1"],
+        creates=[ROW, dict(ROW, device_name="sw-02")],
+        updates=[dict(ROW, device_name="sw-03", identifier="7")],
+        unchanged=4,
+        total_rows=7,
+    )
+
+
+def test_save_and_load(tmp_path):
+    """Test that a saved plan is private and loads back unchanged."""
+    path = tmp_path / "plan.json"
+    plan = make_plan()
+
+    plan.save(path)
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert ImportPlan.load(path) == plan
+    assert [row.device_name for row in ImportPlan.load(path).iter_rows()] == [
+        "sw-01",
+        "sw-02",
+        "sw-03",
+    ]
+
+
+def test_summary():
+    """Test the change counts and the request estimate."""
+    assert make_plan().summary(batch_size=50) == {
+        "rows": 7,
+        "group_creates": 1,
+        "connection_creates": 2,
+        "connection_updates": 1,
+        "unchanged": 4,
+        "estimated_requests": 2 + 1 + 1 + 3,
+    }
+
+
+@pytest.mark.parametrize("content", ["not json", json.dumps({"version": 99})])
+def test_load_rejects_invalid_plans(tmp_path, content):
+    path = tmp_path / "plan.json"
+    path.write_text(content)
+
+    with pytest.raises(ValueError):
+        ImportPlan.load(path)
@@ -0,0 +1,65 @@
+"""Tests for the progress reporting module."""
+
+import logging
+
+from guacamole_csv_importer.progress import ProgressReporter, format_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_format_duration():
+    """Test that durations are formatted as H:MM:SS."""
+    assert format_duration(0) == "0:00:00"
+    assert format_duration(65.9) == "0:01:05"
+    assert format_duration(3 * 3600 + 7) == "3:00:07"
+
+
+def test_report_rate_and_eta():
+    """Test the rate, ETA and counters of a progress line."""
+    clock = FakeClock()
+    progress = ProgressReporter(interval=10, total=100, clock=clock)
+    progress.update(done=30, failed=5, skipped=5, in_flight=4)
+    clock.now = 20.0
+
+    line = progress.report()
+
+    assert line == (
+        "Progress: 40/100 rows (40.0%), 2.0 rows/s, ETA 0:00:30, "
+        "4 in flight, 5 failed, 5 skipped"
+    )
+
+
+def test_update_is_throttled(caplog):
+    """Test that at most one line is logged per interval."""
+    clock = FakeClock()
+    progress = ProgressReporter(interval=10, clock=clock)
+
+    with caplog.at_level(logging.INFO, logger="guacamole_csv_importer.progress"):
+        for step in range(100):
+            clock.now = step * 0.5
+            progress.update(done=1)
+
+    lines = [r.getMessage() for r in caplog.records]
+    assert len(lines) == 4
+    assert lines[0].startswith("Progress: 21 rows")
+
+
+def test_interval_zero_disables_updates(caplog):
+    """Test that only the final line is logged when the interval is 0."""
+    clock = FakeClock()
+    progress = ProgressReporter(interval=0, clock=clock)
+
+    with caplog.at_level(logging.INFO, logger="guacamole_csv_importer.progress"):
+        for step in range(10):
+            clock.now = step * 100.0
+            progress.update(skipped=1, in_flight=3)
+        line = progress.finish()
+
+    assert [r.getMessage() for r in caplog.records] == [line]
+    assert line.endswith("0 in flight, 0 failed, 10 skipped, finished in 0:15:00")
@@ -0,0 +1,41 @@
+"""Tests for the snapshot cache module."""
+
+from guacamole_csv_importer.snapshot_cache import SnapshotCache
+
+BASE_URL = "http://localhost:8080/guacamole/api"
+
+
+def test_save_and_load(tmp_path, default_connection_group, default_connections):
+    """Test that a saved snapshot is loaded back for the same key only."""
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+    cache.save(
+        BASE_URL, "postgresql", "guacadmin", default_connection_group, default_connections
+    )
+
+    assert cache.load(BASE_URL, "postgresql", "guacadmin") == (
+        default_connection_group,
+        default_connections,
+    )
+    assert cache.load(BASE_URL, "mysql", "guacadmin") is None
+    assert cache.load(BASE_URL, "postgresql", "other-user") is None
+
+
+def test_expired_snapshot(tmp_path, default_connection_group, default_connections):
+    """Test that a snapshot older than the TTL is a cache miss."""
+    cache = SnapshotCache(tmp_path / "cache.sqlite", ttl=-1)
+    cache.save(
+        BASE_URL, "postgresql", "guacadmin", default_connection_group, default_connections
+    )
+
+    assert cache.load(BASE_URL, "postgresql", "guacadmin") is None
+
+
+def test_invalidate(tmp_path, default_connection_group, default_connections):
+    """Test that invalidate drops the snapshot."""
+    cache = SnapshotCache(tmp_path / "cache.sqlite")
+    cache.save(
+        BASE_URL, "postgresql", "guacadmin", default_connection_group, default_connections
+    )
+    cache.invalidate(BASE_URL, "postgresql", "guacadmin")
+
+    assert cache.load(BASE_URL, "postgresql", "guacadmin") is None
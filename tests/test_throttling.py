@@ -0,0 +1,39 @@
+"""Tests for the retry and rate limiting module."""
+
+import pytest
+
+from guacamole_csv_importer.throttling import RetryPolicy, TokenBucket
+
+
+@pytest.mark.parametrize("attempt, expected_max", [(0, 0.5), (1, 1.0), (2, 2.0), (10, 30.0)])
+def test_backoff_is_exponential_and_capped(attempt, expected_max):
+    """Test that delays double per attempt, stay within the jitter and the cap."""
+    policy = RetryPolicy()
+
+    delay = policy.backoff(attempt)
+
+    assert expected_max * (1 - policy.jitter) <= delay <= expected_max
+
+
+def test_backoff_honours_retry_after():
+    """Test that a Retry-After header extends the delay, up to the cap."""
+    policy = RetryPolicy(backoff_factor=0)
+
+    assert policy.backoff(0, "5") == 5.0
+    assert policy.backoff(0, "3600") == policy.backoff_max
+    assert policy.backoff(0, "Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_token_bucket_delays_requests_over_the_rate():
+    """Test that the bucket allows a burst, then spaces requests by 1/rate."""
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_token_bucket_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,90 @@
+"""Tests for the tree rendering module."""
+
+import io
+import json
+
+import pytest
+
+from guacamole_csv_importer.connection_group_tree import ConnectionGroupTree
+from guacamole_csv_importer.tree_renderer import render_tree
+
+
+@pytest.fixture
+def tree(default_connection_group, default_connections):
+    tree = ConnectionGroupTree()
+    tree.build_from_data(default_connection_group, default_connections)
+    return tree
+
+
+def test_render_text(tree):
+    """Test that each group is followed by its connections, then its children."""
+    out = io.StringIO()
+
+    written = render_tree(tree, out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[:6] == [
+        "- Group: ROOT (ID: ROOT)",
+        "  * Connection: lnx-1 (ID: 7)",
+        "  - Group: c8k (ID: 1)",
+        "    * Connection: c8k-1 (ID: 1)",
+        "    * Connection: c8k-2 (ID: 2)",
+        "  - Group: n9k (ID: 2)",
+    ]
+    assert written == len(lines)
+
+
+def test_render_jsonl_subtree(tree):
+    """Test that a subtree is written as one JSON object per node."""
+    out = io.StringIO()
+
+    render_tree(tree, out, fmt="jsonl", root_path="c8k")
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(r["kind"], r["path"], r["depth"]) for r in records] == [
+        ("group", "ROOT/c8k", 0),
+        ("connection", "ROOT/c8k/c8k-1", 1),
+        ("connection", "ROOT/c8k/c8k-2", 1),
+    ]
+
+
+def test_render_dot_with_depth_limit(tree):
+    """Test that a depth limit cuts off deeper nodes and their edges."""
+    out = io.StringIO()
+
+    render_tree(tree, out, fmt="dot", max_depth=1)
+
+    dot = out.getvalue()
+    assert dot.startswith("digraph connections {")
+    assert '"g:ROOT" -> "g:1";' in dot
+    assert '"g:ROOT" -> "c:7";' in dot
+    assert "c8k-1" not in dot
+    assert dot.rstrip().endswith("}")
+
+
+def test_render_deep_tree():
+    """Test that trees deeper than the recursion limit render."""
+    tree = ConnectionGroupTree(keep_attributes=False)
+    parent = tree.group_tree_root
+    for level in range(2000):
+        parent = tree.add_group(
+            parent,
+            {
+                "name": f"g{level}",
+                "identifier": str(level),
+                "parentIdentifier": parent.identifier,
+                "type": "ORGANIZATIONAL",
+                "activeConnections": 0,
+                "attributes": {},
+            },
+        )
+
+    out = io.StringIO()
+    assert render_tree(tree, out) == 2001
+
+
+def test_render_rejects_unknown_group_and_format(tree):
+    with pytest.raises(ValueError):
+        render_tree(tree, io.StringIO(), root_path="ROOT/missing")
+    with pytest.raises(ValueError):
+        render_tree(tree, io.StringIO(), fmt="yaml")